@@ -1,8 +1,14 @@
+from typing import List, Tuple
+
+from pydantic import ValidationError
+
+from ocpi.core.enums import ModuleID
+from ocpi.core.schemas import BulkWriteFailure
 from ocpi.modules.versions.enums import VersionNumber
 
 from ocpi.modules.cdrs.v_2_2_1.schemas import Cdr
 from ocpi.modules.credentials.v_2_2_1.schemas import Credentials
-from ocpi.modules.locations.v_2_2_1.schemas import Location
+from ocpi.modules.locations.v_2_2_1.schemas import Location, EVSE, Connector
 from ocpi.modules.sessions.v_2_2_1.schemas import Session
 from ocpi.modules.tariffs.v_2_2_1.schemas import Tariff
 from ocpi.modules.tokens.v_2_2_1.schemas import Token
@@ -24,6 +30,34 @@ class Adapter:
         """
         return Location(**data)
 
+    @classmethod
+    def evse_adapter(cls, data: dict, version: VersionNumber = VersionNumber.latest):
+        """Adapt the data to OCPI EVSE schema
+
+        Args:
+            data (dict): The object details
+            version (VersionNumber, optional): The version number of the caller OCPI module
+
+        Returns:
+            EVSE: The object data in proper OCPI schema
+        """
+        return EVSE(**data)
+
+    @classmethod
+    def connector_adapter(
+        cls, data: dict, version: VersionNumber = VersionNumber.latest
+    ):
+        """Adapt the data to OCPI Connector schema
+
+        Args:
+            data (dict): The object details
+            version (VersionNumber, optional): The version number of the caller OCPI module
+
+        Returns:
+            Connector: The object data in proper OCPI schema
+        """
+        return Connector(**data)
+
     @classmethod
     def session_adapter(cls, data: dict, version: VersionNumber = VersionNumber.latest):
         """Adapt the data to OCPI Session schema
@@ -147,3 +181,44 @@ class Adapter:
         Returns:
             AuthorizationInfo: The object data in proper OCPI schema
         """
+
+    @classmethod
+    def batch_adapter(
+        cls,
+        module: ModuleID,
+        data_list: List[dict],
+        version: VersionNumber = VersionNumber.latest,
+    ) -> Tuple[List[dict], List[int], List[BulkWriteFailure]]:
+        """Validate a batch of objects with the module adapter before a bulk write
+
+        Args:
+            module (ModuleID): The OCPI module of the objects
+            data_list (List[dict]): The objects details
+            version (VersionNumber, optional): The version number of the caller OCPI module
+
+        Returns:
+            Tuple[List[dict], List[int], List[BulkWriteFailure]]: The valid objects in proper
+                OCPI schema, their positions in data_list (to report the failures of their
+                bulk write against data_list) and the objects rejected by validation,
+                indexed by their position in data_list
+        """
+        adapter = {
+            ModuleID.locations: cls.location_adapter,
+            ModuleID.sessions: cls.session_adapter,
+            ModuleID.cdrs: cls.cdr_adapter,
+            ModuleID.tariffs: cls.tariff_adapter,
+            ModuleID.tokens: cls.token_adapter,
+        }[module]
+        valid, indices, failures = [], [], []
+        for index, data in enumerate(data_list):
+            try:
+                valid.append(adapter(data, version).dict())
+            except ValidationError as e:
+                failures.append(
+                    BulkWriteFailure(
+                        index=index, id=data.get("uid", data.get("id")), reason=str(e)
+                    )
+                )
+            else:
+                indices.append(index)
+        return valid, indices, failures
@@ -0,0 +1,330 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from pydantic.datetime_parse import parse_datetime
+
+from ocpi.core.config import settings
+from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.exceptions import OCPIError
+
+logger = logging.getLogger(__name__)
+
+# Kinds of buffered writes, named after the Crud method that flushes them
+UPSERT = "upsert"
+UPDATE = "update"
+SUB_OBJECT = "update_sub_object"
+
+# Modules pushed by CPOs to the eMSP with PUT/PATCH requests
+BUFFERED_MODULES = (ModuleID.locations, ModuleID.sessions, ModuleID.tariffs)
+
+
+def _timestamp(value) -> datetime:
+    # OCPI timestamps without timezone are UTC
+    value = parse_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _is_older(data: dict, pending: dict) -> bool:
+    # objects without last_updated are always taken as the newest version
+    if not data.get("last_updated") or not pending.get("last_updated"):
+        return False
+    return _timestamp(data["last_updated"]) < _timestamp(pending["last_updated"])
+
+
+class _Write:
+    __slots__ = ("key", "kind", "module", "role", "data", "id", "kwargs")
+
+    def __init__(
+        self, kind: str, module: ModuleID, role: RoleEnum, data: dict, id, kwargs: dict
+    ):
+        self.key: Tuple = None
+        self.kind = kind
+        self.module = module
+        self.role = role
+        self.data = data
+        self.id = id
+        self.kwargs = kwargs
+
+
+class WriteBuffer:
+    """Write-behind buffer placed in front of a Crud for inbound eMSP writes
+
+    Writes to the same object (or the same EVSE/Connector) received within the flush
+    window are coalesced, keeping the version with the latest `last_updated`, and
+    flushed together: full objects through `bulk_upsert`, the others concurrently.
+    A full object write supersedes the pending EVSE/Connector writes of that object, an EVSE
+    write the older pending writes of its Connectors. The EVSE/Connector writes of an object
+    are applied one after another, in the order they were received. Writes failing for
+    another reason than an OCPI error (e.g. the database is unreachable) are kept pending
+    for the next flush. Reads of an object flush its pending writes first, other calls go
+    straight to the Crud.
+    """
+
+    def __init__(
+        self,
+        crud,
+        window: float = None,
+        max_size: int = None,
+    ):
+        self.crud = crud
+        self.window = settings.WRITE_BUFFER_WINDOW if window is None else window
+        self.max_size = settings.WRITE_BUFFER_SIZE if max_size is None else max_size
+        self._pending: "OrderedDict[Tuple, _Write]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.crud, name)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def _buffered(module: ModuleID, role: RoleEnum, kwargs: dict = None) -> bool:
+        # compare-and-swap writes need the stored object, they are never deferred
+        if kwargs and "expected_last_updated" in kwargs:
+            return False
+        return role == RoleEnum.emsp and module in BUFFERED_MODULES
+
+    @staticmethod
+    def _object_key(module: ModuleID, id, kwargs: dict) -> Tuple:
+        return (
+            module,
+            id,
+            kwargs.get("country_code"),
+            kwargs.get("party_id"),
+            kwargs.get("token_type"),
+        )
+
+    def _covered(self, key: Tuple, kind: str) -> List[Tuple]:
+        # pending keys of the sub-objects a write to `key` replaces
+        if kind != SUB_OBJECT:
+            return [
+                sub_key
+                for sub_key in self._pending
+                if len(sub_key) > len(key) and sub_key[: len(key)] == key
+            ]
+        if key[-1] is not None:
+            return []
+        # an EVSE write, the writes of its Connectors
+        return [
+            sub_key
+            for sub_key in self._pending
+            if sub_key != key and sub_key[:-1] == key[:-1]
+        ]
+
+    async def _enqueue(self, key: Tuple, write: _Write) -> dict:
+        if len(self._pending) >= self.max_size and key not in self._pending:
+            # the buffer is full, callers wait for the database like without buffering
+            await self.flush()
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            if _is_older(write.data, pending.data):
+                return pending.data
+            if write.kind == UPDATE and pending.kind in (UPSERT, UPDATE):
+                write.kind = pending.kind
+                write.data = {**pending.data, **write.data}
+
+        newer = []
+        for sub_key in self._covered(key, write.kind):
+            sub_write = self._pending.pop(sub_key)
+            if write.kind == SUB_OBJECT and _is_older(write.data, sub_write.data):
+                newer.append(sub_write)
+
+        write.key = key
+        self._pending[key] = write
+        self._pending.move_to_end(key)
+        # Connector writes newer than the EVSE write are applied after it
+        for sub_write in newer:
+            self._pending[sub_write.key] = sub_write
+        return write.data
+
+    def _requeue(self, writes: List[_Write]):
+        # failed writes go back in front of the pending ones, unless a newer write replaced them
+        for write in reversed(writes):
+            object_key = self._object_key(write.module, write.id, write.kwargs)
+            full = self._pending.get(object_key)
+            if write.key != object_key and full is not None and full.kind == UPSERT:
+                continue
+            pending = self._pending.get(write.key)
+            if pending is None:
+                self._pending[write.key] = write
+                self._pending.move_to_end(write.key, last=False)
+            elif _is_older(pending.data, write.data):
+                self._pending[write.key] = write
+            elif write.kind in (UPSERT, UPDATE) and pending.kind == UPDATE:
+                pending.kind = write.kind
+                pending.data = {**write.data, **pending.data}
+
+    async def upsert(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        if not self._buffered(module, role):
+            return await self.crud.upsert(module, role, data, id, *args, **kwargs)
+        return await self._enqueue(
+            self._object_key(module, id, kwargs),
+            _Write(UPSERT, module, role, data, id, kwargs),
+        )
+
+    async def update(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        if not self._buffered(module, role, kwargs):
+            return await self.crud.update(module, role, data, id, *args, **kwargs)
+        return await self._enqueue(
+            self._object_key(module, id, kwargs),
+            _Write(UPDATE, module, role, data, id, kwargs),
+        )
+
+    async def update_sub_object(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        if not self._buffered(module, role, kwargs):
+            return await self.crud.update_sub_object(
+                module, role, data, id, *args, **kwargs
+            )
+        return await self._enqueue(
+            self._object_key(module, id, kwargs)
+            + (kwargs.get("evse_uid"), kwargs.get("connector_id")),
+            _Write(SUB_OBJECT, module, role, data, id, kwargs),
+        )
+
+    async def update_evse_status(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        # written right away, after the pending writes of the Location it is merged into
+        if self._buffered(module, role):
+            await self.flush(self._object_key(module, id, kwargs))
+        return await self.crud.update_evse_status(
+            module, role, data, id, *args, **kwargs
+        )
+
+    async def partial_update(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        if self._buffered(module, role):
+            await self.flush(self._object_key(module, id, kwargs))
+        return await self.crud.partial_update(module, role, data, id, *args, **kwargs)
+
+    async def patch_sub_object(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> dict:
+        if self._buffered(module, role):
+            await self.flush(self._object_key(module, id, kwargs))
+        return await self.crud.patch_sub_object(module, role, data, id, *args, **kwargs)
+
+    async def get(self, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
+        if self._buffered(module, role):
+            await self.flush(self._object_key(module, id, kwargs))
+        return await self.crud.get(module, role, id, *args, **kwargs)
+
+    async def delete(self, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
+        key = self._object_key(module, id, kwargs)
+        # after a flush in progress, its failed writes of the object are dropped too
+        async with self._lock:
+            for pending_key in [k for k in self._pending if k[: len(key)] == key]:
+                del self._pending[pending_key]
+        return await self.crud.delete(module, role, id, *args, **kwargs)
+
+    async def flush(self, key: Tuple = None):
+        """Write the pending writes, or only the ones of a single object
+
+        Args:
+            key (Tuple, optional): The object whose pending writes are flushed
+        """
+        async with self._lock:
+            if key is None:
+                writes = list(self._pending.values())
+                self._pending.clear()
+            else:
+                writes = [
+                    self._pending.pop(pending_key)
+                    for pending_key in [
+                        k for k in self._pending if k[: len(key)] == key
+                    ]
+                ]
+            if writes:
+                await self._write(writes)
+
+    async def _write(self, writes: List[_Write]):
+        # full objects go first, the sub-object writes left pending are newer than them
+        failed: List[_Write] = []
+        upserts: Dict[Tuple[ModuleID, RoleEnum], List[_Write]] = {}
+        for write in writes:
+            if write.kind == UPSERT:
+                upserts.setdefault((write.module, write.role), []).append(write)
+        for (module, role), upsert_writes in upserts.items():
+            try:
+                report = await self.crud.bulk_upsert(
+                    module, role, [write.data for write in upsert_writes]
+                )
+            except Exception as e:
+                logger.error("Buffered upsert failed, kept pending: %s", e)
+                failed.extend(upsert_writes)
+                continue
+            for failure in report.failures:
+                logger.error(
+                    "Buffered write of %s %s failed: %s",
+                    module.value,
+                    failure.id,
+                    failure.reason,
+                )
+
+        updates = [[write] for write in writes if write.kind == UPDATE]
+        # the sub-object writes of an object are applied in order
+        sub_objects: Dict[Tuple, List[_Write]] = {}
+        for write in writes:
+            if write.kind == SUB_OBJECT:
+                sub_objects.setdefault(write.key[:-2], []).append(write)
+        for groups in (updates, list(sub_objects.values())):
+            for group_failed in await asyncio.gather(
+                *[self._write_in_order(group) for group in groups]
+            ):
+                failed.extend(group_failed)
+
+        if failed:
+            self._requeue(failed)
+
+    async def _write_in_order(self, writes: List[_Write]) -> List[_Write]:
+        # the writes left to retry, from the first one failing with a database error
+        for index, write in enumerate(writes):
+            try:
+                await getattr(self.crud, write.kind)(
+                    write.module, write.role, write.data, write.id, **write.kwargs
+                )
+            except OCPIError as e:
+                logger.error("Buffered %s failed: %s", write.kind, e)
+            except Exception as e:
+                logger.error("Buffered %s failed, kept pending: %s", write.kind, e)
+                return writes[index:]
+        return []
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing the write buffer failed")
+
+    def start(self):
+        """Start flushing the buffer every `window` seconds"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
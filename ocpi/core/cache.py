@@ -0,0 +1,138 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """Bounded in-process cache, entries expire `ttl` seconds after they are set
+
+    The least recently used entries are evicted first once `max_size` entries, or
+    `max_bytes` bytes of entries set with a size, are held. Hits, misses and evictions
+    are counted, expired entries count as misses.
+
+    Entries may belong to a group (e.g. the entries of one object for several callers),
+    dropped together by `invalidate(group=...)`. A value read before it is set is set
+    with the `generation` of its group seen at that time, and skipped when its group
+    was invalidated meanwhile.
+
+    Args:
+        max_size (int): The number of entries kept
+        ttl (float): The seconds an entry is served for
+        max_bytes (int, optional): The total size of the entries kept
+    """
+
+    def __init__(self, max_size: int, ttl: float, max_bytes: Optional[int] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (value, set at, group, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, Hashable, int]]" = (
+            OrderedDict()
+        )
+        # group -> keys of its entries
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+        # group -> generation of its last invalidation, the `max_size` latest ones are
+        # kept and the others read as the latest generation dropped
+        self._generations: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._last_generation = 0
+        self._dropped_generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Hashable):
+        _, _, group, size = self._entries.pop(key)
+        self.bytes -= size
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self, group: Hashable) -> int:
+        """The generation of a group, read before building a value of the group"""
+        return self._generations.get(group, self._dropped_generation)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        group: Hashable = None,
+        generation: Optional[int] = None,
+        size: int = 0,
+    ):
+        """Keep an entry, unless its group was invalidated since `generation`
+
+        Args:
+            group (Hashable, optional): The group of the entry
+            generation (int, optional): The `generation` of the group read before the
+                value was built
+            size (int, optional): The size of the entry counted against `max_bytes`
+        """
+        if generation is not None and generation != self.generation(group):
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = value, time.monotonic(), group, size
+        self.bytes += size
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+        while len(self._entries) > self.max_size or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(
+        self,
+        key: Hashable = None,
+        where: Optional[Callable[[Hashable], bool]] = None,
+        group: Hashable = None,
+    ):
+        """Drop an entry, the entries whose key matches `where`, the entries of a group,
+        or every entry
+
+        Args:
+            key (Hashable, optional): The key of the dropped entry
+            where (Callable[[Hashable], bool], optional): Selects the dropped entries
+            group (Hashable, optional): The group of the dropped entries, the values of
+                the group read before are not set
+        """
+        if key is not None:
+            if key in self._entries:
+                self._drop(key)
+        elif where is not None:
+            for matched in [key for key in self._entries if where(key)]:
+                self._drop(matched)
+        elif group is not None:
+            for matched in list(self._groups.get(group, ())):
+                self._drop(matched)
+            self._last_generation += 1
+            self._generations[group] = self._last_generation
+            self._generations.move_to_end(group)
+            while len(self._generations) > self.max_size:
+                _, dropped = self._generations.popitem(last=False)
+                self._dropped_generation = max(self._dropped_generation, dropped)
+        else:
+            self._entries.clear()
+            self._groups.clear()
+            self.bytes = 0
+            # every value read before is stale
+            self._last_generation += 1
+            self._generations.clear()
+            self._dropped_generation = self._last_generation
@@ -1,8 +1,8 @@
-from typing import List, Union
+from typing import Dict, List, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, validator
 
-from ocpi.core.enums import RoleEnum
+from ocpi.core.enums import CountStrategy, ModuleID, RoleEnum
 
 
 class Settings(BaseSettings):
@@ -19,6 +19,81 @@ class Settings(BaseSettings):
 
     ROLES: List[RoleEnum] = [RoleEnum.cpo, RoleEnum.emsp]
 
+    # Page lists by seeking on (last_updated, _id) and advertise a cursor in the Link header
+    CURSOR_PAGINATION: bool = False
+
+    # How X-Total-Count is computed per module, modules not listed use exact counts
+    COUNT_STRATEGIES: Dict[ModuleID, CountStrategy] = {}
+    COUNT_CACHE_TTL: int = 60
+    COUNT_CACHE_SIZE: int = 1024
+
+    # Number of objects sent to the database per bulk_write call
+    BULK_WRITE_BATCH_SIZE: int = 1000
+
+    # Stream list responses object by object from the database cursor instead of building the page
+    STREAM_LISTS: bool = False
+    LIST_STREAM_BATCH_SIZE: int = 100
+
+    # Number of objects fetched per database round trip by the NDJSON export routes
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Record the writes of these modules in a change log served by the `/changes` delta feeds,
+    # entries are kept CHANGE_LOG_TTL seconds and a feed page holds up to CHANGE_FEED_LIMIT
+    CHANGE_LOG_MODULES: List[ModuleID] = []
+    CHANGE_LOG_TTL: int = 7 * 24 * 3600
+    CHANGE_FEED_LIMIT: int = 500
+    # Seconds a feed waits for a change log entry numbered but not inserted yet before
+    # skipping it, a write that failed between the two steps leaves such a gap
+    CHANGE_LOG_GAP_WAIT: float = 30
+
+    # Keep EVSE status and status_schedule in their own collection, merged into the Locations
+    # on read, so that status updates do not rewrite the Location documents
+    EVSE_STATUS_STORE: bool = False
+
+    # Keep Session charging periods in their own collection, one document per period merged
+    # into the Sessions on read, so that a Session write only writes its new periods
+    CHARGING_PERIOD_STORE: bool = False
+
+    # Bounds of the location searches, radius in meters
+    GEO_SEARCH_MAX_RADIUS: int = 50000
+    GEO_SEARCH_MAX_LIMIT: int = 500
+
+    # Read preference of sender reads per module or per module operation ('get', 'list',
+    # 'export', 'changes' or 'search'),
+    # e.g. {"locations.list": "secondaryPreferred"}; receiver reads always use the primary
+    READ_PREFERENCES: Dict[str, str] = {}
+    # Max replication lag in seconds of the secondaries read from, -1 for no bound (90 minimum)
+    READ_MAX_STALENESS: int = -1
+
+    # Attempts of a PATCH read-modify-write before giving up on concurrent writers
+    UPDATE_RETRIES: int = 3
+
+    # Apply PATCH requests with a single in-place write, without reading the object:
+    # Location/Session/Token ones through Crud.partial_update, EVSE/Connector ones
+    # touching only plain fields (no list or object) through Crud.patch_sub_object
+    PATCH_FAST_PATH: bool = False
+
+    # Keep the parties resolved from the caller tokens TOKEN_CACHE_TTL seconds (0 disables it),
+    # the credentials routes forget the tokens they change; the cache is per process
+    TOKEN_CACHE_TTL: int = 0
+    TOKEN_CACHE_SIZE: int = 1024
+
+    # Keep up to LOCATION_CACHE_SIZE rendered eMSP Locations (0 disables it) served by
+    # get_location, for LOCATION_CACHE_TTL seconds or until a Location write of this process;
+    # LOCATION_CACHE_BYTES bounds the total size of their rendered bodies
+    LOCATION_CACHE_SIZE: int = 0
+    LOCATION_CACHE_TTL: int = 60
+    LOCATION_CACHE_BYTES: int = 64 * 1024 * 1024
+
+    # Share one database read between the concurrent get calls for the same object
+    SINGLEFLIGHT_GET: bool = False
+
+    # Coalesce inbound eMSP PUT/PATCH writes and flush them every WRITE_BUFFER_WINDOW seconds,
+    # writes wait for a flush once WRITE_BUFFER_SIZE objects are pending
+    WRITE_BUFFER: bool = False
+    WRITE_BUFFER_WINDOW: float = 0.5
+    WRITE_BUFFER_SIZE: int = 10000
+
     @classmethod
     @validator("BACKEND_CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -1,13 +1,659 @@
-from typing import Any, Tuple
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, List, Optional, Tuple
 
-from ocpi.core.db import get_db
-from motor.core import AgnosticDatabase
-from ocpi.core.enums import ModuleID, RoleEnum, Action
+from bson import json_util
+from pymongo import (
+    ASCENDING,
+    DeleteMany,
+    DeleteOne,
+    ReplaceOne,
+    ReturnDocument,
+    UpdateOne,
+)
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from ocpi.core.config import settings
+from ocpi.core.db import get_db, get_read_preference
+from motor.core import AgnosticCollection, AgnosticDatabase
+from ocpi.core.enums import ModuleID, RoleEnum, Action, ChangeType, CountStrategy
+from ocpi.core.exceptions import NotFoundOCPIError
+from ocpi.core.schemas import BulkWriteFailure, BulkWriteReport
+from ocpi.core.utils import decode_cursor
+
+# Keys of the OCPI pagination filters that drive paging and are never part of the query
+PAGINATION_KEYS = ("offset", "limit", "cursor")
+
+# Sort order shared by offset and cursor pagination, `_id` breaks ties on equal timestamps
+LIST_SORT = [("last_updated", ASCENDING), ("_id", ASCENDING)]
+
+# Modules served through OCPI list endpoints
+LIST_MODULES = (
+    ModuleID.locations,
+    ModuleID.sessions,
+    ModuleID.cdrs,
+    ModuleID.tariffs,
+    ModuleID.tokens,
+)
+
+# Collection of the change log shared by the modules of CHANGE_LOG_MODULES
+CHANGE_LOG_COLLECTION = "changes"
+
+# Collection of the change log sequence of every module, `seq` is the last number given
+CHANGE_LOG_SEQUENCE_COLLECTION = "change_sequences"
+
+
+# GeoJSON point of the Location coordinates, stored next to them for the 2dsphere index
+GEO_POINT_FIELD = "geo_point"
+
+
+# Collection of the EVSE statuses when the EVSE_STATUS_STORE setting is enabled
+EVSE_STATUS_COLLECTION = "evse_statuses"
+
+# EVSE fields kept in the EVSE status collection instead of the Location document
+EVSE_STATUS_FIELDS = ("status", "status_schedule")
+
+
+# Collection of the Session charging periods when the CHARGING_PERIOD_STORE setting is enabled
+CHARGING_PERIOD_COLLECTION = "charging_periods"
+
+
+def _timestamp(value: datetime) -> str:
+    # last_updated is stored as an OCPI DateTime string, timestamps without timezone are UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return str(value.astimezone(timezone.utc))
+
+
+def list_query(filters: dict) -> dict:
+    """Translate OCPI pagination filters into a Mongo query
+
+    `date_from` (inclusive) and `date_to` (exclusive) become a range on `last_updated`,
+    paging keys are left out.
+
+    Args:
+        filters (dict): OCPI pagination filters
+
+    Returns:
+        dict: The Mongo query selecting the objects of the requested window
+    """
+    query = {
+        key: value
+        for key, value in filters.items()
+        if key not in PAGINATION_KEYS + ("date_from", "date_to") and value is not None
+    }
+    last_updated = {}
+    if filters.get("date_from"):
+        last_updated["$gte"] = _timestamp(filters["date_from"])
+    if filters.get("date_to"):
+        last_updated["$lt"] = _timestamp(filters["date_to"])
+    if last_updated:
+        query["last_updated"] = last_updated
+    return query
+
+
+def sub_object_path(evse_uid: str, connector_id: str = None) -> Tuple[str, list]:
+    """Positional path and array filters of an EVSE, or of one of its connectors
+
+    Args:
+        evse_uid (str): The uid of the EVSE
+        connector_id (str, optional): The id of the Connector
+
+    Returns:
+        Tuple[str, list]: The path to use in an update and its `arrayFilters`
+    """
+    if connector_id is None:
+        return "evses.$[e]", [{"e.uid": evse_uid}]
+    return "evses.$[e].connectors.$[c]", [{"e.uid": evse_uid}, {"c.id": connector_id}]
+
+
+def patch_update(data: dict, path: str = None, parents: Tuple[str, ...] = ()) -> dict:
+    """Update setting each patched field through its dotted path
+
+    `last_updated` is not set, it only moves forward on the patched object and its parents.
+
+    Args:
+        data (dict): The patched fields
+        path (str, optional): The path of the patched sub-object, the object itself when None
+        parents (Tuple[str, ...], optional): The paths of the sub-objects containing it
+
+    Returns:
+        dict: The update, empty when there is nothing to write
+    """
+    prefix = f"{path}." if path else ""
+    update = {}
+    values = {
+        f"{prefix}{field}": value
+        for field, value in data.items()
+        if field != "last_updated"
+    }
+    if values:
+        update["$set"] = values
+    if data.get("last_updated"):
+        update["$max"] = {
+            f"{parent}last_updated": data["last_updated"]
+            for parent in ("", *(f"{parent}." for parent in parents), prefix)
+        }
+    return update
+
+
+def split_evse_status(evse: dict) -> Tuple[dict, dict]:
+    """Split an EVSE into the part stored in its Location and its status fields"""
+    location_part = {
+        field: value for field, value in evse.items() if field not in EVSE_STATUS_FIELDS
+    }
+    status = {
+        field: value for field, value in evse.items() if field in EVSE_STATUS_FIELDS
+    }
+    return location_part, status
+
+
+def merge_charging_periods(stored: List[dict], patched: List[dict]) -> List[dict]:
+    """Charging periods of a Session after a PATCH, the patched periods are appended
+
+    A patched period replaces the stored period with the same `start_date_time`.
+    """
+    periods = {period["start_date_time"]: period for period in stored or []}
+    periods.update({period["start_date_time"]: period for period in patched or []})
+    return list(periods.values())
+
+
+def append_periods_update(update: dict, periods: List[dict]) -> List[dict]:
+    """Pipeline form of the `patch_update` of a Session, appending its charging periods
+
+    Same rule as `merge_charging_periods`, applied by the database in the single write.
+    """
+    starts = [period["start_date_time"] for period in periods]
+    values = {
+        field: {"$literal": value}
+        for field, value in update.get("$set", {}).items()
+        if field != "charging_periods"
+    }
+    values.update(
+        {
+            field: {"$max": [f"${field}", value]}
+            for field, value in update.get("$max", {}).items()
+        }
+    )
+    values["charging_periods"] = {
+        "$concatArrays": [
+            {
+                "$filter": {
+                    "input": {"$ifNull": ["$charging_periods", []]},
+                    "as": "period",
+                    "cond": {"$not": [{"$in": ["$$period.start_date_time", starts]}]},
+                }
+            },
+            {"$literal": periods},
+        ]
+    }
+    return [{"$set": values}]
+
+
+def geo_point(coordinates: Optional[dict]) -> Optional[dict]:
+    """GeoJSON point of OCPI GeoLocation coordinates, None when they are missing or invalid"""
+    try:
+        latitude = float(coordinates["latitude"])
+        longitude = float(coordinates["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def with_geo_point(module: ModuleID, data: dict) -> dict:
+    """The Location data with the GeoJSON point of its coordinates, other objects are unchanged"""
+    if module != ModuleID.locations or "coordinates" not in data:
+        return data
+    point = geo_point(data["coordinates"])
+    if point is None:
+        return data
+    return {**data, GEO_POINT_FIELD: point}
+
+
+def geo_query(filters: dict) -> dict:
+    """Translate a location search area into a Mongo query on the GeoJSON point
+
+    Args:
+        filters (dict): `bbox` as (min longitude, min latitude, max longitude, max latitude),
+            or `latitude`, `longitude` and `radius` in meters
+
+    Returns:
+        dict: The query, a radius search sorts the objects by distance
+    """
+    if filters.get("bbox"):
+        min_longitude, min_latitude, max_longitude, max_latitude = filters["bbox"]
+        polygon = [
+            [min_longitude, min_latitude],
+            [max_longitude, min_latitude],
+            [max_longitude, max_latitude],
+            [min_longitude, max_latitude],
+            [min_longitude, min_latitude],
+        ]
+        return {
+            GEO_POINT_FIELD: {
+                "$geoWithin": {
+                    "$geometry": {"type": "Polygon", "coordinates": [polygon]}
+                }
+            }
+        }
+    return {
+        GEO_POINT_FIELD: {
+            "$nearSphere": {
+                "$geometry": {
+                    "type": "Point",
+                    "coordinates": [filters["longitude"], filters["latitude"]],
+                },
+                "$maxDistance": filters["radius"],
+            }
+        }
+    }
+
+
+def change_entry(module: ModuleID, change_type: ChangeType, key: dict) -> dict:
+    """Change log entry of a written object, `key` holds the identifiers of the object"""
+    return {
+        "module": module.value,
+        "type": change_type.value,
+        "key": key,
+        "created": datetime.now(timezone.utc),
+    }
+
+
+def committed_entries(entries: List[dict], after: Optional[int]) -> List[dict]:
+    """Change log entries read in `seq` order, up to the first gap of the sequence
+
+    A gap is a write whose number was given but whose entry is not inserted yet, the
+    entries following it are read on the next page. Gaps older than CHANGE_LOG_GAP_WAIT
+    seconds are left by failed writes and skipped.
+    """
+    now = datetime.now(timezone.utc)
+    for index, entry in enumerate(entries):
+        created = entry["created"]
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        if (
+            after is not None
+            and entry["seq"] != after + 1
+            and (now - created).total_seconds() < settings.CHANGE_LOG_GAP_WAIT
+        ):
+            return entries[:index]
+        after = entry["seq"]
+    return entries
+
+
+def coalesce_changes(entries: List[dict]) -> List[dict]:
+    """Keep the last change log entry of every object, in change log order"""
+    latest = OrderedDict()
+    for entry in entries:
+        key = json_util.dumps(entry["key"], sort_keys=True)
+        latest.pop(key, None)
+        latest[key] = entry
+    return list(latest.values())
+
+
+def _matches(document: dict, key: dict) -> bool:
+    return all(document.get(field) == value for field, value in key.items())
+
+
+async def _no_documents() -> AsyncIterator[dict]:
+    return
+    yield
+
+
+class _CountCache:
+    # (collection, query) -> (count, computed at), oldest entries are evicted first
+    counts: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()
+    refreshes: dict = {}
+
+    @classmethod
+    async def _refresh(
+        cls, key: Tuple[str, str], collection: AgnosticCollection, query: dict
+    ):
+        try:
+            count = await collection.count_documents(query)
+            cls.counts[key] = count, time.monotonic()
+            cls.counts.move_to_end(key)
+            while len(cls.counts) > settings.COUNT_CACHE_SIZE:
+                cls.counts.popitem(last=False)
+        finally:
+            cls.refreshes.pop(key, None)
+        return count
+
+    @classmethod
+    async def count(cls, collection: AgnosticCollection, query: dict) -> int:
+        key = collection.name, json_util.dumps(query, sort_keys=True)
+        cached = cls.counts.get(key)
+        if cached is None:
+            return await cls._refresh(key, collection, query)
+
+        count, computed_at = cached
+        if (
+            time.monotonic() - computed_at > settings.COUNT_CACHE_TTL
+            and key not in cls.refreshes
+        ):
+            # serve the stale count, the next requests get the refreshed one
+            cls.refreshes[key] = asyncio.create_task(
+                cls._refresh(key, collection, query)
+            )
+        return count
 
 
 class Crud:
     _database: AgnosticDatabase = get_db()
 
+    @classmethod
+    def _object_query(cls, module: ModuleID, id, **kwargs) -> dict:
+        # Matches the lookup indexes declared by the modules, see `ocpi.core.indexes`
+        if module == ModuleID.tokens:
+            query = {"uid": id}
+            if kwargs.get("token_type"):
+                query["type"] = kwargs["token_type"]
+        elif module in LIST_MODULES:
+            query = {"id": id}
+        else:
+            return {"_id": id}
+
+        if kwargs.get("country_code"):
+            query["country_code"] = kwargs["country_code"]
+        if kwargs.get("party_id"):
+            query["party_id"] = kwargs["party_id"]
+        return query
+
+    @classmethod
+    def _read_collection(
+        cls, module: ModuleID, role: RoleEnum, operation: str
+    ) -> AgnosticCollection:
+        # only reads serving the module sender interface may go to secondaries,
+        # receiver writes and their read-modify-write stay on the primary
+        collection = cls._database[module.value]
+        sender = RoleEnum.emsp if module == ModuleID.tokens else RoleEnum.cpo
+        if role != sender:
+            return collection
+        read_preference = get_read_preference(module.value, operation)
+        if read_preference is None:
+            return collection
+        return collection.with_options(read_preference=read_preference)
+
+    @classmethod
+    def _document_query(cls, module: ModuleID, data: dict) -> dict:
+        # the lookup query of a full object, built from its own identifiers
+        if module == ModuleID.tokens:
+            return cls._object_query(
+                module,
+                data.get("uid"),
+                token_type=data.get("type"),
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        return cls._object_query(
+            module,
+            data.get("id"),
+            country_code=data.get("country_code"),
+            party_id=data.get("party_id"),
+        )
+
+    @classmethod
+    async def _bulk_write(
+        cls,
+        module: ModuleID,
+        requests: list,
+        objects_ids: list,
+        offset: int,
+        report: BulkWriteReport,
+    ):
+        try:
+            result = await cls._database[module.value].bulk_write(
+                requests, ordered=False
+            )
+            report.written += (
+                result.upserted_count + result.matched_count + result.deleted_count
+            )
+        except BulkWriteError as e:
+            # unordered writes go on after a failure, only the failed ones are reported
+            details = e.details
+            report.written += (
+                details["nUpserted"] + details["nMatched"] + details["nRemoved"]
+            )
+            for error in details["writeErrors"]:
+                report.failures.append(
+                    BulkWriteFailure(
+                        index=offset + error["index"],
+                        id=objects_ids[error["index"]],
+                        reason=error["errmsg"],
+                    )
+                )
+
+    @classmethod
+    async def _count(
+        cls, collection: AgnosticCollection, query: dict, strategy: CountStrategy
+    ) -> int:
+        if strategy == CountStrategy.estimated and not query:
+            return await collection.estimated_document_count()
+        if strategy in (CountStrategy.cached, CountStrategy.estimated):
+            return await _CountCache.count(collection, query)
+        return await collection.count_documents(query)
+
+    @classmethod
+    async def _log_changes(
+        cls, module: ModuleID, change_type: ChangeType, keys: List[dict]
+    ):
+        if module not in settings.CHANGE_LOG_MODULES or not keys:
+            return
+        # entries are numbered before the insert, `_id` values are not in commit order
+        sequence = await cls._database[
+            CHANGE_LOG_SEQUENCE_COLLECTION
+        ].find_one_and_update(
+            {"_id": module.value},
+            {"$inc": {"seq": len(keys)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        first = sequence["seq"] - len(keys) + 1
+        await cls._database[CHANGE_LOG_COLLECTION].insert_many(
+            [
+                {**change_entry(module, change_type, key), "seq": first + index}
+                for index, key in enumerate(keys)
+            ]
+        )
+
+    @classmethod
+    def _status_store(cls, module: ModuleID) -> bool:
+        return settings.EVSE_STATUS_STORE and module == ModuleID.locations
+
+    @classmethod
+    def _status_key(cls, location_id, uid=None, **kwargs) -> dict:
+        # without uid, the key of every EVSE status of the Location
+        key = {"location_id": location_id}
+        if uid is not None:
+            key["evse_uid"] = uid
+        for field in ("country_code", "party_id"):
+            if kwargs.get(field):
+                key[field] = kwargs[field]
+        return key
+
+    @classmethod
+    def _status_requests(
+        cls, location_id, data: dict, replace: bool = True, **kwargs
+    ) -> Tuple[dict, list]:
+        # the Location without the EVSE statuses, and the writes of the statuses
+        if "evses" not in data:
+            return data, []
+        evses, requests = [], []
+        for evse in data["evses"]:
+            location_part, status = split_evse_status(evse)
+            evses.append(location_part)
+            requests.append(
+                UpdateOne(
+                    cls._status_key(location_id, evse["uid"], **kwargs),
+                    {"$set": {**status, "last_updated": evse.get("last_updated")}},
+                    upsert=True,
+                )
+            )
+        if replace:
+            # statuses of the EVSEs removed from the Location
+            key = cls._status_key(location_id, **kwargs)
+            key["evse_uid"] = {"$nin": [evse["uid"] for evse in evses]}
+            requests.append(DeleteMany(key))
+        return {**data, "evses": evses}, requests
+
+    @classmethod
+    async def _write_statuses(cls, requests: list):
+        if requests:
+            await cls._database[EVSE_STATUS_COLLECTION].bulk_write(
+                requests, ordered=False
+            )
+
+    @classmethod
+    async def _merge_statuses(cls, module: ModuleID, documents: List[dict]) -> list:
+        # EVSE statuses read back into their Locations, in place
+        locations = [
+            document
+            for document in documents
+            if document and document.get("evses") and "id" in document
+        ]
+        if not cls._status_store(module) or not locations:
+            return documents
+
+        statuses = {}
+        async for status in cls._database[EVSE_STATUS_COLLECTION].find(
+            {"location_id": {"$in": list({location["id"] for location in locations})}}
+        ):
+            statuses.setdefault((status["location_id"], status["evse_uid"]), []).append(
+                status
+            )
+        for location in locations:
+            for evse in location["evses"]:
+                for status in statuses.get((location["id"], evse.get("uid")), []):
+                    if all(
+                        status.get(field) in (None, location.get(field))
+                        for field in ("country_code", "party_id")
+                    ):
+                        evse.update(
+                            {
+                                field: status[field]
+                                for field in EVSE_STATUS_FIELDS
+                                if field in status
+                            }
+                        )
+        return documents
+
+    @classmethod
+    def _period_store(cls, module: ModuleID) -> bool:
+        return settings.CHARGING_PERIOD_STORE and module == ModuleID.sessions
+
+    @classmethod
+    def _period_key(cls, session_id, **kwargs) -> dict:
+        key = {"session_id": session_id}
+        for field in ("country_code", "party_id"):
+            if kwargs.get(field):
+                key[field] = kwargs[field]
+        return key
+
+    @classmethod
+    def _period_requests(
+        cls, session_id, data: dict, replace: bool = True, **kwargs
+    ) -> Tuple[dict, list]:
+        # the Session without its charging periods, and the writes of the periods
+        if "charging_periods" not in data:
+            return data, []
+        key = cls._period_key(session_id, **kwargs)
+        periods = data["charging_periods"] or []
+        requests = [
+            UpdateOne(
+                {**key, "start_date_time": period["start_date_time"]},
+                {"$set": period},
+                upsert=True,
+            )
+            for period in periods
+        ]
+        if replace:
+            # periods no longer sent with the Session
+            requests.append(
+                DeleteMany(
+                    {
+                        **key,
+                        "start_date_time": {
+                            "$nin": [period["start_date_time"] for period in periods]
+                        },
+                    }
+                )
+            )
+        return {
+            field: value for field, value in data.items() if field != "charging_periods"
+        }, requests
+
+    @classmethod
+    async def _write_periods(cls, requests: list):
+        if requests:
+            await cls._database[CHARGING_PERIOD_COLLECTION].bulk_write(
+                requests, ordered=False
+            )
+
+    @classmethod
+    async def _merge_periods(cls, module: ModuleID, documents: List[dict]) -> list:
+        # charging periods read back into their Sessions, in place
+        sessions = [document for document in documents if document and "id" in document]
+        if not cls._period_store(module) or not sessions:
+            return documents
+
+        periods = {}
+        async for period in (
+            cls._database[CHARGING_PERIOD_COLLECTION]
+            .find(
+                {"session_id": {"$in": list({session["id"] for session in sessions})}},
+                {"_id": 0},
+            )
+            .sort("start_date_time", ASCENDING)
+        ):
+            periods.setdefault(period["session_id"], []).append(period)
+        for session in sessions:
+            # periods stored in the Session before the setting was enabled come first
+            merged = {
+                period["start_date_time"]: period
+                for period in session.get("charging_periods") or []
+            }
+            for period in periods.get(session["id"], []):
+                if all(
+                    period.get(field) in (None, session.get(field))
+                    for field in ("country_code", "party_id")
+                ):
+                    merged[period["start_date_time"]] = {
+                        field: value
+                        for field, value in period.items()
+                        if field not in ("session_id", "country_code", "party_id")
+                    }
+            if merged:
+                session["charging_periods"] = list(merged.values())
+        return documents
+
+    @classmethod
+    def _stored_apart(cls, module: ModuleID) -> bool:
+        return cls._status_store(module) or cls._period_store(module)
+
+    @classmethod
+    async def _merge_stored(cls, module: ModuleID, documents: List[dict]) -> list:
+        # the parts of the objects stored in their own collections, merged back in place
+        await cls._merge_statuses(module, documents)
+        return await cls._merge_periods(module, documents)
+
+    @classmethod
+    async def _merge_cursor(
+        cls, module: ModuleID, cursor, batch_size: int
+    ) -> AsyncIterator[dict]:
+        batch = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                for merged in await cls._merge_stored(module, batch):
+                    yield merged
+                batch = []
+        for merged in await cls._merge_stored(module, batch):
+            yield merged
+
     @classmethod
     async def get(cls, module: ModuleID, role: RoleEnum, id, *args, **kwargs) -> Any:
         """Get an object
@@ -24,13 +670,76 @@ class Crud:
             country_code (CiString(2)): The requested Country code
             token_type (TokenType): The token type
             command (CommandType): The command type of the OCPP command
+            evse_uid (CiString(36)): Return only this EVSE of the Location
+            connector_id (CiString(36)): Return only this Connector of the EVSE
 
         Returns:
             Any: The object data
         """
-        collection = cls._database[module.value]
-        document = await collection.find_one({"_id": id})
-        return document
+        collection = cls._read_collection(module, role, "get")
+        query = cls._object_query(module, id, **kwargs)
+        evse_uid = kwargs.get("evse_uid")
+        if evse_uid is None:
+            document = await collection.find_one(query)
+            return (await cls._merge_stored(module, [document]))[0]
+
+        # only the requested EVSE is sent back by the database
+        document = await collection.find_one(
+            {**query, "evses.uid": evse_uid},
+            {"_id": 0, "evses": {"$elemMatch": {"uid": evse_uid}}},
+        )
+        if not document:
+            return None
+        evse = document["evses"][0]
+
+        connector_id = kwargs.get("connector_id")
+        if connector_id is None:
+            if cls._status_store(module):
+                status = await cls._database[EVSE_STATUS_COLLECTION].find_one(
+                    cls._status_key(id, evse_uid, **kwargs)
+                )
+                if status:
+                    evse.update(
+                        {
+                            field: status[field]
+                            for field in EVSE_STATUS_FIELDS
+                            if field in status
+                        }
+                    )
+            return evse
+        for connector in evse.get("connectors", []):
+            if connector["id"] == connector_id:
+                return connector
+        return None
+
+    @classmethod
+    def _page_query(cls, filters: dict, **kwargs) -> Tuple[dict, dict, int, int]:
+        # (window query, page query, skip, limit) of the requested page
+        query = list_query(filters)
+
+        limit = filters.get("limit", kwargs.get("limit", 10))
+        skip = filters.get("offset", kwargs.get("skip", 0))
+
+        # Seek past the last object of the previous page instead of skipping over it
+        page_query = query
+        if filters.get("cursor"):
+            position = decode_cursor(filters["cursor"])
+            page_query = {
+                "$and": [
+                    query,
+                    {
+                        "$or": [
+                            {"last_updated": {"$gt": position["last_updated"]}},
+                            {
+                                "last_updated": position["last_updated"],
+                                "_id": {"$gt": position["_id"]},
+                            },
+                        ]
+                    },
+                ]
+            }
+            skip = 0
+        return query, page_query, skip, limit
 
     @classmethod
     async def list(
@@ -41,31 +750,220 @@ class Crud:
         Args:
             module (ModuleID): The OCPI module
             role (RoleEnum): The role of the caller
-            filters (dict): OCPI pagination filters
+            filters (dict): OCPI pagination filters, with an optional opaque `cursor`
+                to seek from instead of `offset`
 
         Keyword Args:
             auth_token (str): The authentication token used by third party
             version (VersionNumber): The version number of the caller OCPI module
             party_id (CiString(3)): The requested party ID
             country_code (CiString(2)): The requested Country code
+            count_strategy (CountStrategy): How the total number of objects is computed
 
         Returns:
             Tuple[list, int, bool]: Objects list, Total number of objects, if it's the last page or not(for pagination)
         """
-        collection = cls._database[module.value]
-        cursor = collection.find(filters)
-
-        # Apply pagination if needed
-        limit = kwargs.get("limit", 10)
-        skip = kwargs.get("skip", 0)
-        cursor = cursor.skip(skip).limit(limit)
+        collection = cls._read_collection(module, role, "list")
+        query, page_query, skip, limit = cls._page_query(filters, **kwargs)
 
-        documents = await cursor.to_list(length=limit)
-        total_count = await collection.count_documents(filters)
-        is_last_page = (skip + limit) >= total_count
+        # One extra object tells if there is a next page without relying on the count
+        cursor = collection.find(page_query).sort(LIST_SORT).skip(skip).limit(limit + 1)
+        documents = await cursor.to_list(length=limit + 1)
+        is_last_page = len(documents) <= limit
+        documents = documents[:limit]
+        total_count = await cls._count(
+            collection, query, kwargs.get("count_strategy", CountStrategy.exact)
+        )
 
+        await cls._merge_stored(module, documents)
         return documents, total_count, is_last_page
 
+    @classmethod
+    async def iterate(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> Tuple[AsyncIterator[dict], int, bool, Optional[dict]]:
+        """Get the list of objects as an async iterator, without holding the page in memory
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            filters (dict): OCPI pagination filters, with an optional opaque `cursor`
+                to seek from instead of `offset`
+
+        Keyword Args:
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)): The requested party ID
+            country_code (CiString(2)): The requested Country code
+            count_strategy (CountStrategy): How the total number of objects is computed
+
+        Returns:
+            Tuple[AsyncIterator[dict], int, bool, Optional[dict]]: Objects iterator, Total number of objects,
+                if it's the last page or not and the `last_updated`/`_id` of the last object of the page
+                (for the next page cursor, None on the last page)
+        """
+        collection = cls._read_collection(module, role, "list")
+        query, page_query, skip, limit = cls._page_query(filters, **kwargs)
+
+        # the end of the page is found on the (last_updated, _id) index alone, before streaming
+        bounds = (
+            await collection.find(page_query, {"last_updated": 1})
+            .sort(LIST_SORT)
+            .skip(skip + max(limit - 1, 0))
+            .limit(2)
+            .to_list(length=2)
+        )
+        is_last_page = len(bounds) < (2 if limit else 1)
+        last = bounds[0] if limit and not is_last_page else None
+        total_count = await cls._count(
+            collection, query, kwargs.get("count_strategy", CountStrategy.exact)
+        )
+
+        if not limit:
+            # a zero limit means no limit to the database
+            return _no_documents(), total_count, is_last_page, last
+        cursor = (
+            collection.find(page_query)
+            .sort(LIST_SORT)
+            .skip(skip)
+            .limit(limit)
+            .batch_size(settings.LIST_STREAM_BATCH_SIZE)
+        )
+        if cls._stored_apart(module):
+            cursor = cls._merge_cursor(module, cursor, settings.LIST_STREAM_BATCH_SIZE)
+        return cursor, total_count, is_last_page, last
+
+    @classmethod
+    async def export(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> AsyncIterator[dict]:
+        """Get every object of the date window as an async iterator, for full exports
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            filters (dict): OCPI `date_from`/`date_to` filters, pagination is ignored
+
+        Keyword Args:
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+
+        Returns:
+            AsyncIterator[dict]: Objects iterator, in list order
+        """
+        collection = cls._read_collection(module, role, "export")
+        cursor = (
+            collection.find(list_query(filters))
+            .sort(LIST_SORT)
+            .batch_size(settings.EXPORT_BATCH_SIZE)
+        )
+        if cls._stored_apart(module):
+            return cls._merge_cursor(module, cursor, settings.EXPORT_BATCH_SIZE)
+        return cursor
+
+    @classmethod
+    async def changes(
+        cls, module: ModuleID, role: RoleEnum, position: Optional[dict], *args, **kwargs
+    ) -> Tuple[List[dict], bool, Optional[dict]]:
+        """Get the objects written or deleted after a change log position
+
+        Only the last change of an object is returned, with the current object data.
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            position (Optional[dict]): The `seq` of the last change log entry already read,
+                None to read from the start of the change log
+
+        Keyword Args:
+            limit (int): Number of change log entries read, CHANGE_FEED_LIMIT by default
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+
+        Returns:
+            Tuple[List[dict], bool, Optional[dict]]: The changes (`type`, `key` with the object
+                identifiers and, for upserts, the object `data`), if there are no more changes
+                to read and the last change log entry read (None when nothing was read)
+        """
+        limit = kwargs.get("limit") or settings.CHANGE_FEED_LIMIT
+        query = {"module": module.value}
+        if position:
+            query["seq"] = {"$gt": position["seq"]}
+        entries = (
+            await cls._database[CHANGE_LOG_COLLECTION]
+            .find(query)
+            .sort("seq", ASCENDING)
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+        is_last_page = len(entries) <= limit
+        entries = entries[:limit]
+        committed = committed_entries(entries, position["seq"] if position else None)
+        if len(committed) < len(entries):
+            # a write still in progress, the entries following it are read on the next call
+            is_last_page, entries = True, committed
+
+        changes = coalesce_changes(entries)
+        upserted = [
+            change["key"] for change in changes if change["type"] == ChangeType.upsert
+        ]
+        documents = []
+        if upserted:
+            documents = await cls._merge_stored(
+                module,
+                await cls._read_collection(module, role, "changes")
+                .find({"$or": upserted})
+                .to_list(length=None),
+            )
+
+        result = []
+        for change in changes:
+            if change["type"] == ChangeType.delete:
+                result.append({"type": ChangeType.delete, "key": change["key"]})
+                continue
+            document = next(
+                (
+                    document
+                    for document in documents
+                    if _matches(document, change["key"])
+                ),
+                None,
+            )
+            # objects gone since are skipped, their deletion is further in the change log
+            if document is not None:
+                result.append(
+                    {"type": ChangeType.upsert, "key": change["key"], "data": document}
+                )
+        return result, is_last_page, entries[-1] if entries else None
+
+    @classmethod
+    async def geo_search(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> List[dict]:
+        """Get the Locations within a radius or a bounding box, through the 2dsphere index
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            filters (dict): `latitude`, `longitude` and `radius` (meters), or `bbox`
+                (min longitude, min latitude, max longitude, max latitude), and `limit`
+
+        Keyword Args:
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+
+        Returns:
+            List[dict]: The Locations, nearest first for a radius search
+        """
+        collection = cls._read_collection(module, role, "search")
+        limit = filters["limit"]
+        return await cls._merge_statuses(
+            module,
+            await collection.find(geo_query(filters))
+            .limit(limit)
+            .to_list(length=limit),
+        )
+
     @classmethod
     async def create(
         cls, module: ModuleID, role: RoleEnum, data: dict, *args, **kwargs
@@ -90,9 +988,34 @@ class Crud:
             Any: The created object data
         """
         collection = cls._database[module.value]
-        result = await collection.insert_one(data)
-        created_document = await collection.find_one({"_id": result.inserted_id})
-        return created_document
+        document, statuses = with_geo_point(module, data), []
+        if cls._status_store(module):
+            document, statuses = cls._status_requests(
+                data["id"],
+                document,
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        periods = []
+        if cls._period_store(module):
+            document, periods = cls._period_requests(
+                data["id"],
+                document,
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        # insert_one sets the generated `_id` on the document, no need to read it back
+        await collection.insert_one(document)
+        if statuses:
+            await cls._write_statuses(statuses)
+            document = {**document, "evses": data["evses"]}
+        if periods:
+            await cls._write_periods(periods)
+            document = {**document, "charging_periods": data["charging_periods"]}
+        await cls._log_changes(
+            module, ChangeType.upsert, [cls._document_query(module, document)]
+        )
+        return document
 
     @classmethod
     async def update(
@@ -113,15 +1036,582 @@ class Crud:
             country_code (CiString(2)): The requested Country code
             token_type (TokenType): The token type
             operation ('credentials', 'registration'): The operation type in credentials and registration process
+            expected_last_updated (DateTime): Only update the object if its stored last_updated
+                still has this value (compare-and-swap)
+            patched_periods (tuple): The `start_date_time` of the charging periods a Session
+                PATCH appends, only these are written with CHARGING_PERIOD_STORE
+
+        Returns:
+            Any: The updated object data, None when no object matched
+        """
+        collection = cls._database[module.value]
+        query = cls._object_query(module, id, **kwargs)
+        if "expected_last_updated" in kwargs:
+            query["last_updated"] = kwargs["expected_last_updated"]
+        data, statuses = with_geo_point(module, data), []
+        if cls._status_store(module):
+            data, statuses = cls._status_requests(id, data, **kwargs)
+        periods = []
+        if cls._period_store(module):
+            patched = kwargs.get("patched_periods")
+            if patched is not None and data.get("charging_periods"):
+                # the other periods of the Session are already stored
+                data = {
+                    **data,
+                    "charging_periods": [
+                        period
+                        for period in data["charging_periods"]
+                        if period["start_date_time"] in patched
+                    ],
+                }
+            data, periods = cls._period_requests(
+                id, data, replace=patched is None, **kwargs
+            )
+        document = await collection.find_one_and_update(
+            query,
+            {"$set": data},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is not None:
+            await cls._write_statuses(statuses)
+            await cls._write_periods(periods)
+            await cls._merge_stored(module, [document])
+            await cls._log_changes(
+                module, ChangeType.upsert, [cls._document_query(module, document)]
+            )
+        return document
+
+    @classmethod
+    async def upsert(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        """Create an object or replace it if it already exists, in a single round trip
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data (dict): The object details
+            id (Any): The ID of the object
+
+        Keyword Args:
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+            token_type (TokenType): The token type
+
+        Returns:
+            Any: The stored object data
+        """
+        collection = cls._database[module.value]
+        document, statuses = with_geo_point(module, data), []
+        if cls._status_store(module):
+            document, statuses = cls._status_requests(
+                id,
+                document,
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        periods = []
+        if cls._period_store(module):
+            document, periods = cls._period_requests(
+                id,
+                document,
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        document = await collection.find_one_and_replace(
+            cls._object_query(module, id, **kwargs),
+            document,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if statuses:
+            await cls._write_statuses(statuses)
+            document["evses"] = data["evses"]
+        if periods:
+            await cls._write_periods(periods)
+            document["charging_periods"] = data["charging_periods"]
+        await cls._log_changes(
+            module, ChangeType.upsert, [cls._document_query(module, document)]
+        )
+        return document
 
+    @classmethod
+    async def bulk_upsert(
+        cls, module: ModuleID, role: RoleEnum, data_list: List[dict], *args, **kwargs
+    ) -> BulkWriteReport:
+        """Create or replace many objects with unordered batched writes
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data_list (List[dict]): The objects details
+
+        Keyword Args:
+            batch_size (int): Number of objects per database call, BULK_WRITE_BATCH_SIZE by default
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+
+        Returns:
+            BulkWriteReport: Number of written objects and the objects that failed
+        """
+        batch_size = kwargs.get("batch_size") or settings.BULK_WRITE_BATCH_SIZE
+        report = BulkWriteReport()
+        for offset in range(0, len(data_list), batch_size):
+            batch = [
+                with_geo_point(module, data)
+                for data in data_list[offset : offset + batch_size]
+            ]
+            statuses = []
+            if cls._status_store(module):
+                for index, data in enumerate(batch):
+                    batch[index], requests = cls._status_requests(
+                        data.get("id"),
+                        data,
+                        country_code=data.get("country_code"),
+                        party_id=data.get("party_id"),
+                    )
+                    statuses.extend(requests)
+            periods = []
+            if cls._period_store(module):
+                for index, data in enumerate(batch):
+                    batch[index], requests = cls._period_requests(
+                        data.get("id"),
+                        data,
+                        country_code=data.get("country_code"),
+                        party_id=data.get("party_id"),
+                    )
+                    periods.extend(requests)
+            await cls._bulk_write(
+                module,
+                [
+                    ReplaceOne(cls._document_query(module, data), data, upsert=True)
+                    for data in batch
+                ],
+                [data.get("uid", data.get("id")) for data in batch],
+                offset,
+                report,
+            )
+            await cls._write_statuses(statuses)
+            await cls._write_periods(periods)
+        failed = {failure.index for failure in report.failures}
+        await cls._log_changes(
+            module,
+            ChangeType.upsert,
+            [
+                cls._document_query(module, data)
+                for index, data in enumerate(data_list)
+                if index not in failed
+            ],
+        )
+        return report
+
+    @classmethod
+    async def bulk_delete(
+        cls, module: ModuleID, role: RoleEnum, ids: list, *args, **kwargs
+    ) -> BulkWriteReport:
+        """Delete many objects with unordered batched writes
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            ids (list): The IDs of the objects
+
+        Keyword Args:
+            batch_size (int): Number of objects per database call, BULK_WRITE_BATCH_SIZE by default
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+
+        Returns:
+            BulkWriteReport: Number of deleted objects and the objects that failed
+        """
+        batch_size = kwargs.get("batch_size") or settings.BULK_WRITE_BATCH_SIZE
+        report = BulkWriteReport()
+        for offset in range(0, len(ids), batch_size):
+            batch = ids[offset : offset + batch_size]
+            await cls._bulk_write(
+                module,
+                [DeleteOne(cls._object_query(module, id, **kwargs)) for id in batch],
+                batch,
+                offset,
+                report,
+            )
+            if cls._status_store(module):
+                await cls._write_statuses(
+                    [DeleteMany(cls._status_key(id, **kwargs)) for id in batch]
+                )
+            if cls._period_store(module):
+                await cls._write_periods(
+                    [DeleteMany(cls._period_key(id, **kwargs)) for id in batch]
+                )
+        failed = {failure.index for failure in report.failures}
+        await cls._log_changes(
+            module,
+            ChangeType.delete,
+            [
+                cls._object_query(module, id, **kwargs)
+                for index, id in enumerate(ids)
+                if index not in failed
+            ],
+        )
+        return report
+
+    @classmethod
+    async def update_sub_object(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        """Create or replace an EVSE or a Connector in place, without rewriting its Location
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data (dict): The EVSE or Connector details
+            id (Any): The ID of the Location
+
+        Keyword Args:
+            evse_uid (CiString(36)): The uid of the EVSE
+            connector_id (CiString(36)): The id of the Connector, when updating a Connector
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+            expected_last_updated (DateTime): Only replace the EVSE or Connector if it exists and
+                its stored last_updated still has this value (compare-and-swap)
+
+        Returns:
+            Any: The stored EVSE or Connector data, None when expected_last_updated did not match
+
+        Raises:
+            NotFoundOCPIError: The Location (or the EVSE of the Connector) does not exist
+        """
+        collection = cls._database[module.value]
+        query = cls._object_query(module, id, **kwargs)
+        evse_uid, connector_id = kwargs["evse_uid"], kwargs.get("connector_id")
+        path, array_filters = sub_object_path(evse_uid, connector_id)
+
+        statuses = []
+        if cls._status_store(module) and connector_id is None:
+            location_part, statuses = cls._status_requests(
+                id, {"evses": [data]}, replace=False, **kwargs
+            )
+            stored = location_part["evses"][0]
+        else:
+            stored = data
+
+        # parents are considered updated as well
+        touched = {}
+        if data.get("last_updated"):
+            touched["last_updated"] = data["last_updated"]
+            if connector_id is not None:
+                touched["evses.$[e].last_updated"] = data["last_updated"]
+
+        if connector_id is None:
+            existing = {"evses.uid": evse_uid}
+            missing = {"evses.uid": {"$ne": evse_uid}}
+            push = {"$push": {"evses": stored}}
+        else:
+            existing = {
+                "evses": {
+                    "$elemMatch": {"uid": evse_uid, "connectors.id": connector_id}
+                }
+            }
+            missing = {
+                "evses": {
+                    "$elemMatch": {
+                        "uid": evse_uid,
+                        "connectors.id": {"$ne": connector_id},
+                    }
+                }
+            }
+            push = {"$push": {"evses.$[e].connectors": stored}}
+
+        if "expected_last_updated" in kwargs:
+            expected = kwargs["expected_last_updated"]
+            if connector_id is None:
+                match = {"uid": evse_uid, "last_updated": expected}
+            else:
+                match = {
+                    "uid": evse_uid,
+                    "connectors": {
+                        "$elemMatch": {"id": connector_id, "last_updated": expected}
+                    },
+                }
+            result = await collection.update_one(
+                {**query, "evses": {"$elemMatch": match}},
+                {"$set": {path: stored, **touched}},
+                array_filters=array_filters,
+            )
+            if not result.matched_count:
+                return None
+            await cls._write_statuses(statuses)
+            await cls._log_changes(module, ChangeType.upsert, [query])
+            return data
+
+        # a second pass covers the object being added concurrently between the two writes
+        for _ in range(2):
+            result = await collection.update_one(
+                {**query, **existing},
+                {"$set": {path: stored, **touched}},
+                array_filters=array_filters,
+            )
+            if result.matched_count:
+                await cls._write_statuses(statuses)
+                await cls._log_changes(module, ChangeType.upsert, [query])
+                return data
+
+            result = await collection.update_one(
+                {**query, **missing},
+                {**push, "$set": touched} if touched else push,
+                array_filters=array_filters[:1] if connector_id is not None else None,
+            )
+            if result.matched_count:
+                await cls._write_statuses(statuses)
+                await cls._log_changes(module, ChangeType.upsert, [query])
+                return data
+
+        raise NotFoundOCPIError
+
+    @classmethod
+    async def update_evse_status(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        """Update the status fields of an EVSE without rewriting its Location
+
+        With the EVSE_STATUS_STORE setting, `status` and `status_schedule` are set in the EVSE
+        status collection and only the `last_updated` of the EVSE and its Location are moved
+        forward, updates older than the stored status are ignored. Otherwise they are set in
+        place in the Location.
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data (dict): `status`, `status_schedule` and/or `last_updated` of the EVSE
+            id (Any): The ID of the Location
+
+        Keyword Args:
+            evse_uid (CiString(36)): The uid of the EVSE
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+
+        Returns:
+            Any: The written status fields
+
+        Raises:
+            NotFoundOCPIError: The Location or the EVSE does not exist
+        """
+        evse_uid = kwargs["evse_uid"]
+        collection = cls._database[module.value]
+        statuses = cls._database[EVSE_STATUS_COLLECTION]
+        query = cls._object_query(module, id, **kwargs)
+        _, status = split_evse_status(data)
+        last_updated = data.get("last_updated")
+        touched = {}
+        if last_updated:
+            touched = {
+                "$max": {
+                    "last_updated": last_updated,
+                    "evses.$[e].last_updated": last_updated,
+                }
+            }
+
+        if not cls._status_store(module):
+            result = await collection.update_one(
+                {**query, "evses.uid": evse_uid},
+                {
+                    "$set": {
+                        f"evses.$[e].{field}": value for field, value in status.items()
+                    },
+                    **touched,
+                },
+                array_filters=[{"e.uid": evse_uid}],
+            )
+            if not result.matched_count:
+                raise NotFoundOCPIError
+            await cls._log_changes(module, ChangeType.upsert, [query])
+            return data
+
+        key = cls._status_key(id, evse_uid, **kwargs)
+        newer = key
+        if last_updated:
+            newer = {
+                **key,
+                "$or": [
+                    {"last_updated": {"$lte": last_updated}},
+                    {"last_updated": None},
+                ],
+            }
+        update = {"$set": {**status, "last_updated": last_updated}}
+        result = await statuses.update_one(newer, update)
+        if not result.matched_count:
+            # first status of an EVSE written before the status store was enabled
+            if not await collection.count_documents(
+                {**query, "evses.uid": evse_uid}, limit=1
+            ):
+                raise NotFoundOCPIError
+            try:
+                await statuses.update_one(newer, update, upsert=True)
+            except DuplicateKeyError:
+                # a newer status is stored
+                return data
+
+        if touched:
+            await collection.update_one(
+                query, touched, array_filters=[{"e.uid": evse_uid}]
+            )
+        await cls._log_changes(module, ChangeType.upsert, [query])
+        return data
+
+    @classmethod
+    async def partial_update(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        """Set some fields of an object in place, without reading it
+
+        Each patched field is set through its path and `last_updated` only moves forward,
+        in a single write returning the updated object.
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data (dict): The fields to set
+            id (Any): The ID of the object
+
+        Keyword Args:
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+            token_type (TokenType): The token type
 
         Returns:
             Any: The updated object data
+
+        Raises:
+            NotFoundOCPIError: The object does not exist
         """
         collection = cls._database[module.value]
-        result = await collection.insert_one(data)
-        created_document = await collection.find_one({"_id": result.inserted_id})
-        return created_document
+        query = cls._object_query(module, id, **kwargs)
+        data, statuses = with_geo_point(module, data), []
+        if cls._status_store(module):
+            data, statuses = cls._status_requests(id, data, **kwargs)
+        periods = []
+        if cls._period_store(module):
+            # the patched periods are added to the stored ones
+            data, periods = cls._period_requests(id, data, replace=False, **kwargs)
+
+        update = patch_update(data)
+        if module == ModuleID.sessions and "charging_periods" in data:
+            update = append_periods_update(update, data["charging_periods"] or [])
+        if update:
+            document = await collection.find_one_and_update(
+                query, update, return_document=ReturnDocument.AFTER
+            )
+        else:
+            document = await collection.find_one(query)
+        if document is None:
+            raise NotFoundOCPIError
+
+        await cls._write_statuses(statuses)
+        await cls._write_periods(periods)
+        await cls._merge_stored(module, [document])
+        await cls._log_changes(
+            module, ChangeType.upsert, [cls._document_query(module, document)]
+        )
+        return document
+
+    @classmethod
+    async def patch_sub_object(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        """Set some fields of an EVSE or a Connector in place, without reading its Location
+
+        Meant for partial updates of plain fields: each field is set through its dotted path
+        and the `last_updated` of the object and of its parents only move forward, in a
+        single write returning the updated object.
+
+        Args:
+            module (ModuleID): The OCPI module
+            role (RoleEnum): The role of the caller
+            data (dict): The fields to set
+            id (Any): The ID of the Location
+
+        Keyword Args:
+            evse_uid (CiString(36)): The uid of the EVSE
+            connector_id (CiString(36)): The id of the Connector, when updating a Connector
+            auth_token (str): The authentication token used by third party
+            version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
+
+        Returns:
+            Any: The updated EVSE or Connector data
+
+        Raises:
+            NotFoundOCPIError: The Location, the EVSE or the Connector does not exist
+        """
+        collection = cls._database[module.value]
+        query = cls._object_query(module, id, **kwargs)
+        evse_uid, connector_id = kwargs["evse_uid"], kwargs.get("connector_id")
+        path, array_filters = sub_object_path(evse_uid, connector_id)
+
+        fields, status = data, {}
+        if cls._status_store(module) and connector_id is None:
+            fields, status = split_evse_status(data)
+            if status:
+                await cls.update_evse_status(
+                    module,
+                    role,
+                    {**status, "last_updated": data.get("last_updated")},
+                    id,
+                    **kwargs,
+                )
+
+        update = patch_update(
+            {**fields, "last_updated": data.get("last_updated")},
+            path,
+            parents=("evses.$[e]",),
+        )
+
+        match = {"uid": evse_uid}
+        if connector_id is not None:
+            match["connectors.id"] = connector_id
+        uid = data.get("uid", evse_uid) if connector_id is None else evse_uid
+        projection = {"_id": 0, "evses": {"$elemMatch": {"uid": uid}}}
+        if update:
+            document = await collection.find_one_and_update(
+                {**query, "evses": {"$elemMatch": match}},
+                update,
+                projection=projection,
+                array_filters=array_filters,
+                return_document=ReturnDocument.AFTER,
+            )
+        else:
+            document = await collection.find_one(
+                {**query, "evses": {"$elemMatch": match}}, projection
+            )
+        if not document:
+            raise NotFoundOCPIError
+        await cls._log_changes(module, ChangeType.upsert, [query])
+
+        evse = document["evses"][0]
+        if connector_id is None:
+            if cls._status_store(module):
+                stored = await cls._database[EVSE_STATUS_COLLECTION].find_one(
+                    cls._status_key(id, uid, **kwargs)
+                )
+                evse.update(split_evse_status(stored or {})[1])
+            return evse
+        connector_id = data.get("id", connector_id)
+        return next(
+            connector
+            for connector in evse.get("connectors", [])
+            if connector["id"] == connector_id
+        )
 
     @classmethod
     async def delete(cls, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
@@ -135,9 +1625,22 @@ class Crud:
         Keyword Args:
             auth_token (str): The authentication token used by third party
             version (VersionNumber): The version number of the caller OCPI module
+            party_id (CiString(3)):  The requested party ID
+            country_code (CiString(2)): The requested Country code
         """
         collection = cls._database[module.value]
-        result = await collection.delete_one({"_id": id})
+        query = cls._object_query(module, id, **kwargs)
+        result = await collection.delete_one(query)
+        if result.deleted_count:
+            if cls._status_store(module):
+                await cls._database[EVSE_STATUS_COLLECTION].delete_many(
+                    cls._status_key(id, **kwargs)
+                )
+            if cls._period_store(module):
+                await cls._database[CHARGING_PERIOD_COLLECTION].delete_many(
+                    cls._period_key(id, **kwargs)
+                )
+            await cls._log_changes(module, ChangeType.delete, [query])
         return result.deleted_count > 0  # Returns True if a document was deleted
 
     @classmethod
@@ -148,7 +1651,7 @@ class Crud:
         action: Action,
         *args,
         data: dict = None,
-        **kwargs
+        **kwargs,
     ) -> Any:
         """Do an action (non-CRUD)
 
@@ -1,4 +1,13 @@
+from functools import lru_cache
+
 from motor import motor_asyncio, core
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
 
 from ocpi.core.config import settings
 
@@ -23,8 +32,49 @@ async def ping():
     await get_db().command("ping")
 
 
+@lru_cache
+def read_preference(mode: str, max_staleness: int = -1):
+    """Build the pymongo read preference of a mode name
+
+    Args:
+        mode (str): 'primary', 'primaryPreferred', 'secondary', 'secondaryPreferred' or 'nearest'
+        max_staleness (int, optional): Max replication lag in seconds of the secondaries read from,
+            -1 for no bound, ignored for 'primary'
+
+    Returns:
+        The read preference to pass to `with_options`
+    """
+    if mode == "primary":
+        return Primary()
+    modes = {
+        "primaryPreferred": PrimaryPreferred,
+        "secondary": Secondary,
+        "secondaryPreferred": SecondaryPreferred,
+        "nearest": Nearest,
+    }
+    if mode not in modes:
+        raise ValueError(f"Unknown read preference {mode}")
+    return modes[mode](max_staleness=max_staleness)
+
+
+def get_read_preference(module: str, operation: str):
+    """Read preference configured in READ_PREFERENCES for a module operation
+
+    `module.operation` entries take precedence over `module` ones.
+
+    Returns:
+        The read preference, None when reads stay on the client default (primary)
+    """
+    mode = settings.READ_PREFERENCES.get(
+        f"{module}.{operation}", settings.READ_PREFERENCES.get(module)
+    )
+    if mode is None:
+        return None
+    return read_preference(mode, settings.READ_MAX_STALENESS)
+
+
 def client_close():
     return _MongoClientSingleton().mongo_client
 
 
-__all__ = ["client_close", "get_db", "ping"]
+__all__ = ["client_close", "get_db", "get_read_preference", "ping"]
@@ -1,11 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-from fastapi import Query
+from fastapi import HTTPException, Query, status as fastapistatus
 
 from ocpi.core.adapter import Adapter
 from ocpi.core.config import settings
 from ocpi.core.crud import Crud
 from ocpi.core.data_types import URL
+from ocpi.core.utils import decode_cursor, decode_resume_token
 from ocpi.modules.versions.enums import VersionNumber
 from ocpi.modules.versions.schemas import Version
 
@@ -35,13 +36,105 @@ def get_endpoints():
 
 def pagination_filters(
     date_from: datetime = Query(default=None),
-    date_to: datetime = Query(default=datetime.now()),
+    date_to: datetime = Query(default=None),
     offset: int = Query(default=0),
     limit: int = Query(default=50),
+    cursor: str = Query(default=None),
 ):
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(fastapistatus.HTTP_400_BAD_REQUEST, str(e)) from e
     return {
         "date_from": date_from,
         "date_to": date_to,
         "offset": offset,
         "limit": limit,
+        "cursor": cursor,
+    }
+
+
+def export_filters(
+    date_from: datetime = Query(default=None),
+    date_to: datetime = Query(default=None),
+):
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
+def change_feed_filters(
+    token: str = Query(default=None),
+    limit: int = Query(default=None),
+):
+    position = None
+    if token:
+        try:
+            position = decode_resume_token(token)
+        except ValueError as e:
+            raise HTTPException(fastapistatus.HTTP_400_BAD_REQUEST, str(e)) from e
+        # the change log entries older than CHANGE_LOG_TTL are gone, changes would be missed
+        created = position["created"]
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        if (
+            datetime.now(timezone.utc) - created
+        ).total_seconds() > settings.CHANGE_LOG_TTL:
+            raise HTTPException(
+                fastapistatus.HTTP_410_GONE,
+                "resume token expired, resync from the list endpoint",
+            )
+    if limit is not None:
+        limit = max(1, min(limit, settings.CHANGE_FEED_LIMIT))
+    return {
+        "position": position,
+        "token": token,
+        "limit": limit,
+    }
+
+
+def geo_filters(
+    latitude: float = Query(default=None),
+    longitude: float = Query(default=None),
+    radius: float = Query(default=None),
+    bbox: str = Query(default=None),
+    limit: int = Query(default=50),
+):
+    # a bounding box is given as min longitude,min latitude,max longitude,max latitude
+    if bbox:
+        try:
+            bounds = [float(value) for value in bbox.split(",")]
+        except ValueError:
+            bounds = []
+        if (
+            len(bounds) != 4
+            or not -180 <= bounds[0] <= bounds[2] <= 180
+            or not -90 <= bounds[1] <= bounds[3] <= 90
+        ):
+            raise HTTPException(fastapistatus.HTTP_400_BAD_REQUEST, "invalid bbox")
+        return {
+            "bbox": bounds,
+            "limit": max(1, min(limit, settings.GEO_SEARCH_MAX_LIMIT)),
+        }
+
+    if latitude is None or longitude is None or radius is None:
+        raise HTTPException(
+            fastapistatus.HTTP_400_BAD_REQUEST,
+            "bbox, or latitude, longitude and radius are required",
+        )
+    if (
+        not -90 <= latitude <= 90
+        or not -180 <= longitude <= 180
+        or not 0 < radius <= settings.GEO_SEARCH_MAX_RADIUS
+    ):
+        raise HTTPException(
+            fastapistatus.HTTP_400_BAD_REQUEST, "invalid latitude, longitude or radius"
+        )
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "radius": radius,
+        "limit": max(1, min(limit, settings.GEO_SEARCH_MAX_LIMIT)),
     }
@@ -45,3 +45,21 @@ class Action(str, Enum):
     get_client_token = "GetClientToken"  # nosec
     # used for authorizing a token
     authorize_token = "AuthorizeToken"  # nosec
+    # used for getting the receivers an object changed in the database is pushed to
+    get_push_receivers = "GetPushReceivers"
+
+
+class CountStrategy(str, Enum):
+    # count_documents on every list request
+    exact = "EXACT"
+    # count_documents result kept for COUNT_CACHE_TTL seconds and refreshed in background
+    cached = "CACHED"
+    # collection metadata count, only when the list is not filtered
+    estimated = "ESTIMATED"
+
+
+class ChangeType(str, Enum):
+    # the object was created or replaced, or one of its fields or sub-objects changed
+    upsert = "UPSERT"
+    # the object was deleted
+    delete = "DELETE"
@@ -12,3 +12,8 @@ class AuthorizationOCPIError(OCPIError):
 class NotFoundOCPIError(OCPIError):
     def __str__(self):
         return "Object not found."
+
+
+class ConflictOCPIError(OCPIError):
+    def __str__(self):
+        return "Object was modified concurrently, try again."
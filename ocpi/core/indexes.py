@@ -0,0 +1,126 @@
+import logging
+from typing import Dict, List, Union
+
+from motor.core import AgnosticDatabase
+from pymongo.errors import OperationFailure
+
+from ocpi.core.config import settings
+from ocpi.core.crud import (
+    CHANGE_LOG_COLLECTION,
+    CHARGING_PERIOD_COLLECTION,
+    EVSE_STATUS_COLLECTION,
+)
+from ocpi.core.enums import ModuleID
+from ocpi.core.schemas import IndexSpec
+from ocpi.modules.cdrs.v_2_2_1.indexes import INDEXES as CDRS_INDEXES
+from ocpi.modules.locations.v_2_2_1.indexes import INDEXES as LOCATIONS_INDEXES
+from ocpi.modules.sessions.v_2_2_1.indexes import INDEXES as SESSIONS_INDEXES
+from ocpi.modules.tariffs.v_2_2_1.indexes import INDEXES as TARIFFS_INDEXES
+from ocpi.modules.tokens.v_2_2_1.indexes import INDEXES as TOKENS_INDEXES
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    ModuleID.cdrs: CDRS_INDEXES,
+    ModuleID.locations: LOCATIONS_INDEXES,
+    ModuleID.sessions: SESSIONS_INDEXES,
+    ModuleID.tariffs: TARIFFS_INDEXES,
+    ModuleID.tokens: TOKENS_INDEXES,
+}
+
+if settings.CHANGE_LOG_MODULES:
+    INDEXES[CHANGE_LOG_COLLECTION] = [
+        # delta feed of a module, read from a resume token
+        IndexSpec(keys=[("module", 1), ("seq", 1)]),
+        # entries expire CHANGE_LOG_TTL seconds after the write
+        IndexSpec(keys=[("created", 1)], expire_after_seconds=settings.CHANGE_LOG_TTL),
+    ]
+
+if settings.EVSE_STATUS_STORE:
+    INDEXES[EVSE_STATUS_COLLECTION] = [
+        # one status per EVSE, read by Location
+        IndexSpec(
+            keys=[
+                ("location_id", 1),
+                ("evse_uid", 1),
+                ("country_code", 1),
+                ("party_id", 1),
+            ],
+            unique=True,
+        ),
+    ]
+
+if settings.CHARGING_PERIOD_STORE:
+    INDEXES[CHARGING_PERIOD_COLLECTION] = [
+        # one document per period, read by Session in start order
+        IndexSpec(
+            keys=[
+                ("session_id", 1),
+                ("country_code", 1),
+                ("party_id", 1),
+                ("start_date_time", 1),
+            ],
+            unique=True,
+        ),
+    ]
+
+
+async def reconcile_indexes(
+    database: AgnosticDatabase,
+    indexes: Dict[Union[ModuleID, str], List[IndexSpec]] = None,
+) -> Dict[str, List[str]]:
+    """Create the missing declared indexes and report the ones that drifted
+
+    Existing indexes are never dropped or rebuilt, so running it on every startup is safe.
+    An index the stored documents do not allow, like a unique index over duplicates, is
+    reported as drifted and logged with the offending key.
+
+    Args:
+        database (AgnosticDatabase): The database holding the module collections
+        indexes (Dict[Union[ModuleID, str], List[IndexSpec]], optional): The declared indexes
+            per module, or per collection name for the collections shared by the modules
+
+    Returns:
+        Dict[str, List[str]]: The `created` and `drifted` indexes as `collection.index_name`
+    """
+    indexes = INDEXES if indexes is None else indexes
+    report = {"created": [], "drifted": []}
+
+    for module, specs in indexes.items():
+        name = module.value if isinstance(module, ModuleID) else module
+        collection = database[name]
+        existing = await collection.index_information()
+
+        for spec in specs:
+            index = f"{name}.{spec.name}"
+            current = existing.get(spec.name)
+            if current is None:
+                options = {}
+                if spec.expire_after_seconds is not None:
+                    options["expireAfterSeconds"] = spec.expire_after_seconds
+                try:
+                    await collection.create_index(
+                        spec.keys, name=spec.name, unique=spec.unique, **options
+                    )
+                except OperationFailure as e:
+                    logger.error(
+                        "Index %s could not be created, duplicate key %s: %s",
+                        index,
+                        (e.details or {}).get("keyValue"),
+                        e,
+                    )
+                    report["drifted"].append(index)
+                    continue
+                logger.info("Created index %s", index)
+                report["created"].append(index)
+            elif (
+                [tuple(key) for key in current["key"]] != spec.keys
+                or bool(current.get("unique", False)) != spec.unique
+                or current.get("expireAfterSeconds") != spec.expire_after_seconds
+            ):
+                logger.warning(
+                    "Index %s differs from its declaration %s", index, spec.dict()
+                )
+                report["drifted"].append(index)
+
+    return report
@@ -0,0 +1,593 @@
+import copy
+import itertools
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from ocpi.core.config import settings
+from ocpi.core.crud import (
+    LIST_MODULES,
+    Crud,
+    change_entry,
+    coalesce_changes,
+    geo_point,
+    list_query,
+    merge_charging_periods,
+    split_evse_status,
+)
+from ocpi.core.enums import Action, ChangeType, ModuleID, RoleEnum
+from ocpi.core.exceptions import NotFoundOCPIError
+from ocpi.core.schemas import BulkWriteReport
+from ocpi.core.utils import decode_cursor
+
+
+def _distance(a: List[float], b: List[float]) -> float:
+    # haversine distance in meters between two [longitude, latitude] points
+    longitude_a, latitude_a, longitude_b, latitude_b = map(math.radians, a + b)
+    h = (
+        math.sin((latitude_b - latitude_a) / 2) ** 2
+        + math.cos(latitude_a)
+        * math.cos(latitude_b)
+        * math.sin((longitude_b - longitude_a) / 2) ** 2
+    )
+    return 2 * 6378100 * math.asin(math.sqrt(h))
+
+
+async def _iterate(documents: List[dict]) -> AsyncIterator[dict]:
+    for document in documents:
+        yield document
+
+
+class _Collection:
+    """Documents of one module with the indexes declared for its Mongo collection
+
+    - hash index on (country_code, party_id, id), `uid` and `type` for tokens
+    - hash index on the object id alone, for lookups without country_code/party_id
+    - sorted index on (last_updated, _id), the list order
+    """
+
+    def __init__(self, module: ModuleID):
+        self.module = module
+        self.documents: Dict[int, dict] = {}
+        self.keys: Dict[Tuple, int] = {}
+        self.ids: Dict[Any, Set[int]] = defaultdict(set)
+        self.timeline: List[Tuple[str, int]] = []
+        self._next_id = itertools.count(1)
+
+    def object_id(self, document: dict):
+        if self.module == ModuleID.tokens:
+            return document.get("uid")
+        if self.module in LIST_MODULES:
+            return document.get("id")
+        return document.get("_id")
+
+    def key(self, document: dict) -> Tuple:
+        return (
+            document.get("country_code"),
+            document.get("party_id"),
+            self.object_id(document),
+            document.get("type") if self.module == ModuleID.tokens else None,
+        )
+
+    @staticmethod
+    def position(document: dict) -> Tuple[str, int]:
+        return str(document.get("last_updated") or ""), document["_id"]
+
+    def find(self, id, **kwargs) -> dict:
+        token_type = (
+            kwargs.get("token_type") if self.module == ModuleID.tokens else None
+        )
+        country_code, party_id = kwargs.get("country_code"), kwargs.get("party_id")
+        if country_code and party_id and (token_type or self.module != ModuleID.tokens):
+            _id = self.keys.get((country_code, party_id, id, token_type))
+            return self.documents.get(_id)
+
+        for _id in sorted(self.ids.get(id, ())):
+            document = self.documents[_id]
+            if (
+                (not country_code or document.get("country_code") == country_code)
+                and (not party_id or document.get("party_id") == party_id)
+                and (not token_type or document.get("type") == token_type)
+            ):
+                return document
+        return None
+
+    def insert(self, document: dict) -> dict:
+        if not document.get("_id"):
+            document["_id"] = next(self._next_id)
+        previous = self.keys.get(self.key(document))
+        if previous is not None and previous != document["_id"]:
+            # the unique index of the module allows a single object per identifiers
+            self.remove(self.documents[previous])
+
+        self.documents[document["_id"]] = document
+        self.keys[self.key(document)] = document["_id"]
+        self.ids[self.object_id(document)].add(document["_id"])
+        insort(self.timeline, self.position(document))
+        return document
+
+    def remove(self, document: dict):
+        del self.documents[document["_id"]]
+        self.keys.pop(self.key(document), None)
+        self.ids[self.object_id(document)].discard(document["_id"])
+        if not self.ids[self.object_id(document)]:
+            del self.ids[self.object_id(document)]
+        position = self.position(document)
+        index = bisect_left(self.timeline, position)
+        if index < len(self.timeline) and self.timeline[index] == position:
+            del self.timeline[index]
+
+    def replace(self, document: dict, data: dict) -> dict:
+        self.remove(document)
+        return self.insert({**data, "_id": document["_id"]})
+
+    @staticmethod
+    def query(filters: dict) -> dict:
+        # the filters other than the date window, checked on every document
+        return {
+            key: value
+            for key, value in list_query(filters).items()
+            if key != "last_updated"
+        }
+
+    def bounds(self, filters: dict) -> Tuple[int, int]:
+        # timeline positions of the date window, after the cursor, from the sorted index
+        start, end = 0, len(self.timeline)
+        last_updated = list_query(filters).get("last_updated", {})
+        if "$gte" in last_updated:
+            start = bisect_left(self.timeline, (last_updated["$gte"],))
+        if "$lt" in last_updated:
+            end = bisect_left(self.timeline, (last_updated["$lt"],))
+        if filters.get("cursor"):
+            position = decode_cursor(filters["cursor"])
+            start = max(
+                start,
+                bisect_right(
+                    self.timeline, (str(position["last_updated"]), position["_id"])
+                ),
+            )
+        return start, end
+
+    def slice(self, start: int, end: int) -> List[dict]:
+        return [self.documents[_id] for _, _id in self.timeline[start:end]]
+
+    def window(self, filters: dict) -> List[dict]:
+        # objects of the date window in list order, found through the sorted index
+        query = self.query(filters)
+        return [
+            document
+            for document in self.slice(*self.bounds(filters))
+            if all(document.get(key) == value for key, value in query.items())
+        ]
+
+
+class MemoryCrud:
+    """In-process Crud keeping every module in memory, without any database
+
+    It behaves like `ocpi.core.crud.Crud` (same methods, inputs and outputs) and is
+    meant for benchmarks of the HTTP and validation layers and for small read-only
+    replicas. Objects are lost when the process stops. Like `Crud`, `do` is left to
+    the application.
+    """
+
+    _collections: Dict[ModuleID, _Collection] = {}
+    # change log of the modules of CHANGE_LOG_MODULES, in write order, and the last `seq`
+    # given per module
+    _changes: Deque[dict] = deque()
+    _sequences: Dict[str, int] = {}
+
+    @classmethod
+    def _collection(cls, module: ModuleID) -> _Collection:
+        if module not in cls._collections:
+            cls._collections[module] = _Collection(module)
+        return cls._collections[module]
+
+    @classmethod
+    def clear(cls):
+        """Drop every stored object"""
+        cls._collections.clear()
+        cls._changes.clear()
+        cls._sequences.clear()
+
+    @classmethod
+    def _log_changes(cls, module: ModuleID, change_type: ChangeType, keys: List[dict]):
+        if module not in settings.CHANGE_LOG_MODULES:
+            return
+        for key in keys:
+            seq = cls._sequences.get(module.value, 0) + 1
+            cls._sequences[module.value] = seq
+            cls._changes.append({**change_entry(module, change_type, key), "seq": seq})
+
+        # entries expire CHANGE_LOG_TTL seconds after the write, like the TTL index
+        expired = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.CHANGE_LOG_TTL
+        )
+        while cls._changes and cls._changes[0]["created"] < expired:
+            cls._changes.popleft()
+
+    @classmethod
+    async def get(cls, module: ModuleID, role: RoleEnum, id, *args, **kwargs) -> Any:
+        document = cls._collection(module).find(id, **kwargs)
+        if document is None:
+            return None
+
+        evse_uid = kwargs.get("evse_uid")
+        if evse_uid is None:
+            return copy.deepcopy(document)
+        for evse in document.get("evses", []):
+            if evse["uid"] == evse_uid:
+                connector_id = kwargs.get("connector_id")
+                if connector_id is None:
+                    return copy.deepcopy(evse)
+                for connector in evse.get("connectors", []):
+                    if connector["id"] == connector_id:
+                        return copy.deepcopy(connector)
+        return None
+
+    @classmethod
+    async def list(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> Tuple[list, int, bool]:
+        limit = filters.get("limit", kwargs.get("limit", 10))
+        skip = (
+            0 if filters.get("cursor") else filters.get("offset", kwargs.get("skip", 0))
+        )
+
+        collection = cls._collection(module)
+        if not collection.query(filters):
+            # only the date window, the page and the counts come from the sorted index
+            start, end = collection.bounds(filters)
+            page = collection.slice(start + skip, min(start + skip + limit, end))
+            total_count = end - (
+                collection.bounds({**filters, "cursor": None})[0]
+                if filters.get("cursor")
+                else start
+            )
+            return copy.deepcopy(page), total_count, skip + limit >= end - start
+
+        documents = collection.window(filters)
+        page = documents[skip : skip + limit]
+        total_count = len(
+            collection.window({**filters, "cursor": None})
+            if filters.get("cursor")
+            else documents
+        )
+        return copy.deepcopy(page), total_count, skip + limit >= len(documents)
+
+    @classmethod
+    async def iterate(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> Tuple[AsyncIterator[dict], int, bool, Optional[dict]]:
+        documents, total_count, is_last_page = await cls.list(
+            module, role, filters, *args, **kwargs
+        )
+        last = documents[-1] if documents and not is_last_page else None
+        return _iterate(documents), total_count, is_last_page, last
+
+    @classmethod
+    async def export(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> AsyncIterator[dict]:
+        return _iterate(
+            copy.deepcopy(
+                cls._collection(module).window(
+                    {
+                        "date_from": filters.get("date_from"),
+                        "date_to": filters.get("date_to"),
+                    }
+                )
+            )
+        )
+
+    @classmethod
+    async def changes(
+        cls, module: ModuleID, role: RoleEnum, position: Optional[dict], *args, **kwargs
+    ) -> Tuple[List[dict], bool, Optional[dict]]:
+        limit = kwargs.get("limit") or settings.CHANGE_FEED_LIMIT
+        entries = [
+            entry
+            for entry in cls._changes
+            if entry["module"] == module.value
+            and (not position or entry["seq"] > position["seq"])
+        ]
+        is_last_page = len(entries) <= limit
+        entries = entries[:limit]
+
+        changes = []
+        for entry in coalesce_changes(entries):
+            if entry["type"] == ChangeType.delete:
+                changes.append({"type": ChangeType.delete, "key": entry["key"]})
+                continue
+            key = entry["key"]
+            document = cls._collection(module).find(
+                key.get("uid", key.get("id")),
+                country_code=key.get("country_code"),
+                party_id=key.get("party_id"),
+                token_type=key.get("type"),
+            )
+            if document is not None:
+                changes.append(
+                    {
+                        "type": ChangeType.upsert,
+                        "key": key,
+                        "data": copy.deepcopy(document),
+                    }
+                )
+        return changes, is_last_page, entries[-1] if entries else None
+
+    @classmethod
+    async def geo_search(
+        cls, module: ModuleID, role: RoleEnum, filters: dict, *args, **kwargs
+    ) -> List[dict]:
+        located = [
+            (geo_point(document.get("coordinates")), document)
+            for document in cls._collection(module).window({})
+        ]
+        located = [(point["coordinates"], doc) for point, doc in located if point]
+        if filters.get("bbox"):
+            min_longitude, min_latitude, max_longitude, max_latitude = filters["bbox"]
+            documents = [
+                document
+                for (longitude, latitude), document in located
+                if min_longitude <= longitude <= max_longitude
+                and min_latitude <= latitude <= max_latitude
+            ]
+        else:
+            center = [filters["longitude"], filters["latitude"]]
+            distances = [
+                (_distance(center, point), document) for point, document in located
+            ]
+            documents = [
+                document
+                for distance, document in sorted(distances, key=lambda item: item[0])
+                if distance <= filters["radius"]
+            ]
+        return copy.deepcopy(documents[: filters["limit"]])
+
+    @classmethod
+    async def create(
+        cls, module: ModuleID, role: RoleEnum, data: dict, *args, **kwargs
+    ) -> Any:
+        cls._collection(module).insert(copy.deepcopy(data))
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._document_query(module, data)]
+        )
+        return data
+
+    @classmethod
+    async def update(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None or (
+            "expected_last_updated" in kwargs
+            and document.get("last_updated") != kwargs["expected_last_updated"]
+        ):
+            return None
+        document = collection.replace(document, {**document, **copy.deepcopy(data)})
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._document_query(module, document)]
+        )
+        return copy.deepcopy(document)
+
+    @classmethod
+    async def upsert(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None:
+            document = collection.insert(copy.deepcopy(data))
+        else:
+            document = collection.replace(document, copy.deepcopy(data))
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._document_query(module, document)]
+        )
+        return copy.deepcopy(document)
+
+    @classmethod
+    async def bulk_upsert(
+        cls, module: ModuleID, role: RoleEnum, data_list: List[dict], *args, **kwargs
+    ) -> BulkWriteReport:
+        collection = cls._collection(module)
+        for data in data_list:
+            document = collection.find(
+                collection.object_id(data),
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+                token_type=data.get("type"),
+            )
+            if document is None:
+                collection.insert(copy.deepcopy(data))
+            else:
+                collection.replace(document, copy.deepcopy(data))
+        cls._log_changes(
+            module,
+            ChangeType.upsert,
+            [Crud._document_query(module, data) for data in data_list],
+        )
+        return BulkWriteReport(written=len(data_list))
+
+    @classmethod
+    async def update_sub_object(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None:
+            raise NotFoundOCPIError
+
+        location = copy.deepcopy(document)
+        evse_uid, connector_id = kwargs["evse_uid"], kwargs.get("connector_id")
+        evses = location.setdefault("evses", [])
+        evse = next((evse for evse in evses if evse["uid"] == evse_uid), None)
+        if "expected_last_updated" in kwargs:
+            current = evse
+            if evse is not None and connector_id is not None:
+                current = next(
+                    (c for c in evse.get("connectors", []) if c["id"] == connector_id),
+                    None,
+                )
+            if (
+                current is None
+                or current.get("last_updated") != kwargs["expected_last_updated"]
+            ):
+                return None
+
+        if connector_id is None:
+            if evse is None:
+                evses.append(copy.deepcopy(data))
+            else:
+                evses[evses.index(evse)] = copy.deepcopy(data)
+        else:
+            if evse is None:
+                raise NotFoundOCPIError
+            connectors = evse.setdefault("connectors", [])
+            connector = next((c for c in connectors if c["id"] == connector_id), None)
+            if connector is None:
+                connectors.append(copy.deepcopy(data))
+            else:
+                connectors[connectors.index(connector)] = copy.deepcopy(data)
+            if data.get("last_updated"):
+                evse["last_updated"] = data["last_updated"]
+
+        # parents are considered updated as well
+        if data.get("last_updated"):
+            location["last_updated"] = data["last_updated"]
+        collection.replace(document, location)
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._object_query(module, id, **kwargs)]
+        )
+        return data
+
+    @classmethod
+    async def update_evse_status(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        evse_uid = kwargs["evse_uid"]
+        if document is None or not any(
+            evse["uid"] == evse_uid for evse in document.get("evses", [])
+        ):
+            raise NotFoundOCPIError
+
+        location = copy.deepcopy(document)
+        evse = next(evse for evse in location["evses"] if evse["uid"] == evse_uid)
+        _, status = split_evse_status(data)
+        evse.update(copy.deepcopy(status))
+        last_updated = data.get("last_updated")
+        if last_updated:
+            for updated in (evse, location):
+                updated["last_updated"] = max(
+                    str(updated.get("last_updated") or ""), last_updated
+                )
+        collection.replace(document, location)
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._object_query(module, id, **kwargs)]
+        )
+        return data
+
+    @classmethod
+    async def partial_update(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None:
+            raise NotFoundOCPIError
+
+        updated = {**document, **copy.deepcopy(data)}
+        if module == ModuleID.sessions and "charging_periods" in data:
+            updated["charging_periods"] = merge_charging_periods(
+                document.get("charging_periods"), updated["charging_periods"]
+            )
+        if data.get("last_updated"):
+            updated["last_updated"] = max(
+                str(document.get("last_updated") or ""), data["last_updated"]
+            )
+        document = collection.replace(document, updated)
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._document_query(module, document)]
+        )
+        return copy.deepcopy(document)
+
+    @classmethod
+    async def patch_sub_object(
+        cls, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ) -> Any:
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None:
+            raise NotFoundOCPIError
+
+        location = copy.deepcopy(document)
+        evse_uid, connector_id = kwargs["evse_uid"], kwargs.get("connector_id")
+        evse = next(
+            (evse for evse in location.get("evses", []) if evse["uid"] == evse_uid),
+            None,
+        )
+        target = evse
+        if evse is not None and connector_id is not None:
+            target = next(
+                (c for c in evse.get("connectors", []) if c["id"] == connector_id),
+                None,
+            )
+        if target is None:
+            raise NotFoundOCPIError
+
+        target.update(
+            {
+                field: copy.deepcopy(value)
+                for field, value in data.items()
+                if field != "last_updated"
+            }
+        )
+        last_updated = data.get("last_updated")
+        if last_updated:
+            updated_items = [location, evse] + ([target] if target is not evse else [])
+            for updated in updated_items:
+                updated["last_updated"] = max(
+                    str(updated.get("last_updated") or ""), last_updated
+                )
+        collection.replace(document, location)
+        cls._log_changes(
+            module, ChangeType.upsert, [Crud._object_query(module, id, **kwargs)]
+        )
+        return copy.deepcopy(target)
+
+    @classmethod
+    async def delete(cls, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
+        collection = cls._collection(module)
+        document = collection.find(id, **kwargs)
+        if document is None:
+            return False
+        collection.remove(document)
+        cls._log_changes(
+            module, ChangeType.delete, [Crud._object_query(module, id, **kwargs)]
+        )
+        return True
+
+    @classmethod
+    async def bulk_delete(
+        cls, module: ModuleID, role: RoleEnum, ids: list, *args, **kwargs
+    ) -> BulkWriteReport:
+        report = BulkWriteReport()
+        for id in ids:
+            report.written += await cls.delete(module, role, id, **kwargs)
+        return report
+
+    @classmethod
+    async def do(
+        cls,
+        module: ModuleID,
+        role: RoleEnum,
+        action: Action,
+        *args,
+        data: dict = None,
+        **kwargs
+    ) -> Any:
+        pass
@@ -1,15 +1,39 @@
+import asyncio
+import logging
+from typing import Tuple
+
 import httpx
 from fastapi import APIRouter, Request, WebSocket, Depends
+from motor.core import AgnosticDatabase
+from pymongo.errors import OperationFailure, PyMongoError
 
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
 from ocpi.core.schemas import Push, PushResponse, ReceiverResponse
 from ocpi.core.utils import encode_string_base64, get_auth_token
 from ocpi.core.dependencies import get_crud, get_adapter
-from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.enums import Action, ModuleID, RoleEnum
 from ocpi.core.config import settings
 from ocpi.modules.versions.enums import InterfaceRole, VersionNumber
 
+logger = logging.getLogger(__name__)
+
+# Modules whose changes are pushed by ChangeStreamPush
+PUSH_MODULES = (
+    ModuleID.locations,
+    ModuleID.sessions,
+    ModuleID.tariffs,
+    ModuleID.cdrs,
+    ModuleID.tokens,
+)
+
+# Change stream error codes of a resume point no longer in the oplog
+# (ChangeStreamFatalError, ChangeStreamHistoryLost)
+CHANGE_STREAM_HISTORY_LOST_CODES = (280, 286)
+# Change stream error codes no retry fixes: the above without a resume point,
+# Unauthorized, InvalidResumeToken and change streams not supported by the server
+CHANGE_STREAM_FATAL_CODES = (*CHANGE_STREAM_HISTORY_LOST_CODES, 13, 260, 40573)
+
 
 def client_url(module_id: ModuleID, object_id: str, base_url: str) -> str:
     if module_id == ModuleID.cdrs:
@@ -74,7 +98,18 @@ async def push_object(
     crud: Crud,
     adapter: Adapter,
     auth_token: str = None,
+    data: dict = None,
 ) -> PushResponse:
+    # the pushed object is read once for all the receivers, unless the caller has it
+    if data is None:
+        data = await crud.get(
+            push.module_id,
+            RoleEnum.emsp if push.module_id == ModuleID.tokens else RoleEnum.cpo,
+            push.object_id,
+            auth_token=auth_token,
+            version=version,
+        )
+
     receiver_responses = []
     for receiver in push.receivers:
         # get client endpoints
@@ -85,24 +120,6 @@ async def push_object(
             )
             endpoints = response.json()["data"][0]["endpoints"]
 
-        # get object data
-        if push.module_id == ModuleID.tokens:
-            data = await crud.get(
-                push.module_id,
-                RoleEnum.emsp,
-                push.object_id,
-                auth_token=auth_token,
-                version=version,
-            )
-        else:
-            data = await crud.get(
-                push.module_id,
-                RoleEnum.cpo,
-                push.object_id,
-                auth_token=auth_token,
-                version=version,
-            )
-
         response = await send_push_request(
             push.object_id, data, push.module_id, adapter, client_auth_token, endpoints
         )
@@ -126,6 +143,127 @@ async def push_object(
     return PushResponse(receiver_responses=receiver_responses)
 
 
+class ChangeStreamPush:
+    """Push the objects changed in the database to their receivers
+
+    Tails one change stream over the module collections and, for every inserted,
+    replaced or updated object, asks the Crud for its receivers with
+    `Action.get_push_receivers` before calling `push_object`.
+    The stream is resumed after the last handled change when it fails, or from the
+    current changes once that change left the oplog. Errors a retry cannot fix stop it.
+    """
+
+    def __init__(
+        self,
+        modules: Tuple[ModuleID, ...] = PUSH_MODULES,
+        version: VersionNumber = VersionNumber.latest,
+        retry_delay: float = 1,
+    ):
+        self.modules = modules
+        self.version = version
+        self.retry_delay = retry_delay
+        self.resume_token = None
+        self._task: asyncio.Task = None
+
+    def pipeline(self) -> list:
+        return [
+            {
+                "$match": {
+                    "ns.coll": {"$in": [module.value for module in self.modules]},
+                    "operationType": {"$in": ["insert", "replace", "update"]},
+                }
+            }
+        ]
+
+    async def push_change(self, change: dict, crud: Crud, adapter: Adapter):
+        module_id = ModuleID(change["ns"]["coll"])
+        data = change.get("fullDocument")
+        if data is None:
+            # the object was deleted before the change was looked up
+            return
+
+        role = RoleEnum.emsp if module_id == ModuleID.tokens else RoleEnum.cpo
+        receivers = await crud.do(
+            module_id,
+            role,
+            Action.get_push_receivers,
+            data=data,
+            version=self.version,
+        )
+        if not receivers:
+            return
+
+        object_id = data["uid"] if module_id == ModuleID.tokens else data["id"]
+        if Crud._stored_apart(module_id):
+            # EVSE statuses or charging periods are kept apart, read the object whole
+            data = await crud.get(
+                module_id,
+                role,
+                object_id,
+                version=self.version,
+                country_code=data.get("country_code"),
+                party_id=data.get("party_id"),
+            )
+        await push_object(
+            self.version,
+            Push(module_id=module_id, object_id=object_id, receivers=receivers),
+            crud,
+            adapter,
+            data=data,
+        )
+
+    async def watch(self, database: AgnosticDatabase, crud: Crud, adapter: Adapter):
+        while True:
+            try:
+                async with database.watch(
+                    self.pipeline(),
+                    full_document="updateLookup",
+                    resume_after=self.resume_token,
+                ) as stream:
+                    async for change in stream:
+                        try:
+                            await self.push_change(change, crud, adapter)
+                        except Exception:
+                            logger.exception(
+                                "Pushing change %s failed", change.get("documentKey")
+                            )
+                        self.resume_token = stream.resume_token
+            except OperationFailure as e:
+                if (
+                    e.code in CHANGE_STREAM_HISTORY_LOST_CODES
+                    and self.resume_token is not None
+                ):
+                    logger.error(
+                        "Change stream history lost, changes after %s are not pushed",
+                        self.resume_token,
+                    )
+                    self.resume_token = None
+                    continue
+                if e.code in CHANGE_STREAM_FATAL_CODES or e.has_error_label(
+                    "NonResumableChangeStreamError"
+                ):
+                    logger.exception("Change stream failed, changes are not pushed")
+                    return
+                logger.exception("Change stream interrupted, resuming")
+                await asyncio.sleep(self.retry_delay)
+            except PyMongoError:
+                logger.exception("Change stream interrupted, resuming")
+                await asyncio.sleep(self.retry_delay)
+
+    def start(self, database: AgnosticDatabase, crud: Crud, adapter: Adapter):
+        if self._task is None:
+            self._task = asyncio.create_task(self.watch(database, crud, adapter))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
 http_router = APIRouter()
 
 
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
 from pydantic import BaseModel
 
@@ -37,3 +37,28 @@ class ReceiverResponse(BaseModel):
 
 class PushResponse(BaseModel):
     receiver_responses: List[ReceiverResponse]
+
+
+class BulkWriteFailure(BaseModel):
+    index: int
+    id: Optional[str]
+    reason: str
+
+
+class BulkWriteReport(BaseModel):
+    written: int = 0
+    failures: List[BulkWriteFailure] = []
+
+
+class IndexSpec(BaseModel):
+    """
+    A Mongo index a module relies on, keys follow pymongo `create_index` format
+    """
+
+    keys: List[Tuple[str, Union[int, str]]]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
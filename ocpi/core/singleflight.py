@@ -0,0 +1,149 @@
+import asyncio
+import copy
+from typing import Any, Dict, Tuple
+
+from ocpi.core.enums import ModuleID, RoleEnum
+
+
+class SingleFlightCrud:
+    """Crud wrapper sharing one `get` between the concurrent calls asking for the same object
+
+    The first call for a key runs the query, the calls arriving while it is in flight
+    await the same result. When a result is shared, every call, the first included, gets
+    its own copy; a call nobody joined gets the result as is. Writes made through the
+    wrapper forget the in-flight reads of the object, so calls arriving after a write
+    never join a read started before it. Other methods go straight to the Crud.
+    """
+
+    def __init__(self, crud):
+        self.crud = crud
+        self._calls: Dict[Tuple, asyncio.Future] = {}
+        # in-flight query -> number of calls that joined it
+        self._followers: Dict[asyncio.Future, int] = {}
+        # number of get calls, and of the ones served by a query already in flight
+        self.calls = 0
+        self.shared = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.crud, name)
+
+    @staticmethod
+    def _key(module: ModuleID, role: RoleEnum, id, kwargs: dict) -> Tuple:
+        # auth_token is part of the key, a Crud may scope the objects to the caller
+        return (module, role, id, tuple(sorted(kwargs.items())))
+
+    @staticmethod
+    def _hashable(key: Tuple) -> bool:
+        try:
+            hash(key)
+        except TypeError:
+            return False
+        return True
+
+    def _forget(self, module: ModuleID, id=None):
+        for key in [
+            key
+            for key in self._calls
+            if key[0] == module and (id is None or key[2] == id)
+        ]:
+            del self._calls[key]
+
+    async def get(self, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
+        self.calls += 1
+        key = self._key(module, role, id, kwargs)
+        if args or not self._hashable(key):
+            # the call is not shared
+            return await self.crud.get(module, role, id, *args, **kwargs)
+
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+            self._followers[call] += 1
+            # shielded, a cancelled caller must not cancel the query of the others
+            return copy.deepcopy(await asyncio.shield(call))
+
+        call = asyncio.ensure_future(self.crud.get(module, role, id, **kwargs))
+        self._calls[key] = call
+        self._followers[call] = 0
+        try:
+            result = await asyncio.shield(call)
+            # the joined calls copy the result after this call resumes
+            return copy.deepcopy(result) if self._followers[call] else result
+        finally:
+            del self._followers[call]
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    async def update(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.update(module, role, data, id, *args, **kwargs)
+        finally:
+            self._forget(module, id)
+
+    async def upsert(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.upsert(module, role, data, id, *args, **kwargs)
+        finally:
+            self._forget(module, id)
+
+    async def update_sub_object(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.update_sub_object(
+                module, role, data, id, *args, **kwargs
+            )
+        finally:
+            self._forget(module, id)
+
+    async def update_evse_status(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.update_evse_status(
+                module, role, data, id, *args, **kwargs
+            )
+        finally:
+            self._forget(module, id)
+
+    async def partial_update(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.partial_update(
+                module, role, data, id, *args, **kwargs
+            )
+        finally:
+            self._forget(module, id)
+
+    async def patch_sub_object(
+        self, module: ModuleID, role: RoleEnum, data: dict, id, *args, **kwargs
+    ):
+        try:
+            return await self.crud.patch_sub_object(
+                module, role, data, id, *args, **kwargs
+            )
+        finally:
+            self._forget(module, id)
+
+    async def delete(self, module: ModuleID, role: RoleEnum, id, *args, **kwargs):
+        try:
+            return await self.crud.delete(module, role, id, *args, **kwargs)
+        finally:
+            self._forget(module, id)
+
+    async def bulk_upsert(self, module: ModuleID, role: RoleEnum, *args, **kwargs):
+        try:
+            return await self.crud.bulk_upsert(module, role, *args, **kwargs)
+        finally:
+            self._forget(module)
+
+    async def bulk_delete(self, module: ModuleID, role: RoleEnum, *args, **kwargs):
+        try:
+            return await self.crud.bulk_delete(module, role, *args, **kwargs)
+        finally:
+            self._forget(module)
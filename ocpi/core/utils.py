@@ -1,21 +1,54 @@
 import urllib
 import base64
+import binascii
+import json
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, FrozenSet, Optional, Type
 
+from bson import json_util
 from fastapi import Response, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.json import pydantic_encoder
 
-from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.enums import Action, ChangeType, CountStrategy, ModuleID, RoleEnum
+from ocpi.core import status
 from ocpi.core.config import settings
+from ocpi.core.exceptions import ConflictOCPIError, NotFoundOCPIError
+from ocpi.core.schemas import OCPIResponse
 from ocpi.modules.versions.enums import VersionNumber
 
 
-def set_pagination_headers(response: Response, link: str, total: int, limit: int):
+def set_pagination_headers(
+    response: Response,
+    link: str,
+    total: int,
+    limit: int,
+    count_strategy: CountStrategy = CountStrategy.exact,
+):
     response.headers["Link"] = link
     response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Count-Strategy"] = count_strategy.value
     response.headers["X-Limit"] = str(limit)
     return response
 
 
+def get_count_strategy(module: ModuleID, filters: dict) -> CountStrategy:
+    """Pick the X-Total-Count strategy configured for the module
+
+    The estimated count ignores filters, so filtered lists fall back to a cached count.
+    """
+    strategy = settings.COUNT_STRATEGIES.get(module, CountStrategy.exact)
+    if strategy == CountStrategy.estimated and (
+        filters.get("date_from") or filters.get("date_to")
+    ):
+        return CountStrategy.cached
+    return strategy
+
+
 def get_auth_token(request: Request) -> str:
     headers = request.headers
     headers_token = headers.get("authorization", "Token Null")
@@ -25,6 +58,36 @@ def get_auth_token(request: Request) -> str:
     return decode_string_base64(token)
 
 
+def next_page_link(
+    filters: dict,
+    module: ModuleID,
+    version: VersionNumber,
+    is_last_page: bool,
+    last: Optional[dict] = None,
+) -> str:
+    """Build the `Link` header of the next page, empty on the last page
+
+    The link falls back to offset pagination when no cursor can be built, the objects of
+    a custom Crud may come without `_id`.
+
+    Args:
+        last (dict, optional): The last object of the current page, the cursor points right after it
+    """
+    if is_last_page:
+        return ""
+    params = {key: value for key, value in filters.items() if value is not None}
+    if (settings.CURSOR_PAGINATION or filters.get("cursor")) and last and "_id" in last:
+        params.pop("offset", None)
+        params["cursor"] = encode_cursor(last)
+    else:
+        params.pop("cursor", None)
+        params["offset"] = filters["offset"] + filters["limit"]
+    return (
+        f"<https://{settings.OCPI_HOST}/{settings.OCPI_PREFIX}/cpo"
+        f'/{version}/{module}/?{urllib.parse.urlencode(params)}>; rel="next"'
+    )
+
+
 async def get_list(
     response: Response,
     filters: dict,
@@ -35,22 +98,310 @@ async def get_list(
     *args,
     **kwargs,
 ):
+    count_strategy = get_count_strategy(module, filters)
     data_list, total, is_last_page = await crud.list(
-        module, role, filters, *args, version=version, **kwargs
+        module,
+        role,
+        filters,
+        *args,
+        version=version,
+        count_strategy=count_strategy,
+        **kwargs,
+    )
+
+    link = next_page_link(
+        filters, module, version, is_last_page, data_list[-1] if data_list else None
+    )
+    set_pagination_headers(response, link, total, filters["limit"], count_strategy)
+
+    return data_list
+
+
+async def _encode_list(
+    documents: AsyncIterator[dict], adapt: Callable[[dict], BaseModel]
+) -> AsyncIterator[str]:
+    # the OCPIResponse envelope, with the objects encoded one by one in its data list
+    envelope = OCPIResponse(data=[], **status.OCPI_1000_GENERIC_SUCESS_CODE).json()
+    head, tail = envelope.split("[]", 1)
+    yield f"{head}["
+    separator = ""
+    async for document in documents:
+        yield separator + adapt(document).json()
+        separator = ","
+    yield f"]{tail}"
+
+
+async def stream_list(
+    filters: dict,
+    module: ModuleID,
+    role: RoleEnum,
+    version: VersionNumber,
+    crud,
+    adapt: Callable[[dict], BaseModel],
+    *args,
+    **kwargs,
+) -> StreamingResponse:
+    """Streaming variant of `get_list`, objects are adapted and sent as they are read
+
+    Args:
+        adapt (Callable[[dict], BaseModel]): The adapter method of the module objects
+
+    Returns:
+        StreamingResponse: The OCPIResponse body with the pagination headers
+    """
+    count_strategy = get_count_strategy(module, filters)
+    documents, total, is_last_page, last = await crud.iterate(
+        module,
+        role,
+        filters,
+        *args,
+        version=version,
+        count_strategy=count_strategy,
+        **kwargs,
     )
 
-    link = ""
-    params = dict(**filters)
-    params["offset"] = filters["offset"] + filters["limit"]
-    if not is_last_page:
-        link = (
-            f"<https://{settings.OCPI_HOST}/{settings.OCPI_PREFIX}/cpo"
-            f'/{version}/{module}/?{urllib.parse.urlencode(params)}>; rel="next"'
+    response = StreamingResponse(
+        _encode_list(documents, adapt), media_type="application/json"
+    )
+    link = next_page_link(filters, module, version, is_last_page, last)
+    set_pagination_headers(response, link, total, filters["limit"], count_strategy)
+    return response
+
+
+async def _encode_ndjson(
+    documents: AsyncIterator[dict], adapt: Callable[[dict], BaseModel], compress: bool
+) -> AsyncIterator[bytes]:
+    # one object per line, gzip members are built incrementally (wbits=31)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    async for document in documents:
+        line = f"{adapt(document).json()}\n".encode()
+        if compressor is None:
+            yield line
+            continue
+        chunk = compressor.compress(line)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def accepts_gzip(request: Request) -> bool:
+    encodings = request.headers.get("accept-encoding", "")
+    return "gzip" in [
+        encoding.split(";")[0].strip().lower() for encoding in encodings.split(",")
+    ]
+
+
+def stream_export(
+    request: Request,
+    documents: AsyncIterator[dict],
+    adapt: Callable[[dict], BaseModel],
+) -> StreamingResponse:
+    """Newline-delimited JSON response of the exported objects, gzipped if the client accepts it
+
+    Args:
+        documents (AsyncIterator[dict]): The objects, as returned by `Crud.export`
+        adapt (Callable[[dict], BaseModel]): The adapter method of the module objects
+
+    Returns:
+        StreamingResponse: One JSON object per line
+    """
+    compress = accepts_gzip(request)
+    response = StreamingResponse(
+        _encode_ndjson(documents, adapt, compress),
+        media_type="application/x-ndjson",
+    )
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+# placeholder of the timestamp in prerendered bodies
+_TIMESTAMP = "__timestamp__"
+
+
+class PrerenderedResponse:
+    """Successful OCPIResponse body rendered once, sent with the current timestamp
+
+    The body is rendered again only when the route gets another source object than the
+    previous call (e.g. an overridden dependency), the source must not be mutated.
+    Called without source, the last rendered body is sent.
+
+    Args:
+        build (Callable[[Any], Any]): Builds the response data from the source
+        source (Any, optional): The source rendered right away
+    """
+
+    _empty = object()
+
+    def __init__(self, build: Callable[[Any], Any], source: Any = _empty):
+        self.build = build
+        self._source = self._empty
+        self._parts = None
+        if source is not self._empty:
+            self._render(source)
+
+    def _render(self, source: Any):
+        body = OCPIResponse(
+            data=self.build(source), **status.OCPI_1000_GENERIC_SUCESS_CODE
+        ).dict()
+        body["timestamp"] = _TIMESTAMP
+        head, tail = json.dumps(body, default=pydantic_encoder).split(
+            json.dumps(_TIMESTAMP), 1
         )
+        self._parts = head.encode(), tail.encode()
+        self._source = source
 
-    set_pagination_headers(response, link, total, filters["limit"])
+    @property
+    def size(self) -> int:
+        """Bytes of the last rendered body, without the timestamp"""
+        return sum(len(part) for part in self._parts) if self._parts else 0
+
+    def __call__(self, source: Any = _empty) -> Response:
+        if source is not self._empty and source is not self._source:
+            self._render(source)
+        head, tail = self._parts
+        timestamp = json.dumps(str(datetime.now(timezone.utc))).encode()
+        return Response(head + timestamp + tail, media_type="application/json")
 
-    return data_list
+
+async def get_changes(
+    filters: dict,
+    module: ModuleID,
+    role: RoleEnum,
+    version: VersionNumber,
+    crud,
+    adapt: Callable[[dict], BaseModel],
+    *args,
+    **kwargs,
+) -> dict:
+    """Delta feed page of a module, the changes following the resume token of the filters
+
+    Args:
+        filters (dict): The `change_feed_filters` of the request
+        adapt (Callable[[dict], BaseModel]): The adapter method of the module objects
+
+    Returns:
+        dict: The `changes` (upserted objects and tombstones), the `resume_token` to send
+            back on the next request and if there are more changes to read right away
+    """
+    changes, is_last_page, last = await crud.changes(
+        module,
+        role,
+        filters["position"],
+        *args,
+        version=version,
+        limit=filters["limit"],
+        **kwargs,
+    )
+
+    data = []
+    for change in changes:
+        item = {"type": change["type"], "key": change["key"]}
+        if change["type"] == ChangeType.upsert:
+            item["object"] = adapt(change["data"]).dict()
+        data.append(item)
+    return {
+        "changes": data,
+        "resume_token": encode_resume_token(last) if last else filters["token"],
+        "has_more": not is_last_page,
+    }
+
+
+async def get_client_token(
+    request: Request, crud, auth_token: str, role: RoleEnum = None, **kwargs
+):
+    """Resolve the party registered with a token, through the application token cache
+
+    Only the resolved parties are cached, the credentials routes forget the token they change.
+
+    Args:
+        auth_token (str): The token of the caller
+        role (RoleEnum, optional): The role passed to the GetClientToken action
+
+    Returns:
+        Any: The GetClientToken action result, None when the token is not registered
+    """
+    cache = getattr(request.app.state, "token_cache", None)
+    key = (auth_token, role)
+    if cache is not None:
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    data = await crud.do(
+        ModuleID.credentials_and_registration,
+        role,
+        Action.get_client_token,
+        auth_token=auth_token,
+        **kwargs,
+    )
+    if cache is not None and data is not None:
+        cache.set(key, data)
+    return data
+
+
+def forget_client_token(request: Request, auth_token: str):
+    """Drop the cached resolutions of a token whose credentials changed"""
+    cache = getattr(request.app.state, "token_cache", None)
+    if cache is not None:
+        cache.invalidate(where=lambda key: key[0] == auth_token)
+
+
+async def update_with_retry(
+    crud,
+    module: ModuleID,
+    role: RoleEnum,
+    id,
+    patch: Callable[[dict], dict],
+    *args,
+    **kwargs,
+):
+    """Read-modify-write an object, or one of its EVSEs/Connectors, with compare-and-swap
+
+    The write only succeeds if `last_updated` is still the one that was read, otherwise the
+    object is read and patched again, up to UPDATE_RETRIES times.
+
+    Args:
+        patch (Callable[[dict], dict]): Builds the new object data from the stored one
+
+    Keyword Args:
+        evse_uid (CiString(36)): Update this EVSE of the Location with update_sub_object
+        connector_id (CiString(36)): Update this Connector of the EVSE with update_sub_object
+
+    Raises:
+        NotFoundOCPIError: The object does not exist
+        ConflictOCPIError: The object kept being modified concurrently
+    """
+    write = crud.update_sub_object if kwargs.get("evse_uid") else crud.update
+    for _ in range(settings.UPDATE_RETRIES):
+        old_data = await crud.get(module, role, id, *args, **kwargs)
+        if not old_data:
+            raise NotFoundOCPIError
+        data = await write(
+            module,
+            role,
+            patch(old_data),
+            id,
+            *args,
+            expected_last_updated=old_data.get("last_updated"),
+            **kwargs,
+        )
+        if data is not None:
+            return data
+    raise ConflictOCPIError
+
+
+@lru_cache
+def scalar_fields(model: Type[BaseModel]) -> FrozenSet[str]:
+    """Names of the fields of a model holding a single plain value (no list or object)"""
+    return frozenset(
+        name
+        for name, field in model.__fields__.items()
+        if field.shape == SHAPE_SINGLETON
+        and not (isinstance(field.type_, type) and issubclass(field.type_, BaseModel))
+    )
 
 
 def partially_update_attributes(instance: BaseModel, attributes: dict):
@@ -66,3 +417,56 @@ def encode_string_base64(input: str) -> str:
 def decode_string_base64(input: str) -> str:
     input_bytes = base64.b64decode(bytes(input, "utf-8"))
     return input_bytes.decode("utf-8")
+
+
+def _encode_position(position: dict) -> str:
+    token = base64.urlsafe_b64encode(bytes(json_util.dumps(position), "utf-8"))
+    return token.decode("utf-8").rstrip("=")
+
+
+def _decode_position(token: str, keys: set, error: str) -> dict:
+    try:
+        padding = "=" * (-len(token) % 4)
+        position = json_util.loads(base64.urlsafe_b64decode(f"{token}{padding}"))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(error) from e
+    if not isinstance(position, dict) or set(position) != keys:
+        raise ValueError(error)
+    return position
+
+
+def encode_cursor(document: dict) -> str:
+    """Build the opaque pagination cursor pointing right after the given document"""
+    return _encode_position(
+        {"last_updated": document.get("last_updated"), "_id": document["_id"]}
+    )
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Read back the `last_updated` and `_id` position stored in a pagination cursor
+
+    Raises:
+        ValueError: The cursor was not issued by `encode_cursor`
+    """
+    return _decode_position(
+        cursor, {"last_updated", "_id"}, "invalid pagination cursor"
+    )
+
+
+def encode_resume_token(change: dict) -> str:
+    """Build the opaque delta feed token resuming right after the given change log entry"""
+    return _encode_position({"seq": change["seq"], "created": change["created"]})
+
+
+def decode_resume_token(token: str) -> dict:
+    """Read back the change log `seq` and `created` stored in a delta feed resume token
+
+    Raises:
+        ValueError: The token was not issued by `encode_resume_token`
+    """
+    position = _decode_position(token, {"seq", "created"}, "invalid resume token")
+    if not isinstance(position["seq"], int) or not isinstance(
+        position["created"], datetime
+    ):
+        raise ValueError("invalid resume token")
+    return position
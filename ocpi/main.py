@@ -11,20 +11,31 @@ from ocpi.core.endpoints import ENDPOINTS
 
 from ocpi.modules.versions.api import router as versions_router, versions_v_2_2_1_router
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.modules.versions.schemas import Version
-from ocpi.core.dependencies import get_versions, get_endpoints
+from ocpi.modules.versions.schemas import Version, VersionDetail
+from ocpi.core.dependencies import get_adapter, get_crud, get_versions, get_endpoints
 from ocpi.core import status
 from ocpi.core.enums import RoleEnum
 from ocpi.core.config import settings
 from ocpi.core.data_types import URL
 from ocpi.core.schemas import OCPIResponse
-from ocpi.core.exceptions import AuthorizationOCPIError, NotFoundOCPIError
+from ocpi.core.utils import PrerenderedResponse
+from ocpi.core.exceptions import (
+    AuthorizationOCPIError,
+    ConflictOCPIError,
+    NotFoundOCPIError,
+)
 from ocpi.core.push import (
+    ChangeStreamPush,
     http_router as http_push_router,
     websocket_router as websocket_push_router,
 )
 from ocpi.routers import v_2_2_1_cpo_router, v_2_2_1_emsp_router
 from ocpi.core.db import get_db, ping, client_close
+from ocpi.core.indexes import reconcile_indexes
+from ocpi.core.buffer import WriteBuffer
+from ocpi.core.cache import TTLCache
+from ocpi.core.memory import MemoryCrud
+from ocpi.core.singleflight import SingleFlightCrud
 
 
 class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
@@ -36,6 +47,8 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             raise HTTPException(403, str(e)) from e
         except NotFoundOCPIError as e:
             raise HTTPException(404, str(e)) from e
+        except ConflictOCPIError as e:
+            raise HTTPException(409, str(e)) from e
         except ValidationError:
             response = JSONResponse(
                 OCPIResponse(
@@ -49,24 +62,55 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
 @asynccontextmanager
 async def db_lifespan(app: FastAPI):
     # Startup
-    app.database = get_db()
-    ping_response = await ping()
-    # if int(ping_response["ok"]) != 1:
-    #     raise Exception("Problem connecting to database cluster.")
-    # else:
-    #     logging.info("Connected to database cluster.")
+    crud = app.dependency_overrides.get(get_crud, get_crud)()
+    in_memory = isinstance(crud, type) and issubclass(crud, MemoryCrud)
+    if not in_memory:
+        app.database = get_db()
+        ping_response = await ping()
+        # if int(ping_response["ok"]) != 1:
+        #     raise Exception("Problem connecting to database cluster.")
+        # else:
+        #     logging.info("Connected to database cluster.")
+        await reconcile_indexes(app.database)
+
+    if settings.WRITE_BUFFER:
+        # wrap the Crud chosen by the application, overrides are in place by now
+        app.state.write_buffer = WriteBuffer(crud)
+        app.state.write_buffer.start()
+        app.dependency_overrides[get_crud] = lambda: app.state.write_buffer
+
+    if settings.SINGLEFLIGHT_GET:
+        app.state.singleflight = SingleFlightCrud(
+            app.dependency_overrides.get(get_crud, get_crud)()
+        )
+        app.dependency_overrides[get_crud] = lambda: app.state.singleflight
+
+    if app.state.change_stream_push is not None and not in_memory:
+        app.state.change_stream_push.start(
+            app.database,
+            app.dependency_overrides.get(get_crud, get_crud)(),
+            app.dependency_overrides.get(get_adapter, get_adapter)(),
+        )
 
     yield
 
     # Shutdown
-    client_close()
+    if app.state.change_stream_push is not None:
+        await app.state.change_stream_push.stop()
+    if settings.WRITE_BUFFER:
+        await app.state.write_buffer.stop()
+    if not in_memory:
+        client_close()
 
 
 def get_application(
     version_numbers: List[VersionNumber],
     roles: List[RoleEnum],
+    crud: Any = None,
+    adapter: Any = None,
     http_push: bool = False,
     websocket_push: bool = False,
+    change_stream_push: bool = False,
 ) -> FastAPI:
     _app = FastAPI(
         lifespan=db_lifespan,
@@ -101,6 +145,15 @@ def get_application(
             prefix=f"/{settings.PUSH_PREFIX}",
         )
 
+    # e.g. MemoryCrud for an application without database
+    if crud is not None:
+        _app.dependency_overrides[get_crud] = lambda: crud
+    if adapter is not None:
+        _app.dependency_overrides[get_adapter] = lambda: adapter
+
+    # started on startup, pushes database changes without going through the push routes
+    _app.state.change_stream_push = ChangeStreamPush() if change_stream_push else None
+
     versions = []
     version_endpoints = {}
 
@@ -141,6 +194,36 @@ def get_application(
                 VersionNumber.v_2_2_1
             ][RoleEnum.emsp]
 
+    # caller token resolutions, see `ocpi.core.utils.get_client_token`
+    _app.state.token_cache = (
+        TTLCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+        if settings.TOKEN_CACHE_TTL
+        else None
+    )
+
+    # Locations served by the eMSP get_location route
+    _app.state.location_cache = (
+        TTLCache(
+            settings.LOCATION_CACHE_SIZE,
+            settings.LOCATION_CACHE_TTL,
+            max_bytes=settings.LOCATION_CACHE_BYTES,
+        )
+        if settings.LOCATION_CACHE_SIZE
+        else None
+    )
+
+    # bodies of the versions routes, rendered once for the versions and endpoints above
+    _app.state.versions_response = PrerenderedResponse(lambda data: data, versions)
+    _app.state.version_details_responses = {
+        version: PrerenderedResponse(
+            lambda endpoints, version=version: VersionDetail(
+                version=version, endpoints=endpoints
+            ).dict(),
+            endpoints,
+        )
+        for version, endpoints in version_endpoints.items()
+    }
+
     def override_get_versions():
         return versions
 
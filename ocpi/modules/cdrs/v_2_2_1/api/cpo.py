@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, Response, Request
 
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.core.utils import get_auth_token, get_list
+from ocpi.core.utils import get_auth_token, get_list, stream_list
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
@@ -24,6 +25,17 @@ async def get_cdrs(
 ):
     auth_token = get_auth_token(request)
 
+    if settings.STREAM_LISTS:
+        return await stream_list(
+            filters,
+            ModuleID.cdrs,
+            RoleEnum.cpo,
+            VersionNumber.v_2_2_1,
+            crud,
+            adapter.cdr_adapter,
+            auth_token=auth_token,
+        )
+
     data_list = await get_list(
         response,
         filters,
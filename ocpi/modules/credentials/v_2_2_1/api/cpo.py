@@ -5,10 +5,15 @@ from fastapi import APIRouter, Depends, HTTPException, Request, status as fastap
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
-from ocpi.core.utils import encode_string_base64, get_auth_token
+from ocpi.core.utils import (
+    encode_string_base64,
+    forget_client_token,
+    get_auth_token,
+    get_client_token,
+)
 from ocpi.core.dependencies import get_crud, get_adapter
 from ocpi.core import status
-from ocpi.core.enums import Action, ModuleID, RoleEnum
+from ocpi.core.enums import ModuleID, RoleEnum
 from ocpi.modules.versions.enums import VersionNumber
 from ocpi.modules.credentials.v_2_2_1.schemas import Credentials
 
@@ -49,12 +54,12 @@ async def post_credentials(
 
     # Check if the client is already registered
     credentials_client_token = credentials.token
-    server_cred = await crud.do(
-        ModuleID.credentials_and_registration,
+    server_cred = await get_client_token(
+        request,
+        crud,
+        auth_token,
         RoleEnum.cpo,
-        Action.get_client_token,
         version=VersionNumber.v_2_2_1,
-        auth_token=auth_token,
     )
     if server_cred:
         raise HTTPException(
@@ -96,6 +101,7 @@ async def post_credentials(
                     auth_token=auth_token,
                     version=VersionNumber.v_2_2_1,
                 )
+                forget_client_token(request, auth_token)
 
                 return OCPIResponse(
                     data=adapter.credentials_adapter(new_credentials).dict(),
@@ -119,12 +125,12 @@ async def update_credentials(
 
     # Check if the client is already registered
     credentials_client_token = credentials.token
-    server_cred = await crud.do(
-        ModuleID.credentials_and_registration,
+    server_cred = await get_client_token(
+        request,
+        crud,
+        auth_token,
         RoleEnum.cpo,
-        Action.get_client_token,
         version=VersionNumber.v_2_2_1,
-        auth_token=auth_token,
     )
     if not server_cred:
         raise HTTPException(
@@ -166,6 +172,7 @@ async def update_credentials(
                     auth_token=auth_token,
                     version=VersionNumber.v_2_2_1,
                 )
+                forget_client_token(request, auth_token)
 
                 return OCPIResponse(
                     data=adapter.credentials_adapter(new_credentials).dict(),
@@ -205,6 +212,7 @@ async def remove_credentials(
         auth_token=auth_token,
         version=VersionNumber.v_2_2_1,
     )
+    forget_client_token(request, auth_token)
 
     return OCPIResponse(
         data=[],
@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends, Response, Request
+from fastapi import (
+    APIRouter,
+    Depends,
+    Response,
+    Request,
+    HTTPException,
+    status as fastapistatus,
+)
 
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.core.utils import get_list, get_auth_token
+from ocpi.core.utils import (
+    get_list,
+    get_changes,
+    stream_list,
+    stream_export,
+    get_auth_token,
+    get_client_token,
+)
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
 from ocpi.core.data_types import CiString
 from ocpi.core.enums import ModuleID, RoleEnum
-from ocpi.core.dependencies import get_crud, get_adapter, pagination_filters
+from ocpi.core.exceptions import NotFoundOCPIError
+from ocpi.core.dependencies import (
+    get_crud,
+    get_adapter,
+    pagination_filters,
+    export_filters,
+    change_feed_filters,
+    geo_filters,
+)
 
 router = APIRouter(
     prefix="/locations",
@@ -25,6 +48,17 @@ async def get_locations(
 ):
     auth_token = get_auth_token(request)
 
+    if settings.STREAM_LISTS:
+        return await stream_list(
+            filters,
+            ModuleID.locations,
+            RoleEnum.cpo,
+            VersionNumber.v_2_2_1,
+            crud,
+            adapter.location_adapter,
+            auth_token=auth_token,
+        )
+
     data_list = await get_list(
         response,
         filters,
@@ -44,6 +78,83 @@ async def get_locations(
     )
 
 
+@router.get("/export")
+async def export_locations(
+    request: Request,
+    crud: Crud = Depends(get_crud),
+    adapter: Adapter = Depends(get_adapter),
+    filters: dict = Depends(export_filters),
+):
+    auth_token = get_auth_token(request)
+
+    server_cred = await get_client_token(request, crud, auth_token)
+    if server_cred is None:
+        raise HTTPException(fastapistatus.HTTP_401_UNAUTHORIZED, "Unauthorized")
+
+    documents = await crud.export(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        filters,
+        auth_token=auth_token,
+        version=VersionNumber.v_2_2_1,
+    )
+    return stream_export(request, documents, adapter.location_adapter)
+
+
+@router.get("/changes", response_model=OCPIResponse)
+async def get_locations_changes(
+    request: Request,
+    crud: Crud = Depends(get_crud),
+    adapter: Adapter = Depends(get_adapter),
+    filters: dict = Depends(change_feed_filters),
+):
+    auth_token = get_auth_token(request)
+
+    server_cred = await get_client_token(request, crud, auth_token)
+    if server_cred is None:
+        raise HTTPException(fastapistatus.HTTP_401_UNAUTHORIZED, "Unauthorized")
+
+    data = await get_changes(
+        filters,
+        ModuleID.locations,
+        RoleEnum.cpo,
+        VersionNumber.v_2_2_1,
+        crud,
+        adapter.location_adapter,
+        auth_token=auth_token,
+    )
+    return OCPIResponse(
+        data=data,
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
+
+
+@router.get("/search", response_model=OCPIResponse)
+async def search_locations(
+    request: Request,
+    crud: Crud = Depends(get_crud),
+    adapter: Adapter = Depends(get_adapter),
+    filters: dict = Depends(geo_filters),
+):
+    auth_token = get_auth_token(request)
+
+    data_list = await crud.geo_search(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        filters,
+        auth_token=auth_token,
+        version=VersionNumber.v_2_2_1,
+    )
+
+    locations = []
+    for data in data_list:
+        locations.append(adapter.location_adapter(data).dict())
+    return OCPIResponse(
+        data=locations,
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
+
+
 @router.get("/{location_id}", response_model=OCPIResponse)
 async def get_location(
     request: Request,
@@ -80,16 +191,16 @@ async def get_evse(
         ModuleID.locations,
         RoleEnum.cpo,
         location_id,
+        evse_uid=evse_uid,
         auth_token=auth_token,
         version=VersionNumber.v_2_2_1,
     )
-    location = adapter.location_adapter(data)
-    for evse in location.evses:
-        if evse.uid == evse_uid:
-            return OCPIResponse(
-                data=[evse.dict()],
-                **status.OCPI_1000_GENERIC_SUCESS_CODE,
-            )
+    if not data:
+        raise NotFoundOCPIError
+    return OCPIResponse(
+        data=[adapter.evse_adapter(data).dict()],
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
 
 
 @router.get("/{location_id}/{evse_uid}/{connector_id}", response_model=OCPIResponse)
@@ -107,15 +218,14 @@ async def get_connector(
         ModuleID.locations,
         RoleEnum.cpo,
         location_id,
+        evse_uid=evse_uid,
+        connector_id=connector_id,
         auth_token=auth_token,
         version=VersionNumber.v_2_2_1,
     )
-    location = adapter.location_adapter(data)
-    for evse in location.evses:
-        if evse.uid == evse_uid:
-            for connector in evse.connectors:
-                if connector.id == connector_id:
-                    return OCPIResponse(
-                        data=[connector.dict()],
-                        **status.OCPI_1000_GENERIC_SUCESS_CODE,
-                    )
+    if not data:
+        raise NotFoundOCPIError
+    return OCPIResponse(
+        data=[adapter.connector_adapter(data).dict()],
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, Request
 
-from ocpi.core.utils import get_auth_token, partially_update_attributes
+from ocpi.core.utils import (
+    PrerenderedResponse,
+    get_auth_token,
+    partially_update_attributes,
+    scalar_fields,
+    update_with_retry,
+)
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
-from ocpi.core.crud import Crud
+from ocpi.core.crud import EVSE_STATUS_FIELDS, Crud
 from ocpi.core.data_types import CiString
 from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.exceptions import NotFoundOCPIError
 from ocpi.core.dependencies import get_crud, get_adapter
 from ocpi.modules.versions.enums import VersionNumber
 from ocpi.modules.locations.v_2_2_1.schemas import (
@@ -23,6 +31,13 @@ router = APIRouter(
 )
 
 
+def _forget_location(request: Request, country_code, party_id, location_id):
+    # the cached Location of get_location, after a write to it or to its EVSEs/Connectors
+    cache = getattr(request.app.state, "location_cache", None)
+    if cache is not None:
+        cache.invalidate(group=(country_code, party_id, location_id))
+
+
 @router.get("/{country_code}/{party_id}/{location_id}", response_model=OCPIResponse)
 async def get_location(
     request: Request,
@@ -34,6 +49,16 @@ async def get_location(
 ):
     auth_token = get_auth_token(request)
 
+    cache = getattr(request.app.state, "location_cache", None)
+    # entries are kept per token, crud.get has checked the access of that token
+    location = (country_code, party_id, location_id)
+    key = (auth_token, *location)
+    response = cache.get(key) if cache is not None else None
+    if response is not None:
+        return response()
+    # a write to the Location during the read below leaves it out of the cache
+    generation = cache.generation(location) if cache is not None else None
+
     data = await crud.get(
         ModuleID.locations,
         RoleEnum.emsp,
@@ -43,10 +68,18 @@ async def get_location(
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    return OCPIResponse(
-        data=[adapter.location_adapter(data).dict()],
-        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    if cache is None:
+        return OCPIResponse(
+            data=[adapter.location_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
+
+    # the validated Location, rendered once for the following reads
+    response = PrerenderedResponse(
+        lambda data: [adapter.location_adapter(data).dict()], data
     )
+    cache.set(key, response, location, generation, response.size)
+    return response()
 
 
 @router.get(
@@ -67,18 +100,18 @@ async def get_evse(
         ModuleID.locations,
         RoleEnum.emsp,
         location_id,
+        evse_uid=evse_uid,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    location = adapter.location_adapter(data)
-    for evse in location.evses:
-        if evse.uid == evse_uid:
-            return OCPIResponse(
-                data=[evse.dict()],
-                **status.OCPI_1000_GENERIC_SUCESS_CODE,
-            )
+    if not data:
+        raise NotFoundOCPIError
+    return OCPIResponse(
+        data=[adapter.evse_adapter(data).dict()],
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
 
 
 @router.get(
@@ -101,20 +134,19 @@ async def get_connector(
         ModuleID.locations,
         RoleEnum.emsp,
         location_id,
+        evse_uid=evse_uid,
+        connector_id=connector_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    location = adapter.location_adapter(data)
-    for evse in location.evses:
-        if evse.uid == evse_uid:
-            for connector in evse.connectors:
-                if connector.id == connector_id:
-                    return OCPIResponse(
-                        data=[connector.dict()],
-                        **status.OCPI_1000_GENERIC_SUCESS_CODE,
-                    )
+    if not data:
+        raise NotFoundOCPIError
+    return OCPIResponse(
+        data=[adapter.connector_adapter(data).dict()],
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
 
 
 @router.put("/{country_code}/{party_id}/{location_id}", response_model=OCPIResponse)
@@ -129,37 +161,18 @@ async def add_or_update_location(
 ):
     auth_token = get_auth_token(request)
 
-    data = await crud.get(
+    data = await crud.upsert(
         ModuleID.locations,
         RoleEnum.emsp,
+        location.dict(),
         location_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    if data:
-        data = await crud.update(
-            ModuleID.locations,
-            RoleEnum.emsp,
-            location.dict(),
-            location_id,
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
-    else:
-        data = await crud.create(
-            ModuleID.locations,
-            RoleEnum.emsp,
-            location.dict(),
-            auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
         data=[adapter.location_adapter(data).dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
@@ -181,38 +194,19 @@ async def add_or_update_evse(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.locations,
-        RoleEnum.emsp,
-        location_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_location = adapter.location_adapter(old_data)
-
-    is_new_evse = True
-    for old_evse in old_location.evses:
-        if old_evse.uid == evse_uid:
-            is_new_evse = False
-            break
-    new_location = old_location
-    if not is_new_evse:
-        new_location.evses.remove(old_evse)
-    new_location.evses.append(evse)
-
-    await crud.update(
+    await crud.update_sub_object(
         ModuleID.locations,
         RoleEnum.emsp,
-        new_location.dict(),
+        evse.dict(),
         location_id,
+        evse_uid=evse_uid,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
         data=[evse.dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
@@ -236,43 +230,20 @@ async def add_or_update_connector(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.locations,
-        RoleEnum.emsp,
-        location_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_location = adapter.location_adapter(old_data)
-
-    is_new_connector = True
-    for old_evse in old_location.evses:
-        if old_evse.uid == evse_uid:
-            for old_onnector in old_evse.connectors:
-                if old_onnector.id == connector_id:
-                    is_new_connector = False
-                    break
-    new_location = old_location
-    new_location.evses.remove(old_evse)
-    if not is_new_connector:
-        old_evse.connectors.remove(old_onnector)
-    new_evse = old_evse
-    new_evse.connectors.append(connector)
-    new_location.evses.append(new_evse)
-
-    await crud.update(
+    await crud.update_sub_object(
         ModuleID.locations,
         RoleEnum.emsp,
-        new_location.dict(),
+        connector.dict(),
         location_id,
+        evse_uid=evse_uid,
+        connector_id=connector_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
         data=[connector.dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
@@ -291,33 +262,42 @@ async def partial_update_location(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.locations,
-        RoleEnum.emsp,
-        location_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_location = adapter.location_adapter(old_data)
+    patch_data = location.dict(exclude_defaults=True, exclude_unset=True)
+    if settings.PATCH_FAST_PATH and patch_data:
+        data = await crud.partial_update(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            patch_data,
+            location_id,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        _forget_location(request, country_code, party_id, location_id)
+        return OCPIResponse(
+            data=[adapter.location_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
 
-    new_location = old_location
-    partially_update_attributes(
-        new_location, location.dict(exclude_defaults=True, exclude_unset=True)
-    )
+    def patch(old_data: dict) -> dict:
+        new_location = adapter.location_adapter(old_data)
+        partially_update_attributes(new_location, patch_data)
+        return new_location.dict()
 
-    data = await crud.update(
+    data = await update_with_retry(
+        crud,
         ModuleID.locations,
         RoleEnum.emsp,
-        new_location.dict(),
         location_id,
+        patch,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
         data=[adapter.location_adapter(data).dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
@@ -339,39 +319,74 @@ async def partial_update_evse(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.locations,
-        RoleEnum.emsp,
-        location_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_location = adapter.location_adapter(old_data)
-
-    for old_evse in old_location.evses:
-        if old_evse.uid == evse_uid:
-            break
-    new_evse = old_evse
-    partially_update_attributes(
-        new_evse, evse.dict(exclude_defaults=True, exclude_unset=True)
-    )
-    new_location = old_location
+    patch_data = evse.dict(exclude_defaults=True, exclude_unset=True)
+    status_fields = {*EVSE_STATUS_FIELDS, "last_updated"}
+    if (
+        settings.EVSE_STATUS_STORE
+        and set(patch_data) & set(EVSE_STATUS_FIELDS)
+        and set(patch_data) <= status_fields
+    ):
+        # status updates go to the EVSE status store, the Location is not read
+        await crud.update_evse_status(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            patch_data,
+            location_id,
+            evse_uid=evse_uid,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        _forget_location(request, country_code, party_id, location_id)
+        return OCPIResponse(
+            data=[evse.dict(exclude_unset=True)],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
+
+    if (
+        settings.PATCH_FAST_PATH
+        and patch_data
+        and set(patch_data) <= scalar_fields(EVSEPartialUpdate)
+    ):
+        data = await crud.patch_sub_object(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            patch_data,
+            location_id,
+            evse_uid=evse_uid,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        _forget_location(request, country_code, party_id, location_id)
+        return OCPIResponse(
+            data=[adapter.evse_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
+
+    def patch(old_data: dict) -> dict:
+        new_evse = adapter.evse_adapter(old_data)
+        partially_update_attributes(new_evse, patch_data)
+        return new_evse.dict()
 
-    await crud.update(
+    data = await update_with_retry(
+        crud,
         ModuleID.locations,
         RoleEnum.emsp,
-        new_location.dict(),
         location_id,
+        patch,
+        evse_uid=evse_uid,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
-        data=[new_evse.dict()],
+        data=[adapter.evse_adapter(data).dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
     )
 
@@ -393,40 +408,51 @@ async def partial_update_connector(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.locations,
-        RoleEnum.emsp,
-        location_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_location = adapter.location_adapter(old_data)
-
-    for old_evse in old_location.evses:
-        if old_evse.uid == evse_uid:
-            for old_onnector in old_evse.connectors:
-                if old_onnector.id == connector_id:
-                    break
-    new_connector = old_onnector
-    partially_update_attributes(
-        new_connector, connector.dict(exclude_defaults=True, exclude_unset=True)
-    )
-    new_location = old_location
+    patch_data = connector.dict(exclude_defaults=True, exclude_unset=True)
+    if (
+        settings.PATCH_FAST_PATH
+        and patch_data
+        and set(patch_data) <= scalar_fields(ConnectorPartialUpdate)
+    ):
+        data = await crud.patch_sub_object(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            patch_data,
+            location_id,
+            evse_uid=evse_uid,
+            connector_id=connector_id,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        _forget_location(request, country_code, party_id, location_id)
+        return OCPIResponse(
+            data=[adapter.connector_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
+
+    def patch(old_data: dict) -> dict:
+        new_connector = adapter.connector_adapter(old_data)
+        partially_update_attributes(new_connector, patch_data)
+        return new_connector.dict()
 
-    await crud.update(
+    data = await update_with_retry(
+        crud,
         ModuleID.locations,
         RoleEnum.emsp,
-        new_location.dict(),
         location_id,
+        patch,
+        evse_uid=evse_uid,
+        connector_id=connector_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
 
+    _forget_location(request, country_code, party_id, location_id)
     return OCPIResponse(
-        data=[new_connector.dict()],
+        data=[adapter.connector_adapter(data).dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
     )
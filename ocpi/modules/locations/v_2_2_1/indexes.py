@@ -0,0 +1,14 @@
+from ocpi.core.crud import GEO_POINT_FIELD, LIST_SORT
+from ocpi.core.schemas import IndexSpec
+
+INDEXES = [
+    # lookups by id, optionally scoped to the owner party
+    IndexSpec(
+        keys=[("id", 1), ("country_code", 1), ("party_id", 1)],
+        unique=True,
+    ),
+    # date window and paging of the list endpoint
+    IndexSpec(keys=LIST_SORT),
+    # radius and bounding box searches on the GeoJSON point of the coordinates
+    IndexSpec(keys=[(GEO_POINT_FIELD, "2dsphere")]),
+]
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, Response, Request
 
 from ocpi.modules.sessions.v_2_2_1.schemas import ChargingPreferences
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.core.utils import get_list, get_auth_token
+from ocpi.core.utils import get_list, stream_list, get_auth_token
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
@@ -26,6 +27,17 @@ async def get_sessions(
 ):
     auth_token = get_auth_token(request)
 
+    if settings.STREAM_LISTS:
+        return await stream_list(
+            filters,
+            ModuleID.sessions,
+            RoleEnum.cpo,
+            VersionNumber.v_2_2_1,
+            crud,
+            adapter.session_adapter,
+            auth_token=auth_token,
+        )
+
     data_list = await get_list(
         response,
         filters,
@@ -2,11 +2,16 @@ from fastapi import APIRouter, Depends, Request
 
 from ocpi.modules.sessions.v_2_2_1.schemas import SessionPartialUpdate, Session
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.core.utils import get_auth_token, partially_update_attributes
+from ocpi.core.utils import (
+    get_auth_token,
+    partially_update_attributes,
+    update_with_retry,
+)
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
-from ocpi.core.crud import Crud
+from ocpi.core.crud import Crud, merge_charging_periods
 from ocpi.core.data_types import CiString
 from ocpi.core.enums import ModuleID, RoleEnum
 from ocpi.core.dependencies import get_crud, get_adapter
@@ -54,36 +59,16 @@ async def add_or_update_session(
 ):
     auth_token = get_auth_token(request)
 
-    data = await crud.get(
+    data = await crud.upsert(
         ModuleID.sessions,
         RoleEnum.emsp,
+        session.dict(),
         session_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    if data:
-        data = await crud.update(
-            ModuleID.sessions,
-            RoleEnum.emsp,
-            session.dict(),
-            session_id,
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
-    else:
-        data = await crud.create(
-            ModuleID.sessions,
-            RoleEnum.emsp,
-            session.dict(),
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
 
     return OCPIResponse(
         data=[adapter.session_adapter(data).dict()],
@@ -103,31 +88,56 @@ async def partial_update_session(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.sessions,
-        RoleEnum.emsp,
-        session_id,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_session = adapter.session_adapter(old_data)
+    patch_data = session.dict(exclude_defaults=True, exclude_unset=True)
+    if settings.PATCH_FAST_PATH and patch_data:
+        data = await crud.partial_update(
+            ModuleID.sessions,
+            RoleEnum.emsp,
+            patch_data,
+            session_id,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        return OCPIResponse(
+            data=[adapter.session_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
 
-    new_session = old_session
-    partially_update_attributes(
-        new_session, session.dict(exclude_defaults=True, exclude_unset=True)
-    )
+    kwargs = {}
+    if "charging_periods" in patch_data:
+        # only the appended periods are written when the periods are stored apart
+        kwargs["patched_periods"] = tuple(
+            period["start_date_time"] for period in patch_data["charging_periods"] or []
+        )
+
+    def patch(old_data: dict) -> dict:
+        new_session = adapter.session_adapter(old_data)
+        attributes = patch_data
+        if "charging_periods" in patch_data:
+            # the patched periods are appended, as on the fast path
+            attributes = {
+                **patch_data,
+                "charging_periods": merge_charging_periods(
+                    new_session.dict()["charging_periods"],
+                    patch_data["charging_periods"],
+                ),
+            }
+        partially_update_attributes(new_session, attributes)
+        return new_session.dict()
 
-    data = await crud.update(
+    data = await update_with_retry(
+        crud,
         ModuleID.sessions,
         RoleEnum.emsp,
-        new_session.dict(),
         session_id,
+        patch,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
+        **kwargs,
     )
 
     return OCPIResponse(
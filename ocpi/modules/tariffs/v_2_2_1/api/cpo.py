@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends, Response, Request
+from fastapi import (
+    APIRouter,
+    Depends,
+    Response,
+    Request,
+    HTTPException,
+    status as fastapistatus,
+)
 
-from ocpi.core.utils import get_list, get_auth_token
+from ocpi.core.utils import (
+    get_list,
+    get_changes,
+    stream_list,
+    stream_export,
+    get_auth_token,
+    get_client_token,
+)
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
 from ocpi.core.enums import ModuleID, RoleEnum
-from ocpi.core.dependencies import get_crud, get_adapter, pagination_filters
+from ocpi.core.dependencies import (
+    get_crud,
+    get_adapter,
+    pagination_filters,
+    export_filters,
+    change_feed_filters,
+)
 from ocpi.modules.versions.enums import VersionNumber
 
 router = APIRouter(
@@ -24,6 +45,17 @@ async def get_tariffs(
 ):
     auth_token = get_auth_token(request)
 
+    if settings.STREAM_LISTS:
+        return await stream_list(
+            filters,
+            ModuleID.tariffs,
+            RoleEnum.cpo,
+            VersionNumber.v_2_2_1,
+            crud,
+            adapter.tariff_adapter,
+            auth_token=auth_token,
+        )
+
     data_list = await get_list(
         response,
         filters,
@@ -41,3 +73,54 @@ async def get_tariffs(
         data=tariffs,
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
     )
+
+
+@router.get("/export")
+async def export_tariffs(
+    request: Request,
+    crud: Crud = Depends(get_crud),
+    adapter: Adapter = Depends(get_adapter),
+    filters: dict = Depends(export_filters),
+):
+    auth_token = get_auth_token(request)
+
+    server_cred = await get_client_token(request, crud, auth_token)
+    if server_cred is None:
+        raise HTTPException(fastapistatus.HTTP_401_UNAUTHORIZED, "Unauthorized")
+
+    documents = await crud.export(
+        ModuleID.tariffs,
+        RoleEnum.cpo,
+        filters,
+        auth_token=auth_token,
+        version=VersionNumber.v_2_2_1,
+    )
+    return stream_export(request, documents, adapter.tariff_adapter)
+
+
+@router.get("/changes", response_model=OCPIResponse)
+async def get_tariffs_changes(
+    request: Request,
+    crud: Crud = Depends(get_crud),
+    adapter: Adapter = Depends(get_adapter),
+    filters: dict = Depends(change_feed_filters),
+):
+    auth_token = get_auth_token(request)
+
+    server_cred = await get_client_token(request, crud, auth_token)
+    if server_cred is None:
+        raise HTTPException(fastapistatus.HTTP_401_UNAUTHORIZED, "Unauthorized")
+
+    data = await get_changes(
+        filters,
+        ModuleID.tariffs,
+        RoleEnum.cpo,
+        VersionNumber.v_2_2_1,
+        crud,
+        adapter.tariff_adapter,
+        auth_token=auth_token,
+    )
+    return OCPIResponse(
+        data=data,
+        **status.OCPI_1000_GENERIC_SUCESS_CODE,
+    )
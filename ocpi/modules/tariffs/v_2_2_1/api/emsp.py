@@ -54,36 +54,16 @@ async def add_or_update_tariff(
 ):
     auth_token = get_auth_token(request)
 
-    data = await crud.get(
+    data = await crud.upsert(
         ModuleID.tariffs,
         RoleEnum.emsp,
+        tariff.dict(),
         tariff_id,
         auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    if data:
-        data = await crud.update(
-            ModuleID.tariffs,
-            RoleEnum.emsp,
-            tariff.dict(),
-            tariff_id,
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
-    else:
-        data = await crud.create(
-            ModuleID.tariffs,
-            RoleEnum.emsp,
-            tariff.dict(),
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
 
     return OCPIResponse(
         data=[adapter.tariff_adapter(data).dict()],
@@ -0,0 +1,12 @@
+from ocpi.core.crud import LIST_SORT
+from ocpi.core.schemas import IndexSpec
+
+INDEXES = [
+    # lookups by id, optionally scoped to the owner party
+    IndexSpec(
+        keys=[("id", 1), ("country_code", 1), ("party_id", 1)],
+        unique=True,
+    ),
+    # date window and paging of the list endpoint
+    IndexSpec(keys=LIST_SORT),
+]
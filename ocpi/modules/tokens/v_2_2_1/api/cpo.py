@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Request, Depends
 
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.data_types import CiString
 from ocpi.core.enums import ModuleID, RoleEnum
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
-from ocpi.core.utils import get_auth_token, partially_update_attributes
+from ocpi.core.utils import (
+    get_auth_token,
+    partially_update_attributes,
+    update_with_retry,
+)
 from ocpi.core.dependencies import get_crud, get_adapter
 from ocpi.modules.versions.enums import VersionNumber
 from ocpi.modules.tokens.v_2_2_1.enums import TokenType
@@ -58,39 +63,17 @@ async def add_or_update_token(
 ):
     auth_token = get_auth_token(request)
 
-    data = await crud.get(
+    data = await crud.upsert(
         ModuleID.tokens,
         RoleEnum.cpo,
+        token.dict(),
         token_uid,
-        auth_token=auth_token,
         token_type=token_type,
+        auth_token=auth_token,
         country_code=country_code,
         party_id=party_id,
         version=VersionNumber.v_2_2_1,
     )
-    if data:
-        data = await crud.update(
-            ModuleID.tokens,
-            RoleEnum.cpo,
-            token.dict(),
-            token_uid,
-            token_type=token_type,
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
-    else:
-        data = await crud.create(
-            ModuleID.tokens,
-            RoleEnum.cpo,
-            token.dict(),
-            token_type=token_type,
-            auth_token=auth_token,
-            country_code=country_code,
-            party_id=party_id,
-            version=VersionNumber.v_2_2_1,
-        )
     return OCPIResponse(
         data=[adapter.token_adapter(data).dict()],
         **status.OCPI_1000_GENERIC_SUCESS_CODE,
@@ -110,28 +93,35 @@ async def partial_update_token(
 ):
     auth_token = get_auth_token(request)
 
-    old_data = await crud.get(
-        ModuleID.tokens,
-        RoleEnum.cpo,
-        token_uid,
-        token_type=token_type,
-        auth_token=auth_token,
-        country_code=country_code,
-        party_id=party_id,
-        version=VersionNumber.v_2_2_1,
-    )
-    old_token = adapter.token_adapter(old_data)
+    patch_data = token.dict(exclude_defaults=True, exclude_unset=True)
+    if settings.PATCH_FAST_PATH and patch_data:
+        data = await crud.partial_update(
+            ModuleID.tokens,
+            RoleEnum.cpo,
+            patch_data,
+            token_uid,
+            token_type=token_type,
+            auth_token=auth_token,
+            country_code=country_code,
+            party_id=party_id,
+            version=VersionNumber.v_2_2_1,
+        )
+        return OCPIResponse(
+            data=[adapter.token_adapter(data).dict()],
+            **status.OCPI_1000_GENERIC_SUCESS_CODE,
+        )
 
-    new_token = old_token
-    partially_update_attributes(
-        new_token, token.dict(exclude_defaults=True, exclude_unset=True)
-    )
+    def patch(old_data: dict) -> dict:
+        new_token = adapter.token_adapter(old_data)
+        partially_update_attributes(new_token, patch_data)
+        return new_token.dict()
 
-    data = await crud.update(
+    data = await update_with_retry(
+        crud,
         ModuleID.tokens,
         RoleEnum.cpo,
-        new_token.dict(),
         token_uid,
+        patch,
         token_type=token_type,
         auth_token=auth_token,
         country_code=country_code,
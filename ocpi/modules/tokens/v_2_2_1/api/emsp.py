@@ -3,8 +3,9 @@ from fastapi import APIRouter, Depends, Response, Request, status as http_status
 from ocpi.modules.tokens.v_2_2_1.enums import TokenType
 from ocpi.modules.tokens.v_2_2_1.schemas import LocationReference, AuthorizationInfo
 from ocpi.modules.versions.enums import VersionNumber
-from ocpi.core.utils import get_list, get_auth_token
+from ocpi.core.utils import get_list, stream_list, get_auth_token
 from ocpi.core import status
+from ocpi.core.config import settings
 from ocpi.core.schemas import OCPIResponse
 from ocpi.core.adapter import Adapter
 from ocpi.core.crud import Crud
@@ -28,6 +29,17 @@ async def get_tokens(
 ):
     auth_token = get_auth_token(request)
 
+    if settings.STREAM_LISTS:
+        return await stream_list(
+            filters,
+            ModuleID.tokens,
+            RoleEnum.emsp,
+            VersionNumber.v_2_2_1,
+            crud,
+            adapter.token_adapter,
+            auth_token=auth_token,
+        )
+
     data_list = await get_list(
         response,
         filters,
@@ -1,6 +1,5 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 
-from ocpi.core import status
 from ocpi.core.dependencies import get_versions as get_versions_
 from ocpi.core.schemas import OCPIResponse
 
@@ -8,8 +7,5 @@ router = APIRouter()
 
 
 @router.get("/versions", response_model=OCPIResponse)
-async def get_versions(versions=Depends(get_versions_)):
-    return OCPIResponse(
-        data=versions,
-        **status.OCPI_1000_GENERIC_SUCESS_CODE,
-    )
+async def get_versions(request: Request, versions=Depends(get_versions_)):
+    return request.app.state.versions_response(versions)
@@ -0,0 +1,244 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from ocpi.core.buffer import WriteBuffer
+from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.exceptions import NotFoundOCPIError
+from ocpi.core.schemas import BulkWriteReport
+
+LOCATION_KWARGS = {"country_code": "us", "party_id": "aaa"}
+
+
+def mock_crud():
+    crud = MagicMock()
+    crud.bulk_upsert = AsyncMock(return_value=BulkWriteReport(written=1))
+    crud.update = AsyncMock()
+    crud.update_sub_object = AsyncMock()
+    crud.upsert = AsyncMock()
+    crud.get = AsyncMock(return_value={"id": "loc1"})
+    return crud
+
+
+def location(last_updated: str, name: str = "") -> dict:
+    return {"id": "loc1", "name": name, "last_updated": last_updated}
+
+
+@pytest.mark.asyncio
+async def test_coalesces_writes_keeping_latest():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+
+    for data in (
+        location("2022-01-01 00:00:00+00:00", "first"),
+        location("2022-01-03 00:00:00+00:00", "latest"),
+        location("2022-01-02T00:00:00Z", "late"),
+    ):
+        await buffer.upsert(
+            ModuleID.locations, RoleEnum.emsp, data, "loc1", **LOCATION_KWARGS
+        )
+    assert len(buffer) == 1
+    await buffer.flush()
+
+    crud.bulk_upsert.assert_awaited_once_with(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        [location("2022-01-03 00:00:00+00:00", "latest")],
+    )
+    crud.upsert.assert_not_awaited()
+    assert len(buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_coalesces_timestamps_without_timezone_as_utc():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+
+    for data in (
+        location("2022-01-01T10:00:00", "latest"),
+        location("2022-01-01T09:00:00Z", "older"),
+    ):
+        await buffer.upsert(
+            ModuleID.locations, RoleEnum.emsp, data, "loc1", **LOCATION_KWARGS
+        )
+    await buffer.flush()
+
+    crud.bulk_upsert.assert_awaited_once_with(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        [location("2022-01-01T10:00:00", "latest")],
+    )
+
+
+@pytest.mark.asyncio
+async def test_full_write_supersedes_pending_evse_writes():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+
+    await buffer.update_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"uid": "e1", "status": "CHARGING"},
+        "loc1",
+        evse_uid="e1",
+        **LOCATION_KWARGS,
+    )
+    await buffer.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("2022-01-01 00:00:00+00:00"),
+        "loc1",
+        **LOCATION_KWARGS,
+    )
+    await buffer.update_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"uid": "e2", "status": "AVAILABLE"},
+        "loc1",
+        evse_uid="e2",
+        **LOCATION_KWARGS,
+    )
+    await buffer.flush()
+
+    crud.bulk_upsert.assert_awaited_once()
+    crud.update_sub_object.assert_awaited_once_with(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"uid": "e2", "status": "AVAILABLE"},
+        "loc1",
+        evse_uid="e2",
+        **LOCATION_KWARGS,
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_flushes_pending_writes_of_the_object():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+    await buffer.update(
+        ModuleID.sessions, RoleEnum.emsp, {"id": "s1"}, "s1", **LOCATION_KWARGS
+    )
+    await buffer.update(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("2022-01-01 00:00:00+00:00"),
+        "loc1",
+        **LOCATION_KWARGS,
+    )
+
+    await buffer.get(ModuleID.locations, RoleEnum.emsp, "loc1", **LOCATION_KWARGS)
+
+    crud.update.assert_awaited_once()
+    assert crud.update.await_args.args[0] == ModuleID.locations
+    assert len(buffer) == 1
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_flushes_before_enqueueing():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=1)
+
+    for id in ("loc1", "loc2"):
+        await buffer.upsert(
+            ModuleID.locations, RoleEnum.emsp, {"id": id}, id, **LOCATION_KWARGS
+        )
+
+    crud.bulk_upsert.assert_awaited_once_with(
+        ModuleID.locations, RoleEnum.emsp, [{"id": "loc1"}]
+    )
+    assert len(buffer) == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_and_cpo_writes_are_not_buffered():
+    crud = mock_crud()
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+    buffer.start()
+
+    await buffer.upsert(ModuleID.tokens, RoleEnum.cpo, {"uid": "t1"}, "t1")
+    crud.upsert.assert_awaited_once()
+    await buffer.upsert(
+        ModuleID.tariffs, RoleEnum.emsp, {"id": "t1"}, "t1", **LOCATION_KWARGS
+    )
+    await buffer.stop()
+
+    crud.bulk_upsert.assert_awaited_once_with(
+        ModuleID.tariffs, RoleEnum.emsp, [{"id": "t1"}]
+    )
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_kept_pending():
+    crud = mock_crud()
+    crud.bulk_upsert.side_effect = [ConnectionError("down"), BulkWriteReport(written=1)]
+    crud.update_sub_object.side_effect = [ConnectionError("down"), None, None]
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+
+    await buffer.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("2022-01-01 00:00:00+00:00"),
+        "loc1",
+        **LOCATION_KWARGS,
+    )
+    await buffer.update_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"uid": "e1", "status": "CHARGING"},
+        "loc2",
+        evse_uid="e1",
+        **LOCATION_KWARGS,
+    )
+    await buffer.update_sub_object(
+        ModuleID.tariffs,
+        RoleEnum.emsp,
+        {"id": "t1"},
+        "t1",
+        evse_uid="e1",
+        **LOCATION_KWARGS,
+    )
+    crud.update.side_effect = NotFoundOCPIError
+    await buffer.update(
+        ModuleID.sessions, RoleEnum.emsp, {"id": "s1"}, "s1", **LOCATION_KWARGS
+    )
+    await buffer.flush()
+
+    # the OCPI error is not retried, the database errors are
+    assert len(buffer) == 2
+    await buffer.flush()
+
+    assert len(buffer) == 0
+    assert crud.bulk_upsert.await_count == 2
+    assert crud.update.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_evse_write_supersedes_older_connector_writes():
+    crud = mock_crud()
+    order = []
+    crud.update_sub_object.side_effect = lambda *args, **kwargs: order.append(
+        (kwargs["evse_uid"], kwargs.get("connector_id"), args[2]["last_updated"])
+    )
+    buffer = WriteBuffer(crud, window=60, max_size=10)
+
+    for data, connector_id in (
+        ({"last_updated": "2022-01-01 00:00:00+00:00"}, "c1"),
+        ({"last_updated": "2022-01-04 00:00:00+00:00"}, "c2"),
+        ({"last_updated": "2022-01-02 00:00:00+00:00"}, None),
+    ):
+        await buffer.update_sub_object(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            data,
+            "loc1",
+            evse_uid="e1",
+            connector_id=connector_id,
+            **LOCATION_KWARGS,
+        )
+    await buffer.flush()
+
+    # the older c1 write is dropped, the newer c2 one is applied after the EVSE write
+    assert order == [
+        ("e1", None, "2022-01-02 00:00:00+00:00"),
+        ("e1", "c2", "2022-01-04 00:00:00+00:00"),
+    ]
@@ -0,0 +1,76 @@
+from ocpi.core.cache import TTLCache
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+
+
+def test_entries_expire(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr("ocpi.core.cache.time.monotonic", lambda: now)
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("a", 1)
+
+    now = 161.0
+
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    cache = TTLCache(max_size=10, ttl=60)
+    for key in (("t1", "cpo"), ("t1", "emsp"), ("t2", "cpo")):
+        cache.set(key, {})
+
+    cache.invalidate(("t2", "cpo"))
+    assert len(cache) == 2
+    cache.invalidate(where=lambda key: key[0] == "t1")
+    assert len(cache) == 0
+
+
+def test_set_skipped_after_group_invalidation():
+    cache = TTLCache(max_size=10, ttl=60)
+    generation = cache.generation("loc1")
+    other = cache.generation("loc2")
+    cache.invalidate(group="loc1")
+
+    cache.set(("t1", "loc1"), 1, "loc1", generation)
+    assert len(cache) == 0
+    # fills of the other groups are kept
+    cache.set(("t1", "loc2"), 2, "loc2", other)
+    cache.set(("t1", "loc1"), 1, "loc1", cache.generation("loc1"))
+    cache.set(("t2", "loc1"), 1, "loc1", cache.generation("loc1"))
+    assert len(cache) == 3
+
+    cache.invalidate(group="loc1")
+    assert (len(cache), cache.get(("t1", "loc2"))) == (1, 2)
+
+
+def test_forgotten_generations_stay_stale():
+    cache = TTLCache(max_size=1, ttl=60)
+    generation = cache.generation("loc1")
+    cache.invalidate(group="loc1")
+    # the generation of loc1 is no longer kept
+    cache.invalidate(group="loc2")
+
+    cache.set("a", 1, "loc1", generation)
+    assert len(cache) == 0
+
+
+def test_evicts_beyond_max_bytes():
+    cache = TTLCache(max_size=10, ttl=60, max_bytes=100)
+    cache.set("a", 1, size=60)
+    cache.set("b", 2, size=30)
+    cache.set("c", 3, size=20)
+
+    assert cache.get("a") is None
+    assert (len(cache), cache.bytes, cache.evictions) == (2, 50, 1)
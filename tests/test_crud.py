@@ -0,0 +1,822 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo import DeleteMany, DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import SecondaryPreferred
+
+from ocpi.core.adapter import Adapter
+from ocpi.core.config import settings
+from ocpi.core.crud import (
+    CHANGE_LOG_COLLECTION,
+    CHANGE_LOG_SEQUENCE_COLLECTION,
+    CHARGING_PERIOD_COLLECTION,
+    EVSE_STATUS_COLLECTION,
+    Crud,
+    geo_point,
+)
+from ocpi.core.enums import ChangeType, CountStrategy, ModuleID, RoleEnum
+from ocpi.core.exceptions import ConflictOCPIError, NotFoundOCPIError
+from ocpi.core.utils import update_with_retry
+
+from tests.test_modules.test_tokens import TOKENS
+
+
+def mock_collection(name: str = "locations"):
+    collection = MagicMock()
+    collection.name = name
+    collection.count_documents = AsyncMock(return_value=10)
+    collection.estimated_document_count = AsyncMock(return_value=12)
+    return collection
+
+
+@pytest.mark.asyncio
+async def test_estimated_count():
+    collection = mock_collection()
+
+    assert await Crud._count(collection, {}, CountStrategy.estimated) == 12
+    collection.count_documents.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_cached_count():
+    collection = mock_collection("cached_locations")
+    query = {"last_updated": {"$gte": "2022-01-01 00:00:00+00:00"}}
+
+    assert await Crud._count(collection, query, CountStrategy.cached) == 10
+    collection.count_documents.return_value = 11
+    assert await Crud._count(collection, query, CountStrategy.cached) == 10
+    collection.count_documents.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_upsert_single_round_trip(monkeypatch):
+    collection = mock_collection()
+    collection.find_one_and_replace = AsyncMock(return_value={"id": "loc1"})
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    data = await Crud.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"id": "loc1"},
+        "loc1",
+        country_code="us",
+        party_id="aaa",
+    )
+
+    assert data == {"id": "loc1"}
+    collection.find_one_and_replace.assert_awaited_once_with(
+        {"id": "loc1", "country_code": "us", "party_id": "aaa"},
+        {"id": "loc1"},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+@pytest.mark.asyncio
+async def test_location_writes_keep_geo_point(monkeypatch):
+    collection = mock_collection()
+    collection.find_one_and_replace = AsyncMock(return_value={"id": "loc1"})
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+    location = {"id": "loc1", "coordinates": {"latitude": "3.1", "longitude": "101.6"}}
+
+    await Crud.upsert(ModuleID.locations, RoleEnum.emsp, location, "loc1")
+
+    stored = collection.find_one_and_replace.await_args.args[1]
+    assert stored["geo_point"] == {"type": "Point", "coordinates": [101.6, 3.1]}
+    assert "geo_point" not in location
+    assert geo_point({"latitude": "91", "longitude": "0"}) is None
+    assert geo_point({"latitude": "north", "longitude": "0"}) is None
+
+
+@pytest.mark.asyncio
+async def test_geo_search_queries_2dsphere_index(monkeypatch):
+    collection = mock_collection()
+    collection.find.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    await Crud.geo_search(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        {"latitude": 3.1, "longitude": 101.6, "radius": 500, "limit": 5},
+    )
+
+    collection.find.assert_called_once_with(
+        {
+            "geo_point": {
+                "$nearSphere": {
+                    "$geometry": {"type": "Point", "coordinates": [101.6, 3.1]},
+                    "$maxDistance": 500,
+                }
+            }
+        }
+    )
+    collection.find.return_value.limit.assert_called_once_with(5)
+
+
+@pytest.mark.asyncio
+async def test_update_sub_object_replaces_connector_in_place(monkeypatch):
+    collection = mock_collection()
+    collection.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+    connector = {"id": "c1", "last_updated": "2022-01-02 00:00:00+00:00"}
+
+    await Crud.update_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        connector,
+        "loc1",
+        evse_uid="e1",
+        connector_id="c1",
+    )
+
+    collection.update_one.assert_awaited_once_with(
+        {
+            "id": "loc1",
+            "evses": {"$elemMatch": {"uid": "e1", "connectors.id": "c1"}},
+        },
+        {
+            "$set": {
+                "evses.$[e].connectors.$[c]": connector,
+                "last_updated": connector["last_updated"],
+                "evses.$[e].last_updated": connector["last_updated"],
+            }
+        },
+        array_filters=[{"e.uid": "e1"}, {"c.id": "c1"}],
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_sub_object_appends_new_evse(monkeypatch):
+    collection = mock_collection()
+    collection.update_one = AsyncMock(
+        side_effect=[MagicMock(matched_count=0), MagicMock(matched_count=1)]
+    )
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+    evse = {"uid": "e2", "connectors": []}
+
+    await Crud.update_sub_object(
+        ModuleID.locations, RoleEnum.emsp, evse, "loc1", evse_uid="e2"
+    )
+
+    collection.update_one.assert_awaited_with(
+        {"id": "loc1", "evses.uid": {"$ne": "e2"}},
+        {"$push": {"evses": evse}},
+        array_filters=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_sub_object_missing_location(monkeypatch):
+    collection = mock_collection()
+    collection.update_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    with pytest.raises(NotFoundOCPIError):
+        await Crud.update_sub_object(
+            ModuleID.locations, RoleEnum.emsp, {"uid": "e2"}, "loc1", evse_uid="e2"
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_projects_connector(monkeypatch):
+    connector = {"id": "c2"}
+    collection = mock_collection()
+    collection.find_one = AsyncMock(
+        return_value={"evses": [{"uid": "e1", "connectors": [{"id": "c1"}, connector]}]}
+    )
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    data = await Crud.get(
+        ModuleID.locations, RoleEnum.cpo, "loc1", evse_uid="e1", connector_id="c2"
+    )
+
+    assert data == connector
+    collection.find_one.assert_awaited_once_with(
+        {"id": "loc1", "evses.uid": "e1"},
+        {"_id": 0, "evses": {"$elemMatch": {"uid": "e1"}}},
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_batches_and_reports_failures(monkeypatch):
+    collection = mock_collection("tokens")
+    collection.bulk_write = AsyncMock(
+        side_effect=[
+            BulkWriteError(
+                {
+                    "nUpserted": 1,
+                    "nMatched": 0,
+                    "nRemoved": 0,
+                    "writeErrors": [{"index": 1, "errmsg": "duplicate key"}],
+                }
+            ),
+            MagicMock(upserted_count=0, matched_count=1, deleted_count=0),
+        ]
+    )
+    monkeypatch.setattr(Crud, "_database", {"tokens": collection})
+    tokens = [{"uid": f"t{i}", "type": "RFID"} for i in range(3)]
+
+    report = await Crud.bulk_upsert(ModuleID.tokens, RoleEnum.cpo, tokens, batch_size=2)
+
+    assert report.written == 2
+    assert [(f.index, f.id) for f in report.failures] == [(1, "t1")]
+    first_batch = collection.bulk_write.await_args_list[0]
+    assert first_batch.args[0][0] == ReplaceOne(
+        {"uid": "t0", "type": "RFID"}, tokens[0], upsert=True
+    )
+    assert first_batch.kwargs == {"ordered": False}
+    assert len(collection.bulk_write.await_args_list[1].args[0]) == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete(monkeypatch):
+    collection = mock_collection("tariffs")
+    collection.bulk_write = AsyncMock(
+        return_value=MagicMock(upserted_count=0, matched_count=0, deleted_count=2)
+    )
+    monkeypatch.setattr(Crud, "_database", {"tariffs": collection})
+
+    report = await Crud.bulk_delete(
+        ModuleID.tariffs, RoleEnum.emsp, ["t1", "t2"], party_id="aaa"
+    )
+
+    assert report.written == 2
+    assert report.failures == []
+    collection.bulk_write.assert_awaited_once_with(
+        [
+            DeleteOne({"id": "t1", "party_id": "aaa"}),
+            DeleteOne({"id": "t2", "party_id": "aaa"}),
+        ],
+        ordered=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_logs_written_objects(monkeypatch):
+    collection = mock_collection("tokens")
+    collection.bulk_write = AsyncMock(
+        side_effect=BulkWriteError(
+            {
+                "nUpserted": 1,
+                "nMatched": 0,
+                "nRemoved": 0,
+                "writeErrors": [{"index": 1, "errmsg": "duplicate key"}],
+            }
+        )
+    )
+    changes = mock_collection(CHANGE_LOG_COLLECTION)
+    changes.insert_many = AsyncMock()
+    sequences = mock_collection(CHANGE_LOG_SEQUENCE_COLLECTION)
+    sequences.find_one_and_update = AsyncMock(return_value={"seq": 7})
+    monkeypatch.setattr(
+        Crud,
+        "_database",
+        {
+            "tokens": collection,
+            CHANGE_LOG_COLLECTION: changes,
+            CHANGE_LOG_SEQUENCE_COLLECTION: sequences,
+        },
+    )
+    monkeypatch.setattr(settings, "CHANGE_LOG_MODULES", [ModuleID.tokens])
+    tokens = [{"uid": f"t{i}", "type": "RFID"} for i in range(2)]
+
+    await Crud.bulk_upsert(ModuleID.tokens, RoleEnum.emsp, tokens)
+
+    sequences.find_one_and_update.assert_awaited_once_with(
+        {"_id": "tokens"},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    (entries,) = changes.insert_many.await_args.args
+    assert [(entry["type"], entry["key"], entry["seq"]) for entry in entries] == [
+        ("UPSERT", {"uid": "t0", "type": "RFID"}, 7)
+    ]
+    assert entries[0]["module"] == "tokens"
+
+
+@pytest.mark.asyncio
+async def test_changes_keep_last_change_of_each_object(monkeypatch):
+    loc1 = {"id": "loc1", "country_code": "us", "party_id": "aaa"}
+    loc2 = {"id": "loc2", "country_code": "us", "party_id": "aaa"}
+    created = datetime.now(timezone.utc)
+    entries = [
+        {"seq": 1, "type": "UPSERT", "key": loc1, "created": created},
+        {"seq": 2, "type": "UPSERT", "key": loc2, "created": created},
+        {"seq": 3, "type": "DELETE", "key": loc1, "created": created},
+        {"seq": 4, "type": "UPSERT", "key": loc2, "created": created},
+    ]
+    changes = mock_collection(CHANGE_LOG_COLLECTION)
+    changes.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+        return_value=entries
+    )
+    collection = mock_collection()
+    collection.find.return_value.to_list = AsyncMock(
+        return_value=[{**loc2, "name": "current"}]
+    )
+    monkeypatch.setattr(
+        Crud, "_database", {"locations": collection, CHANGE_LOG_COLLECTION: changes}
+    )
+
+    result, is_last_page, last = await Crud.changes(
+        ModuleID.locations, RoleEnum.cpo, {"seq": 0}, limit=3
+    )
+
+    changes.find.assert_called_once_with({"module": "locations", "seq": {"$gt": 0}})
+    changes.find.return_value.sort.assert_called_once_with("seq", 1)
+    collection.find.assert_called_once_with({"$or": [loc2]})
+    assert [(change["type"], change["key"]) for change in result] == [
+        (ChangeType.upsert, loc2),
+        (ChangeType.delete, loc1),
+    ]
+    assert result[0]["data"]["name"] == "current"
+    assert (is_last_page, last["seq"]) == (False, 3)
+
+
+@pytest.mark.asyncio
+async def test_changes_stop_at_entries_not_inserted_yet(monkeypatch):
+    loc1 = {"id": "loc1", "country_code": "us", "party_id": "aaa"}
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(seconds=settings.CHANGE_LOG_GAP_WAIT + 1)
+    # 2 was left by a failed write, 5 is still being inserted
+    entries = [
+        {"seq": 1, "type": "DELETE", "key": loc1, "created": old},
+        {"seq": 3, "type": "DELETE", "key": loc1, "created": old},
+        {"seq": 4, "type": "DELETE", "key": loc1, "created": now},
+        {"seq": 6, "type": "DELETE", "key": loc1, "created": now},
+    ]
+    changes = mock_collection(CHANGE_LOG_COLLECTION)
+    changes.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+        return_value=entries
+    )
+    monkeypatch.setattr(Crud, "_database", {CHANGE_LOG_COLLECTION: changes})
+
+    result, is_last_page, last = await Crud.changes(
+        ModuleID.locations, RoleEnum.cpo, {"seq": 0}, limit=4
+    )
+
+    assert len(result) == 1
+    assert (is_last_page, last["seq"]) == (True, 4)
+
+
+class AsyncCursor:
+    def __init__(self, documents: list):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+@pytest.mark.asyncio
+async def test_status_store_keeps_evse_status_out_of_location(monkeypatch):
+    monkeypatch.setattr(settings, "EVSE_STATUS_STORE", True)
+    evse = {"uid": "e1", "status": "CHARGING", "last_updated": "2022-01-02"}
+    location = {"id": "loc1", "country_code": "us", "party_id": "aaa", "evses": [evse]}
+    collection = mock_collection()
+    collection.find_one_and_replace = AsyncMock(
+        side_effect=lambda query, data, **kwargs: {**data, "_id": 1}
+    )
+    collection.find_one = AsyncMock(
+        return_value={
+            **location,
+            "evses": [{"uid": "e1", "last_updated": "2022-01-02"}],
+        }
+    )
+    statuses = mock_collection(EVSE_STATUS_COLLECTION)
+    statuses.bulk_write = AsyncMock()
+    statuses.find = MagicMock(
+        return_value=AsyncCursor(
+            [{"location_id": "loc1", "evse_uid": "e1", "status": "AVAILABLE"}]
+        )
+    )
+    monkeypatch.setattr(
+        Crud, "_database", {"locations": collection, EVSE_STATUS_COLLECTION: statuses}
+    )
+
+    data = await Crud.upsert(ModuleID.locations, RoleEnum.emsp, location, "loc1")
+
+    stored = collection.find_one_and_replace.await_args.args[1]
+    assert stored["evses"] == [{"uid": "e1", "last_updated": "2022-01-02"}]
+    assert data["evses"] == [evse]
+    key = {"location_id": "loc1", "country_code": "us", "party_id": "aaa"}
+    statuses.bulk_write.assert_awaited_once_with(
+        [
+            UpdateOne(
+                {**key, "evse_uid": "e1"},
+                {"$set": {"status": "CHARGING", "last_updated": "2022-01-02"}},
+                upsert=True,
+            ),
+            DeleteMany({**key, "evse_uid": {"$nin": ["e1"]}}),
+        ],
+        ordered=False,
+    )
+
+    data = await Crud.get(ModuleID.locations, RoleEnum.emsp, "loc1")
+    assert data["evses"][0]["status"] == "AVAILABLE"
+
+
+@pytest.mark.asyncio
+async def test_update_evse_status_does_not_read_location(monkeypatch):
+    monkeypatch.setattr(settings, "EVSE_STATUS_STORE", True)
+    collection = mock_collection()
+    collection.update_one = AsyncMock()
+    statuses = mock_collection(EVSE_STATUS_COLLECTION)
+    statuses.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    monkeypatch.setattr(
+        Crud, "_database", {"locations": collection, EVSE_STATUS_COLLECTION: statuses}
+    )
+
+    await Crud.update_evse_status(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"status": "CHARGING", "last_updated": "2022-01-03"},
+        "loc1",
+        evse_uid="e1",
+    )
+
+    query, update = statuses.update_one.await_args.args
+    assert query["$or"][0] == {"last_updated": {"$lte": "2022-01-03"}}
+    assert update == {"$set": {"status": "CHARGING", "last_updated": "2022-01-03"}}
+    collection.update_one.assert_awaited_once_with(
+        {"id": "loc1"},
+        {
+            "$max": {
+                "last_updated": "2022-01-03",
+                "evses.$[e].last_updated": "2022-01-03",
+            }
+        },
+        array_filters=[{"e.uid": "e1"}],
+    )
+    collection.find_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_partial_update_sets_patched_fields(monkeypatch):
+    collection = mock_collection()
+    collection.find_one_and_update = AsyncMock(return_value={"id": "loc1"})
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    data = await Crud.partial_update(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {
+            "coordinates": {"latitude": "3.0", "longitude": "101.0"},
+            "last_updated": "2022-01-03",
+        },
+        "loc1",
+    )
+
+    assert data == {"id": "loc1"}
+    query, update = collection.find_one_and_update.await_args.args
+    assert query == {"id": "loc1"}
+    assert update == {
+        "$set": {
+            "coordinates": {"latitude": "3.0", "longitude": "101.0"},
+            "geo_point": {"type": "Point", "coordinates": [101.0, 3.0]},
+        },
+        "$max": {"last_updated": "2022-01-03"},
+    }
+    collection.find_one.assert_not_called()
+
+    collection.find_one_and_update = AsyncMock(return_value=None)
+    with pytest.raises(NotFoundOCPIError):
+        await Crud.partial_update(
+            ModuleID.locations, RoleEnum.emsp, {"name": "new"}, "loc2"
+        )
+
+
+@pytest.mark.asyncio
+async def test_patch_sub_object_sets_dotted_fields(monkeypatch):
+    collection = mock_collection()
+    collection.find_one_and_update = AsyncMock(
+        return_value={
+            "evses": [{"uid": "e1", "connectors": [{"id": "c1", "max_voltage": 400}]}]
+        }
+    )
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    data = await Crud.patch_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        {"max_voltage": 400, "last_updated": "2022-01-03"},
+        "loc1",
+        evse_uid="e1",
+        connector_id="c1",
+    )
+
+    assert data == {"id": "c1", "max_voltage": 400}
+    query, update = collection.find_one_and_update.await_args.args
+    assert query == {
+        "id": "loc1",
+        "evses": {"$elemMatch": {"uid": "e1", "connectors.id": "c1"}},
+    }
+    assert update == {
+        "$set": {"evses.$[e].connectors.$[c].max_voltage": 400},
+        "$max": {
+            "last_updated": "2022-01-03",
+            "evses.$[e].last_updated": "2022-01-03",
+            "evses.$[e].connectors.$[c].last_updated": "2022-01-03",
+        },
+    }
+    collection.find_one.assert_not_called()
+
+    collection.find_one_and_update = AsyncMock(return_value=None)
+    with pytest.raises(NotFoundOCPIError):
+        await Crud.patch_sub_object(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            {"status": "CHARGING"},
+            "loc1",
+            evse_uid="e2",
+        )
+
+
+@pytest.mark.asyncio
+async def test_period_store_writes_only_sent_periods(monkeypatch):
+    monkeypatch.setattr(settings, "CHARGING_PERIOD_STORE", True)
+    first = {"start_date_time": "2022-01-02 00:00:00+00:00", "dimensions": []}
+    second = {"start_date_time": "2022-01-02 00:05:00+00:00", "dimensions": []}
+    collection = mock_collection("sessions")
+    collection.find_one_and_replace = AsyncMock(
+        side_effect=lambda query, data, **_: dict(data)
+    )
+    collection.find_one_and_update = AsyncMock(
+        return_value={"id": "s1", "country_code": "us", "party_id": "aaa"}
+    )
+    periods = mock_collection(CHARGING_PERIOD_COLLECTION)
+    periods.bulk_write = AsyncMock()
+    periods.find.return_value.sort.return_value = AsyncCursor(
+        [
+            {"session_id": "s1", "country_code": "us", "party_id": "aaa", **first},
+            {"session_id": "s1", "country_code": "us", "party_id": "aaa", **second},
+        ]
+    )
+    monkeypatch.setattr(
+        Crud,
+        "_database",
+        {"sessions": collection, CHARGING_PERIOD_COLLECTION: periods},
+    )
+    key = {"session_id": "s1", "country_code": "us", "party_id": "aaa"}
+
+    data = await Crud.upsert(
+        ModuleID.sessions,
+        RoleEnum.emsp,
+        {
+            "id": "s1",
+            "country_code": "us",
+            "party_id": "aaa",
+            "charging_periods": [first],
+        },
+        "s1",
+    )
+
+    assert "charging_periods" not in collection.find_one_and_replace.await_args.args[1]
+    assert data["charging_periods"] == [first]
+    periods.bulk_write.assert_awaited_once_with(
+        [
+            UpdateOne(
+                {**key, "start_date_time": first["start_date_time"]},
+                {"$set": first},
+                upsert=True,
+            ),
+            DeleteMany(
+                {**key, "start_date_time": {"$nin": [first["start_date_time"]]}}
+            ),
+        ],
+        ordered=False,
+    )
+
+    data = await Crud.partial_update(
+        ModuleID.sessions,
+        RoleEnum.emsp,
+        {"kwh": 10, "charging_periods": [second]},
+        "s1",
+        country_code="us",
+        party_id="aaa",
+    )
+
+    # the new period is added, the stored ones are left untouched
+    assert periods.bulk_write.await_args.args[0] == [
+        UpdateOne(
+            {**key, "start_date_time": second["start_date_time"]},
+            {"$set": second},
+            upsert=True,
+        )
+    ]
+    assert collection.find_one_and_update.await_args.args[1] == {"$set": {"kwh": 10}}
+    assert data["charging_periods"] == [first, second]
+
+
+@pytest.mark.asyncio
+async def test_period_store_update_writes_only_patched_periods(monkeypatch):
+    monkeypatch.setattr(settings, "CHARGING_PERIOD_STORE", True)
+    first = {"start_date_time": "2022-01-02 00:00:00+00:00", "dimensions": []}
+    second = {"start_date_time": "2022-01-02 00:05:00+00:00", "dimensions": []}
+    collection = mock_collection("sessions")
+    collection.find_one_and_update = AsyncMock(return_value={"id": "s1"})
+    periods = mock_collection(CHARGING_PERIOD_COLLECTION)
+    periods.bulk_write = AsyncMock()
+    periods.find.return_value.sort.return_value = AsyncCursor([])
+    monkeypatch.setattr(
+        Crud,
+        "_database",
+        {"sessions": collection, CHARGING_PERIOD_COLLECTION: periods},
+    )
+
+    # the merged Session of a PATCH appending the second period
+    await Crud.update(
+        ModuleID.sessions,
+        RoleEnum.emsp,
+        {"id": "s1", "charging_periods": [first, second]},
+        "s1",
+        patched_periods=(second["start_date_time"],),
+    )
+
+    periods.bulk_write.assert_awaited_once_with(
+        [
+            UpdateOne(
+                {"session_id": "s1", "start_date_time": second["start_date_time"]},
+                {"$set": second},
+                upsert=True,
+            )
+        ],
+        ordered=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_partial_update_appends_session_periods(monkeypatch):
+    period = {"start_date_time": "2022-01-02 00:05:00+00:00", "dimensions": []}
+    collection = mock_collection("sessions")
+    collection.find_one_and_update = AsyncMock(return_value={"id": "s1"})
+    monkeypatch.setattr(Crud, "_database", {"sessions": collection})
+
+    await Crud.partial_update(
+        ModuleID.sessions,
+        RoleEnum.emsp,
+        {"kwh": 10, "charging_periods": [period], "last_updated": "2022-01-03"},
+        "s1",
+    )
+
+    # stored periods with another start are kept, the patched ones follow them
+    assert collection.find_one_and_update.await_args.args[1] == [
+        {
+            "$set": {
+                "kwh": {"$literal": 10},
+                "last_updated": {"$max": ["$last_updated", "2022-01-03"]},
+                "charging_periods": {
+                    "$concatArrays": [
+                        {
+                            "$filter": {
+                                "input": {"$ifNull": ["$charging_periods", []]},
+                                "as": "period",
+                                "cond": {
+                                    "$not": [
+                                        {
+                                            "$in": [
+                                                "$$period.start_date_time",
+                                                [period["start_date_time"]],
+                                            ]
+                                        }
+                                    ]
+                                },
+                            }
+                        },
+                        {"$literal": [period]},
+                    ]
+                },
+            }
+        }
+    ]
+
+
+def test_batch_adapter_rejects_invalid_objects():
+    valid, indices, failures = Adapter.batch_adapter(
+        ModuleID.tokens, [{"uid": "t0"}, TOKENS[0], {"uid": "t2"}]
+    )
+
+    assert [token["uid"] for token in valid] == [TOKENS[0]["uid"]]
+    # positions in the submitted batch, for valid and rejected objects alike
+    assert indices == [1]
+    assert [(f.index, f.id) for f in failures] == [(0, "t0"), (2, "t2")]
+
+
+@pytest.mark.asyncio
+async def test_sender_reads_follow_read_preferences(monkeypatch):
+    collection = mock_collection()
+    secondary = mock_collection()
+    secondary.find_one = AsyncMock(return_value={"id": "loc1"})
+    collection.find_one = AsyncMock(return_value={"id": "loc1"})
+    collection.with_options.return_value = secondary
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+    monkeypatch.setattr(
+        settings, "READ_PREFERENCES", {"locations.get": "secondaryPreferred"}
+    )
+    monkeypatch.setattr(settings, "READ_MAX_STALENESS", 120)
+
+    await Crud.get(ModuleID.locations, RoleEnum.cpo, "loc1")
+    await Crud.get(ModuleID.locations, RoleEnum.emsp, "loc1")
+
+    secondary.find_one.assert_awaited_once()
+    collection.find_one.assert_awaited_once()
+    read_preference = collection.with_options.call_args.kwargs["read_preference"]
+    assert read_preference == SecondaryPreferred(max_staleness=120)
+
+
+@pytest.mark.asyncio
+async def test_update_compare_and_swap(monkeypatch):
+    collection = mock_collection()
+    collection.find_one_and_update = AsyncMock(return_value=None)
+    collection.update_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+    expected = "2022-01-01 00:00:00+00:00"
+
+    assert (
+        await Crud.update(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            {"name": "new"},
+            "loc1",
+            expected_last_updated=expected,
+        )
+        is None
+    )
+    assert collection.find_one_and_update.await_args.args[0] == {
+        "id": "loc1",
+        "last_updated": expected,
+    }
+
+    assert (
+        await Crud.update_sub_object(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            {"id": "c1"},
+            "loc1",
+            evse_uid="e1",
+            connector_id="c1",
+            expected_last_updated=expected,
+        )
+        is None
+    )
+    collection.update_one.assert_awaited_once()
+    assert collection.update_one.await_args.args[0] == {
+        "id": "loc1",
+        "evses": {
+            "$elemMatch": {
+                "uid": "e1",
+                "connectors": {"$elemMatch": {"id": "c1", "last_updated": expected}},
+            }
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_with_retry_reads_again_after_conflict():
+    crud = AsyncMock()
+    crud.get.side_effect = [
+        {"id": "s1", "kwh": 1, "last_updated": "1"},
+        {"id": "s1", "kwh": 2, "last_updated": "2"},
+    ]
+    crud.update.side_effect = [None, {"id": "s1", "kwh": 3}]
+
+    data = await update_with_retry(
+        crud,
+        ModuleID.sessions,
+        RoleEnum.emsp,
+        "s1",
+        lambda old_data: {**old_data, "kwh": old_data["kwh"] + 1},
+        party_id="aaa",
+    )
+
+    assert data == {"id": "s1", "kwh": 3}
+    assert crud.update.await_args.args[2]["kwh"] == 3
+    assert crud.update.await_args.kwargs == {
+        "expected_last_updated": "2",
+        "party_id": "aaa",
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_with_retry_gives_up(monkeypatch):
+    crud = AsyncMock()
+    crud.get.return_value = {"uid": "e1", "last_updated": "1"}
+    crud.update_sub_object.return_value = None
+    monkeypatch.setattr(settings, "UPDATE_RETRIES", 2)
+
+    with pytest.raises(ConflictOCPIError):
+        await update_with_retry(
+            crud,
+            ModuleID.locations,
+            RoleEnum.emsp,
+            "loc1",
+            dict,
+            evse_uid="e1",
+        )
+    assert crud.update_sub_object.await_count == 2
+    crud.update.assert_not_awaited()
@@ -0,0 +1,76 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from ocpi.core.enums import ModuleID
+from ocpi.core.indexes import reconcile_indexes
+from ocpi.core.schemas import IndexSpec
+
+INDEXES = {
+    ModuleID.locations: [
+        IndexSpec(keys=[("id", 1), ("country_code", 1)], unique=True),
+        IndexSpec(keys=[("last_updated", 1)]),
+    ]
+}
+
+
+def database_with(index_information: dict):
+    collection = MagicMock()
+    collection.index_information = AsyncMock(return_value=index_information)
+    collection.create_index = AsyncMock()
+    return {ModuleID.locations.value: collection}, collection
+
+
+@pytest.mark.asyncio
+async def test_reconcile_creates_missing_indexes():
+    database, collection = database_with({"_id_": {"key": [("_id", 1)]}})
+
+    report = await reconcile_indexes(database, INDEXES)
+
+    assert report == {
+        "created": [
+            "locations.id_1_country_code_1",
+            "locations.last_updated_1",
+        ],
+        "drifted": [],
+    }
+    collection.create_index.assert_any_await(
+        [("id", 1), ("country_code", 1)], name="id_1_country_code_1", unique=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_drift():
+    database, collection = database_with(
+        {
+            "id_1_country_code_1": {"key": [("id", 1), ("country_code", 1)]},
+            "last_updated_1": {"key": [("last_updated", 1)]},
+        }
+    )
+
+    report = await reconcile_indexes(database, INDEXES)
+
+    assert report == {"created": [], "drifted": ["locations.id_1_country_code_1"]}
+    collection.create_index.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_reports_unique_index_over_duplicates(caplog):
+    database, collection = database_with({})
+    collection.create_index.side_effect = [
+        DuplicateKeyError(
+            "E11000 duplicate key error",
+            11000,
+            {"keyValue": {"id": "loc1", "country_code": "us"}},
+        ),
+        None,
+    ]
+
+    report = await reconcile_indexes(database, INDEXES)
+
+    assert report == {
+        "created": ["locations.last_updated_1"],
+        "drifted": ["locations.id_1_country_code_1"],
+    }
+    assert "{'id': 'loc1', 'country_code': 'us'}" in caplog.text
@@ -0,0 +1,415 @@
+import copy
+from unittest.mock import AsyncMock
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ocpi.core import enums
+from ocpi.core.adapter import Adapter
+from ocpi.core.config import settings
+from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.exceptions import NotFoundOCPIError
+from ocpi.core.memory import MemoryCrud
+from ocpi.core.utils import encode_cursor
+from ocpi.main import get_application
+from ocpi.modules.versions.enums import VersionNumber
+from tests.test_modules.test_locations import LOCATIONS
+from tests.test_modules.test_sessions import SESSIONS
+
+
+def location(id: str, last_updated: str, party_id: str = "AAA") -> dict:
+    return {
+        **copy.deepcopy(LOCATIONS[0]),
+        "id": id,
+        "party_id": party_id,
+        "last_updated": last_updated,
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_memory_crud():
+    MemoryCrud.clear()
+    yield
+    MemoryCrud.clear()
+
+
+@pytest.mark.asyncio
+async def test_list_follows_last_updated_index():
+    for id, day in (("c", 3), ("a", 1), ("b", 2), ("d", 4)):
+        await MemoryCrud.create(
+            ModuleID.locations,
+            RoleEnum.cpo,
+            location(id, f"2022-01-0{day} 00:00:00+00:00"),
+        )
+
+    filters = {
+        "date_from": datetime(2022, 1, 2),
+        "date_to": datetime(2022, 1, 4),
+        "offset": 0,
+        "limit": 1,
+    }
+    page, total, is_last_page = await MemoryCrud.list(
+        ModuleID.locations, RoleEnum.cpo, filters
+    )
+    assert [data["id"] for data in page] == ["b"]
+    assert (total, is_last_page) == (2, False)
+
+    page, total, is_last_page = await MemoryCrud.list(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        {**filters, "cursor": encode_cursor(page[-1])},
+    )
+    assert [data["id"] for data in page] == ["c"]
+    assert (total, is_last_page) == (2, True)
+
+
+@pytest.mark.asyncio
+async def test_list_pages_window_without_reading_it(monkeypatch):
+    for day in range(1, 6):
+        await MemoryCrud.create(
+            ModuleID.locations,
+            RoleEnum.cpo,
+            location(str(day), f"2022-01-0{day} 00:00:00+00:00"),
+        )
+    collection = MemoryCrud._collection(ModuleID.locations)
+
+    def window(filters):
+        raise AssertionError("the whole window is read")
+
+    monkeypatch.setattr(collection, "window", window)
+
+    page, total, is_last_page = await MemoryCrud.list(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        {"date_from": datetime(2022, 1, 2), "offset": 1, "limit": 2},
+    )
+
+    assert [data["id"] for data in page] == ["3", "4"]
+    assert (total, is_last_page) == (4, False)
+
+
+@pytest.mark.asyncio
+async def test_change_log_numbers_and_expires_entries(monkeypatch):
+    monkeypatch.setattr(settings, "CHANGE_LOG_MODULES", [ModuleID.locations])
+    for id in ("a", "b"):
+        await MemoryCrud.create(
+            ModuleID.locations, RoleEnum.cpo, location(id, "2022-01-01 00:00:00+00:00")
+        )
+    monkeypatch.setattr(settings, "CHANGE_LOG_TTL", -1)
+    await MemoryCrud.create(
+        ModuleID.locations, RoleEnum.cpo, location("c", "2022-01-01 00:00:00+00:00")
+    )
+
+    # every entry is older than the TTL, the sequence goes on
+    assert list(MemoryCrud._changes) == []
+    assert MemoryCrud._sequences == {"locations": 3}
+
+
+@pytest.mark.asyncio
+async def test_get_upsert_and_delete_use_hash_index():
+    await MemoryCrud.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("a", "2022-01-01 00:00:00+00:00"),
+        "a",
+        country_code="us",
+        party_id="AAA",
+    )
+    await MemoryCrud.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("a", "2022-01-02 00:00:00+00:00", party_id="BBB"),
+        "a",
+        country_code="us",
+        party_id="BBB",
+    )
+    data = await MemoryCrud.upsert(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        location("a", "2022-01-03 00:00:00+00:00"),
+        "a",
+        country_code="us",
+        party_id="AAA",
+    )
+
+    assert data["last_updated"] == "2022-01-03 00:00:00+00:00"
+    stored = await MemoryCrud.get(
+        ModuleID.locations, RoleEnum.emsp, "a", country_code="us", party_id="BBB"
+    )
+    assert stored["party_id"] == "BBB"
+    assert await MemoryCrud.delete(
+        ModuleID.locations, RoleEnum.emsp, "a", country_code="us", party_id="AAA"
+    )
+    _, total, _ = await MemoryCrud.list(
+        ModuleID.locations, RoleEnum.cpo, {"offset": 0, "limit": 10}
+    )
+    assert total == 1
+
+
+@pytest.mark.asyncio
+async def test_update_sub_object():
+    await MemoryCrud.create(
+        ModuleID.locations, RoleEnum.emsp, location("a", "2022-01-01 00:00:00+00:00")
+    )
+    evse = LOCATIONS[0]["evses"][0]
+    connector = {
+        **evse["connectors"][0],
+        "id": "new",
+        "last_updated": "2022-01-05 00:00:00+00:00",
+    }
+
+    await MemoryCrud.update_sub_object(
+        ModuleID.locations,
+        RoleEnum.emsp,
+        connector,
+        "a",
+        evse_uid=evse["uid"],
+        connector_id="new",
+    )
+
+    assert (
+        await MemoryCrud.get(
+            ModuleID.locations,
+            RoleEnum.emsp,
+            "a",
+            evse_uid=evse["uid"],
+            connector_id="new",
+        )
+        == connector
+    )
+    stored = await MemoryCrud.get(ModuleID.locations, RoleEnum.emsp, "a")
+    assert stored["last_updated"] == "2022-01-05 00:00:00+00:00"
+    with pytest.raises(NotFoundOCPIError):
+        await MemoryCrud.update_sub_object(
+            ModuleID.locations, RoleEnum.emsp, evse, "b", evse_uid=evse["uid"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_ignores_pagination():
+    for id, day in (("b", 2), ("a", 1), ("c", 3)):
+        await MemoryCrud.create(
+            ModuleID.locations,
+            RoleEnum.cpo,
+            location(id, f"2022-01-0{day} 00:00:00+00:00"),
+        )
+
+    documents = await MemoryCrud.export(
+        ModuleID.locations,
+        RoleEnum.cpo,
+        {"date_from": datetime(2022, 1, 2), "date_to": None, "limit": 1},
+    )
+    assert [data["id"] async for data in documents] == ["b", "c"]
+
+
+def test_application_without_database():
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], MemoryCrud, Adapter
+    )
+
+    with TestClient(app) as client:
+        client.portal.call(
+            MemoryCrud.create, ModuleID.locations, RoleEnum.cpo, LOCATIONS[0]
+        )
+        response = client.get("/ocpi/cpo/2.2.1/locations")
+
+    assert response.status_code == 200
+    assert response.json()["data"][0]["id"] == LOCATIONS[0]["id"]
+
+
+class AuthorizedMemoryCrud(MemoryCrud):
+    @classmethod
+    async def do(cls, module, role, action, *args, data: dict = None, **kwargs):
+        return {}
+
+
+def test_change_feed_resumes_after_token(monkeypatch):
+    monkeypatch.setattr(settings, "CHANGE_LOG_MODULES", [ModuleID.locations])
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], AuthorizedMemoryCrud, Adapter
+    )
+    kwargs = {"country_code": "us", "party_id": "AAA"}
+
+    with TestClient(app) as client:
+        for id in ("a", "b"):
+            client.portal.call(
+                lambda: MemoryCrud.upsert(
+                    ModuleID.locations,
+                    RoleEnum.emsp,
+                    location(id, "2022-01-01 00:00:00+00:00"),
+                    id,
+                    **kwargs,
+                )
+            )
+        client.portal.call(
+            lambda: MemoryCrud.delete(ModuleID.locations, RoleEnum.emsp, "a", **kwargs)
+        )
+
+        first = client.get("/ocpi/cpo/2.2.1/locations/changes?limit=2").json()["data"]
+        second = client.get(
+            f"/ocpi/cpo/2.2.1/locations/changes?token={first['resume_token']}"
+        ).json()["data"]
+        third = client.get(
+            f"/ocpi/cpo/2.2.1/locations/changes?token={second['resume_token']}"
+        ).json()["data"]
+        invalid = client.get("/ocpi/cpo/2.2.1/locations/changes?token=invalid")
+
+    # "a" was deleted since, its upsert is skipped
+    assert [change["key"]["id"] for change in first["changes"]] == ["b"]
+    assert first["changes"][0]["object"]["id"] == "b"
+    assert first["has_more"]
+    assert [(c["type"], c["key"]["id"]) for c in second["changes"]] == [("DELETE", "a")]
+    assert not second["has_more"]
+    assert third["changes"] == []
+    assert third["resume_token"] == second["resume_token"]
+    assert invalid.status_code == 400
+
+
+def test_search_locations_by_radius_and_bbox():
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], MemoryCrud, Adapter
+    )
+
+    with TestClient(app) as client:
+        # about 1.1 km between each location, going north
+        for id, latitude in (("far", "3.02"), ("near", "3.01"), ("here", "3.0")):
+            data = location(id, "2022-01-01 00:00:00+00:00")
+            data["coordinates"] = {"latitude": latitude, "longitude": "101.0"}
+            client.portal.call(
+                MemoryCrud.create, ModuleID.locations, RoleEnum.cpo, data
+            )
+
+        radius = client.get(
+            "/ocpi/cpo/2.2.1/locations/search"
+            "?latitude=3.0&longitude=101.0&radius=2000"
+        )
+        bbox = client.get(
+            "/ocpi/cpo/2.2.1/locations/search?bbox=100.9,3.005,101.1,3.1&limit=1"
+        )
+        missing = client.get("/ocpi/cpo/2.2.1/locations/search?latitude=3.0")
+        too_far = client.get(
+            "/ocpi/cpo/2.2.1/locations/search"
+            "?latitude=3.0&longitude=101.0&radius=10000000"
+        )
+
+    assert [data["id"] for data in radius.json()["data"]] == ["here", "near"]
+    assert [data["id"] for data in bbox.json()["data"]] == ["far"]
+    assert (missing.status_code, too_far.status_code) == (400, 400)
+
+
+def test_status_patch_skips_location_read(monkeypatch):
+    monkeypatch.setattr(settings, "EVSE_STATUS_STORE", True)
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], MemoryCrud, Adapter
+    )
+    # identifiers are stored as validated by the routes, in lower case
+    data = location("a", "2022-01-01 00:00:00+00:00", party_id="aaa")
+    evse_uid = data["evses"][0]["uid"]
+    url = f"/ocpi/emsp/2.2.1/locations/us/aaa/a/{evse_uid}"
+
+    with TestClient(app) as client:
+        client.portal.call(MemoryCrud.create, ModuleID.locations, RoleEnum.emsp, data)
+        monkeypatch.setattr(
+            MemoryCrud, "get", AsyncMock(side_effect=AssertionError("read"))
+        )
+        response = client.patch(
+            url,
+            json={"status": "CHARGING", "last_updated": "2022-01-05 00:00:00+00:00"},
+        )
+        monkeypatch.undo()
+        stored = client.portal.call(
+            MemoryCrud.get, ModuleID.locations, RoleEnum.emsp, "a"
+        )
+
+    assert response.status_code == 200
+    assert stored["evses"][0]["status"] == "CHARGING"
+    assert stored["last_updated"] == "2022-01-05 00:00:00+00:00"
+
+
+def test_plain_field_patch_skips_location_read(monkeypatch):
+    monkeypatch.setattr(settings, "PATCH_FAST_PATH", True)
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], MemoryCrud, Adapter
+    )
+    data = location("a", "2022-01-01 00:00:00+00:00", party_id="aaa")
+    evse = data["evses"][0]
+    url = (
+        f"/ocpi/emsp/2.2.1/locations/us/aaa/a/{evse['uid']}"
+        f"/{evse['connectors'][0]['id']}"
+    )
+
+    with TestClient(app) as client:
+        client.portal.call(MemoryCrud.create, ModuleID.locations, RoleEnum.emsp, data)
+        monkeypatch.setattr(
+            MemoryCrud, "get", AsyncMock(side_effect=AssertionError("read"))
+        )
+        response = client.patch(
+            url,
+            json={"max_voltage": 400, "last_updated": "2022-01-05 00:00:00+00:00"},
+        )
+        monkeypatch.undo()
+        stored = client.portal.call(
+            MemoryCrud.get, ModuleID.locations, RoleEnum.emsp, "a"
+        )
+
+    assert response.status_code == 200
+    assert response.json()["data"][0]["max_voltage"] == 400
+    assert stored["evses"][0]["connectors"][0]["max_voltage"] == 400
+    assert stored["last_updated"] == "2022-01-05 00:00:00+00:00"
+
+
+def test_session_patch_skips_read(monkeypatch):
+    monkeypatch.setattr(settings, "PATCH_FAST_PATH", True)
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], MemoryCrud, Adapter
+    )
+    data = {**copy.deepcopy(SESSIONS[0]), "party_id": "aaa"}
+    url = f"/ocpi/emsp/2.2.1/sessions/us/aaa/{data['id']}"
+
+    with TestClient(app) as client:
+        client.portal.call(MemoryCrud.create, ModuleID.sessions, RoleEnum.emsp, data)
+        monkeypatch.setattr(
+            MemoryCrud, "get", AsyncMock(side_effect=AssertionError("read"))
+        )
+        response = client.patch(
+            url, json={"kwh": 120, "last_updated": "2022-01-01 00:00:00+00:00"}
+        )
+        monkeypatch.undo()
+        stored = client.portal.call(
+            MemoryCrud.get, ModuleID.sessions, RoleEnum.emsp, data["id"]
+        )
+
+    assert response.status_code == 200
+    assert response.json()["data"][0]["kwh"] == 120
+    assert stored["kwh"] == 120
+    # an older last_updated does not move it back
+    assert stored["last_updated"] == data["last_updated"]
+
+
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_session_patch_appends_charging_periods(monkeypatch, fast_path):
+    monkeypatch.setattr(settings, "PATCH_FAST_PATH", fast_path)
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], MemoryCrud, Adapter
+    )
+    data = {**copy.deepcopy(SESSIONS[0]), "party_id": "aaa"}
+    url = f"/ocpi/emsp/2.2.1/sessions/us/aaa/{data['id']}"
+    period = {
+        "start_date_time": "2022-01-02 00:05:00+00:00",
+        "dimensions": [{"type": "ENERGY", "volume": 5}],
+    }
+
+    with TestClient(app) as client:
+        client.portal.call(MemoryCrud.create, ModuleID.sessions, RoleEnum.emsp, data)
+        client.patch(url, json={"charging_periods": [period]})
+        # a period sent again replaces the one with the same start
+        response = client.patch(
+            url, json={"charging_periods": [{**period, "dimensions": []}]}
+        )
+
+    periods = response.json()["data"][0]["charging_periods"]
+    assert [period["dimensions"] for period in periods] == [
+        [{"type": "POWER", "volume": 10}],
+        [],
+    ]
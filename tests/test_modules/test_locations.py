@@ -1,3 +1,5 @@
+import json
+from unittest.mock import AsyncMock
 from uuid import uuid4
 
 from fastapi.testclient import TestClient
@@ -5,7 +7,8 @@ from fastapi.testclient import TestClient
 from ocpi.main import get_application
 from ocpi.core import enums
 from ocpi.core.config import settings
-from ocpi.modules.locations.v_2_2_1.schemas import Location
+from ocpi.core.utils import encode_string_base64
+from ocpi.modules.locations.v_2_2_1.schemas import Location, EVSE, Connector
 from ocpi.modules.versions.enums import VersionNumber
 
 
@@ -188,6 +191,10 @@ class Crud:
     async def get(
         cls, module: enums.ModuleID, role: enums.RoleEnum, id, *args, **kwargs
     ):
+        if "connector_id" in kwargs:
+            return LOCATIONS[0]["evses"][0]["connectors"][0]
+        if "evse_uid" in kwargs:
+            return LOCATIONS[0]["evses"][0]
         return LOCATIONS[0]
 
     @classmethod
@@ -202,6 +209,30 @@ class Crud:
     ):
         return data
 
+    @classmethod
+    async def upsert(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        data: dict,
+        id,
+        *args,
+        **kwargs,
+    ):
+        return data
+
+    @classmethod
+    async def update_sub_object(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        data: dict,
+        id,
+        *args,
+        **kwargs,
+    ):
+        return data
+
     @classmethod
     async def create(
         cls, module: enums.ModuleID, role: enums.RoleEnum, data: dict, *args, **kwargs
@@ -219,6 +250,33 @@ class Crud:
     ) -> list:
         return LOCATIONS, 1, True
 
+    @classmethod
+    async def export(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        filters: dict,
+        *args,
+        **kwargs,
+    ):
+        async def documents():
+            for location in LOCATIONS:
+                yield location
+
+        return documents()
+
+    @classmethod
+    async def do(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        action: enums.Action,
+        *args,
+        data: dict = None,
+        **kwargs,
+    ):
+        return {}
+
 
 class Adapter:
     @classmethod
@@ -227,6 +285,16 @@ class Adapter:
     ) -> Location:
         return Location(**data)
 
+    @classmethod
+    def evse_adapter(cls, data, version: VersionNumber = VersionNumber.latest) -> EVSE:
+        return EVSE(**data)
+
+    @classmethod
+    def connector_adapter(
+        cls, data, version: VersionNumber = VersionNumber.latest
+    ) -> Connector:
+        return Connector(**data)
+
 
 def test_cpo_get_locations_v_2_2_1():
 
@@ -283,6 +351,23 @@ def test_cpo_get_connector_v_2_2_1():
     )
 
 
+def test_cpo_export_locations_v_2_2_1():
+
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], Crud, Adapter)
+
+    client = TestClient(app)
+    response = client.get(
+        "/ocpi/cpo/2.2.1/locations/export", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    lines = response.text.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["id"] == LOCATIONS[0]["id"]
+
+
 def test_emsp_get_location_v_2_2_1():
     app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
 
@@ -428,3 +513,94 @@ def test_emsp_patch_connector_v_2_2_1():
     assert response.status_code == 200
     assert len(response.json()["data"]) == 1
     assert response.json()["data"][0]["id"] == patch_data["id"]
+
+
+def test_emsp_get_location_cached_until_written_v_2_2_1(monkeypatch):
+    monkeypatch.setattr(settings, "LOCATION_CACHE_SIZE", 10)
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
+    get = AsyncMock(side_effect=Crud.get)
+    monkeypatch.setattr(Crud, "get", get)
+    url = (
+        f"/ocpi/emsp/2.2.1/locations/{settings.COUNTRY_CODE}/{settings.PARTY_ID}"
+        f'/{LOCATIONS[0]["id"]}'
+    )
+
+    client = TestClient(app)
+    first = client.get(url).json()
+    second = client.get(url).json()
+    assert get.await_count == 1
+
+    client.put(
+        f'{url}/{LOCATIONS[0]["evses"][0]["uid"]}', json=LOCATIONS[0]["evses"][0]
+    )
+    client.get(url)
+
+    assert first["data"] == second["data"]
+    assert get.await_count == 2
+    cache = app.state.location_cache
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 1)
+
+
+def test_emsp_get_location_cached_per_token_v_2_2_1(monkeypatch):
+    monkeypatch.setattr(settings, "LOCATION_CACHE_SIZE", 10)
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
+    get = AsyncMock(side_effect=Crud.get)
+    monkeypatch.setattr(Crud, "get", get)
+    url = (
+        f"/ocpi/emsp/2.2.1/locations/{settings.COUNTRY_CODE}/{settings.PARTY_ID}"
+        f'/{LOCATIONS[0]["id"]}'
+    )
+
+    client = TestClient(app)
+    for token in ("first", "second", "first"):
+        client.get(
+            url, headers={"Authorization": f"Token {encode_string_base64(token)}"}
+        )
+
+    # a cached Location is only served to the token crud.get accepted it for
+    assert [call.kwargs["auth_token"] for call in get.await_args_list] == [
+        "first",
+        "second",
+    ]
+
+
+def test_emsp_get_location_not_cached_when_written_during_read_v_2_2_1(monkeypatch):
+    monkeypatch.setattr(settings, "LOCATION_CACHE_SIZE", 10)
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
+    url = (
+        f"/ocpi/emsp/2.2.1/locations/{settings.COUNTRY_CODE}/{settings.PARTY_ID}"
+        f'/{LOCATIONS[0]["id"]}'
+    )
+
+    async def get(*args, **kwargs):
+        # a write to the Location lands while it is read
+        app.state.location_cache.invalidate()
+        return LOCATIONS[0]
+
+    monkeypatch.setattr(Crud, "get", get)
+    client = TestClient(app)
+    client.get(url)
+
+    assert len(app.state.location_cache) == 0
+
+
+def test_emsp_get_location_cached_while_other_locations_written_v_2_2_1(monkeypatch):
+    monkeypatch.setattr(settings, "LOCATION_CACHE_SIZE", 10)
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
+    url = (
+        f"/ocpi/emsp/2.2.1/locations/{settings.COUNTRY_CODE}/{settings.PARTY_ID}"
+        f'/{LOCATIONS[0]["id"]}'
+    )
+
+    async def get(*args, **kwargs):
+        # a write to another Location lands while this one is read
+        app.state.location_cache.invalidate(
+            group=(settings.COUNTRY_CODE, settings.PARTY_ID, "other")
+        )
+        return LOCATIONS[0]
+
+    monkeypatch.setattr(Crud, "get", get)
+    client = TestClient(app)
+    client.get(url)
+
+    assert len(app.state.location_cache) == 1
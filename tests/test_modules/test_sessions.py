@@ -70,6 +70,18 @@ class Crud:
     ):
         return data
 
+    @classmethod
+    async def upsert(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        data: dict,
+        id,
+        *args,
+        **kwargs,
+    ):
+        return data
+
     @classmethod
     async def create(
         cls, module: enums.ModuleID, role: enums.RoleEnum, data: dict, *args, **kwargs
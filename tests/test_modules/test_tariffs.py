@@ -1,3 +1,4 @@
+import json
 from uuid import uuid4
 
 from fastapi.testclient import TestClient
@@ -5,6 +6,7 @@ from fastapi.testclient import TestClient
 from ocpi.main import get_application
 from ocpi.core import enums
 from ocpi.core.config import settings
+from ocpi.core.utils import encode_string_base64
 from ocpi.modules.tariffs.v_2_2_1.schemas import Tariff
 from ocpi.modules.versions.enums import VersionNumber
 
@@ -46,6 +48,18 @@ class Crud:
     ):
         return data
 
+    @classmethod
+    async def upsert(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        data: dict,
+        id,
+        *args,
+        **kwargs,
+    ):
+        return data
+
     @classmethod
     async def create(
         cls, module: enums.ModuleID, role: enums.RoleEnum, data: dict, *args, **kwargs
@@ -68,6 +82,35 @@ class Crud:
     ) -> list:
         return TARIFFS, 1, True
 
+    @classmethod
+    async def export(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        filters: dict,
+        *args,
+        **kwargs,
+    ):
+        async def documents():
+            for tariff in TARIFFS:
+                yield tariff
+
+        return documents()
+
+    @classmethod
+    async def do(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        action: enums.Action,
+        *args,
+        data: dict = None,
+        **kwargs,
+    ):
+        if kwargs.get("auth_token") == "unknown":
+            return None
+        return {}
+
 
 class Adapter:
     @classmethod
@@ -88,6 +131,33 @@ def test_cpo_get_tariffs_v_2_2_1():
     assert response.json()["data"][0]["id"] == TARIFFS[0]["id"]
 
 
+def test_cpo_export_tariffs_v_2_2_1():
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], Crud, Adapter)
+
+    client = TestClient(app)
+    response = client.get(
+        "/ocpi/cpo/2.2.1/tariffs/export", headers={"Accept-Encoding": "identity"}
+    )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        TARIFFS[0]["id"]
+    ]
+
+
+def test_cpo_export_tariffs_unauthorized_v_2_2_1():
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], Crud, Adapter)
+
+    client = TestClient(app)
+    response = client.get(
+        "/ocpi/cpo/2.2.1/tariffs/export",
+        headers={"Authorization": f"Token {encode_string_base64('unknown')}"},
+    )
+
+    assert response.status_code == 401
+
+
 def test_emsp_get_tariff_v_2_2_1():
     app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.emsp], Crud, Adapter)
 
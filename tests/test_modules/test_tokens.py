@@ -45,6 +45,18 @@ class Crud:
     ) -> Token:
         return TOKENS[0]
 
+    @classmethod
+    async def upsert(
+        cls,
+        module: enums.ModuleID,
+        role: enums.RoleEnum,
+        data: Token,
+        id,
+        *args,
+        **kwargs,
+    ):
+        return data
+
     @classmethod
     async def create(
         cls, module: enums.ModuleID, role: enums.RoleEnum, data: Token, *args, **kwargs
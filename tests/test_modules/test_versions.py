@@ -1,8 +1,10 @@
 from typing import Any
 
+import pytest
 from fastapi.testclient import TestClient
 
 from ocpi.main import get_application
+from ocpi.core.config import settings
 from ocpi.core import enums
 from ocpi.core.crud import Crud
 from ocpi.core.adapter import Adapter
@@ -62,3 +64,55 @@ def test_get_versions_v_2_2_1_requires_auth():
     response = client.get("/ocpi/2.2.1/details")
 
     assert response.status_code == 401
+
+
+def test_versions_body_is_rendered_once(monkeypatch):
+    app = get_application(VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], Crud, Adapter)
+    # the application build rendered it already
+    monkeypatch.setattr(
+        "ocpi.core.utils.OCPIResponse.dict",
+        lambda *args, **kwargs: pytest.fail("rendered again"),
+    )
+
+    client = TestClient(app)
+    first = client.get("/ocpi/versions").json()
+    second = client.get("/ocpi/versions").json()
+
+    assert first["data"] == second["data"]
+    assert first["data"][0]["version"] == "2.2.1"
+    assert first["status_code"] == 1000
+    assert first["timestamp"] != second["timestamp"]
+
+
+def test_client_token_is_cached_until_credentials_change(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_CACHE_TTL", 60)
+    calls = []
+
+    class MockCrud(Crud):
+        @classmethod
+        async def do(cls, module, role, action, *args, data=None, **kwargs) -> Any:
+            calls.append(kwargs["auth_token"])
+            return {}
+
+        @classmethod
+        async def get(cls, module, role, id, *args, **kwargs) -> Any:
+            return {"token": id}
+
+        @classmethod
+        async def delete(cls, module, role, id, *args, **kwargs) -> Any:
+            return True
+
+    app = get_application(
+        VersionNumber.v_2_2_1, [enums.RoleEnum.cpo], MockCrud, Adapter
+    )
+    headers = {"authorization": "Token Zm9v"}
+
+    client = TestClient(app)
+    for _ in range(2):
+        assert client.get("/ocpi/2.2.1/details", headers=headers).status_code == 200
+    assert calls == ["foo"]
+    assert (app.state.token_cache.hits, app.state.token_cache.misses) == (1, 1)
+
+    client.delete("/ocpi/cpo/2.2.1/credentials/", headers=headers)
+    client.get("/ocpi/2.2.1/details", headers=headers)
+    assert calls == ["foo", "foo"]
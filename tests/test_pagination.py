@@ -1,10 +1,27 @@
+import asyncio
+from datetime import datetime, timezone
 from unittest.mock import AsyncMock, MagicMock
 
+import pytest
+from bson import ObjectId
+from fastapi import Response
 from fastapi.testclient import TestClient
 
 from ocpi import get_application
 from ocpi.core import enums
+from ocpi.core.config import settings
+from ocpi.core.adapter import Adapter
+from ocpi.core.crud import Crud, list_query
+from ocpi.core.memory import MemoryCrud
+from ocpi.core.utils import (
+    decode_cursor,
+    encode_cursor,
+    get_count_strategy,
+    get_list,
+    next_page_link,
+)
 from ocpi.modules.versions.enums import VersionNumber
+from tests.test_modules.test_locations import LOCATIONS
 
 
 def test_inject_dependency():
@@ -21,3 +38,186 @@ def test_inject_dependency():
     assert response.headers.get("X-Total-Count") == "0"
     assert response.headers.get("X-Limit") == "50"
     assert response.headers.get("Link") == ""
+
+
+def test_cursor_round_trip():
+    document = {"_id": ObjectId(), "last_updated": "2022-01-02 00:00:00+00:00"}
+
+    position = decode_cursor(encode_cursor(document))
+
+    assert position == {
+        "_id": document["_id"],
+        "last_updated": document["last_updated"],
+    }
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_link():
+    document = {"_id": ObjectId(), "last_updated": "2022-01-02 00:00:00+00:00"}
+    crud = AsyncMock()
+    crud.list.return_value = [document], 2, False
+    filters = {
+        "date_from": None,
+        "date_to": None,
+        "offset": 0,
+        "limit": 1,
+        "cursor": encode_cursor(document),
+    }
+
+    response = Response()
+    await get_list(
+        response,
+        filters,
+        enums.ModuleID.locations,
+        enums.RoleEnum.cpo,
+        VersionNumber.v_2_2_1,
+        crud,
+    )
+
+    link = response.headers.get("Link")
+    assert f"cursor={encode_cursor(document)}" in link
+    assert "offset" not in link
+    assert "date_from" not in link
+
+
+def test_cursor_pagination_link_without_id(monkeypatch):
+    monkeypatch.setattr(settings, "CURSOR_PAGINATION", True)
+    filters = {"date_from": None, "offset": 10, "limit": 5, "cursor": None}
+
+    link = next_page_link(
+        filters,
+        enums.ModuleID.locations,
+        VersionNumber.v_2_2_1,
+        False,
+        {"id": "x", "last_updated": "2022-01-02 00:00:00+00:00"},
+    )
+
+    # no cursor can be built, the next page is reached by offset
+    assert "offset=15" in link
+    assert "cursor" not in link
+
+
+def test_list_query_date_window():
+    filters = {
+        "date_from": datetime(2022, 1, 1),
+        "date_to": datetime(2022, 1, 2, tzinfo=timezone.utc),
+        "offset": 50,
+        "limit": 50,
+        "cursor": None,
+    }
+
+    assert list_query(filters) == {
+        "last_updated": {
+            "$gte": "2022-01-01 00:00:00+00:00",
+            "$lt": "2022-01-02 00:00:00+00:00",
+        }
+    }
+
+
+def test_list_query_without_window():
+    filters = {"date_from": None, "date_to": None, "offset": 0, "limit": 50}
+
+    assert list_query(filters) == {}
+
+
+@pytest.mark.asyncio
+async def test_count_strategy_header(monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "COUNT_STRATEGIES",
+        {enums.ModuleID.locations: enums.CountStrategy.estimated},
+    )
+    crud = AsyncMock()
+    crud.list.return_value = [], 0, True
+    filters = {"date_from": None, "date_to": None, "offset": 0, "limit": 50}
+
+    response = Response()
+    await get_list(
+        response,
+        filters,
+        enums.ModuleID.locations,
+        enums.RoleEnum.cpo,
+        VersionNumber.v_2_2_1,
+        crud,
+    )
+
+    assert response.headers.get("X-Total-Count-Strategy") == "ESTIMATED"
+    assert (
+        crud.list.await_args.kwargs["count_strategy"] == enums.CountStrategy.estimated
+    )
+
+
+def test_estimated_count_falls_back_when_filtered(monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "COUNT_STRATEGIES",
+        {enums.ModuleID.locations: enums.CountStrategy.estimated},
+    )
+    filters = {"date_from": datetime(2022, 1, 1), "date_to": None}
+
+    strategy = get_count_strategy(enums.ModuleID.locations, filters)
+
+    assert strategy == enums.CountStrategy.cached
+
+
+def test_streamed_list_matches_list(monkeypatch):
+    MemoryCrud.clear()
+    for index in range(3):
+        location = {
+            **LOCATIONS[0],
+            "id": f"loc{index}",
+            "last_updated": f"2022-01-0{index + 1} 00:00:00+00:00",
+        }
+        asyncio.run(
+            MemoryCrud.create(enums.ModuleID.locations, enums.RoleEnum.cpo, location)
+        )
+    app = get_application(
+        [VersionNumber.v_2_2_1], [enums.RoleEnum.cpo], MemoryCrud, Adapter
+    )
+    client = TestClient(app)
+
+    listed = client.get("/ocpi/cpo/2.2.1/locations?limit=2")
+    monkeypatch.setattr(settings, "STREAM_LISTS", True)
+    streamed = client.get("/ocpi/cpo/2.2.1/locations?limit=2")
+    MemoryCrud.clear()
+
+    assert streamed.status_code == 200
+    assert streamed.json()["data"] == listed.json()["data"]
+    assert [location["id"] for location in streamed.json()["data"]] == ["loc0", "loc1"]
+    assert streamed.json()["status_code"] == 1000
+    for header in ("Link", "X-Total-Count", "X-Limit"):
+        assert streamed.headers[header] == listed.headers[header]
+
+
+@pytest.mark.asyncio
+async def test_iterate_finds_page_end_before_streaming(monkeypatch):
+    documents = [{"_id": i, "last_updated": f"2022-01-0{i}"} for i in (1, 2, 3)]
+    bounds = MagicMock()
+    bounds.sort.return_value.skip.return_value.limit.return_value.to_list = AsyncMock(
+        return_value=documents[1:3]
+    )
+    page = MagicMock()
+    collection = MagicMock()
+    collection.name = "iterated_locations"
+    collection.find.side_effect = [bounds, page]
+    collection.count_documents = AsyncMock(return_value=3)
+    monkeypatch.setattr(Crud, "_database", {"locations": collection})
+
+    cursor, total, is_last_page, last = await Crud.iterate(
+        enums.ModuleID.locations,
+        enums.RoleEnum.cpo,
+        {"offset": 0, "limit": 2},
+    )
+
+    assert (total, is_last_page, last) == (3, False, documents[1])
+    bounds.sort.return_value.skip.assert_called_once_with(1)
+    assert (
+        cursor
+        is page.sort.return_value.skip.return_value.limit.return_value.batch_size.return_value
+    )
+    page.sort.return_value.skip.return_value.limit.assert_called_once_with(2)
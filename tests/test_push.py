@@ -1,10 +1,14 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 
+import pytest
 from fastapi.testclient import TestClient
+from pymongo.errors import OperationFailure, PyMongoError
 
 from ocpi import get_application
 from ocpi.core import enums, schemas
+from ocpi.core.push import ChangeStreamPush, push_object
 from ocpi.modules.locations.v_2_2_1.schemas import Location
 from ocpi.modules.versions.enums import VersionNumber
 from tests.test_modules.mocks.async_client import (
@@ -212,3 +216,144 @@ def test_push(async_client):
 
     crud.get.assert_awaited_once()
     adapter.location_adapter.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch(
+    "ocpi.core.push.httpx.AsyncClient",
+    side_effect=MockAsyncClientGeneratorVersionsAndEndpoints,
+)
+async def test_push_object_with_data_skips_read(async_client):
+    crud = AsyncMock()
+    adapter = MagicMock()
+    adapter.location_adapter.return_value = Location(**LOCATIONS[0])
+    push = schemas.Push(
+        module_id=enums.ModuleID.locations,
+        object_id=LOCATIONS[0]["id"],
+        receivers=[
+            schemas.Receiver(endpoints_url="http://example.com", auth_token="token"),
+        ]
+        * 2,
+    )
+
+    await push_object(VersionNumber.v_2_2_1, push, crud, adapter, data=LOCATIONS[0])
+
+    crud.get.assert_not_awaited()
+    assert adapter.location_adapter.call_args_list[0].args == (LOCATIONS[0],)
+
+
+class MockChangeStream:
+    def __init__(self, changes, error: PyMongoError = None):
+        self.changes = changes
+        self.error = error or PyMongoError("stream closed")
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            raise self.error
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": change["_id"]}
+        return change
+
+
+@pytest.mark.asyncio
+@patch("ocpi.core.push.push_object", new_callable=AsyncMock)
+async def test_change_stream_push(push_object):
+    receivers = [{"endpoints_url": "http://example.com", "auth_token": "token"}]
+    crud = AsyncMock()
+    crud.do.side_effect = [receivers, []]
+    adapter = MagicMock()
+    streams = [
+        MockChangeStream(
+            [
+                {
+                    "_id": "1",
+                    "ns": {"coll": "locations"},
+                    "fullDocument": LOCATIONS[0],
+                },
+                {"_id": "2", "ns": {"coll": "tokens"}, "fullDocument": {"uid": "t"}},
+                {"_id": "3", "ns": {"coll": "sessions"}, "fullDocument": None},
+            ]
+        ),
+    ]
+    resumed = asyncio.Event()
+
+    def watch(pipeline, full_document, resume_after):
+        if streams:
+            return streams.pop(0)
+        assert resume_after == {"_data": "3"}
+        resumed.set()
+        return MockChangeStream([])
+
+    database = MagicMock()
+    database.watch.side_effect = watch
+    pusher = ChangeStreamPush(retry_delay=0)
+
+    pusher.start(database, crud, adapter)
+    await asyncio.wait_for(resumed.wait(), 1)
+    await pusher.stop()
+
+    assert crud.do.await_count == 2
+    assert crud.do.await_args_list[1].args[:3] == (
+        enums.ModuleID.tokens,
+        enums.RoleEnum.emsp,
+        enums.Action.get_push_receivers,
+    )
+    push_object.assert_awaited_once()
+    # the changed document is pushed as is, without reading it again
+    crud.get.assert_not_awaited()
+    assert push_object.await_args.kwargs["data"] == LOCATIONS[0]
+    push = push_object.await_args.args[1]
+    assert push.module_id == enums.ModuleID.locations
+    assert push.object_id == LOCATIONS[0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_change_stream_push_restarts_after_history_lost():
+    crud = AsyncMock()
+    crud.do.return_value = []
+    change = {"_id": "1", "ns": {"coll": "tokens"}, "fullDocument": {"uid": "t"}}
+    history_lost = OperationFailure("resume point not in the oplog", 286)
+    streams = [
+        MockChangeStream([change], history_lost),
+        MockChangeStream([], history_lost),
+    ]
+    resume_points = []
+
+    def watch(pipeline, full_document, resume_after):
+        resume_points.append(resume_after)
+        return streams.pop(0)
+
+    database = MagicMock()
+    database.watch.side_effect = watch
+    pusher = ChangeStreamPush(retry_delay=0)
+
+    pusher.start(database, crud, MagicMock())
+    await asyncio.wait_for(pusher._task, 1)
+
+    # restarted from the current changes, then stopped without a resume point
+    assert resume_points == [None, None]
+    assert pusher.resume_token is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("code", [13, 260, 40573])
+async def test_change_stream_push_stops_on_fatal_errors(code):
+    database = MagicMock()
+    database.watch.return_value = MockChangeStream([], OperationFailure("", code))
+    pusher = ChangeStreamPush(retry_delay=0)
+
+    pusher.start(database, AsyncMock(), MagicMock())
+    await asyncio.wait_for(pusher._task, 1)
+    await pusher.stop()
+
+    database.watch.assert_called_once()
@@ -0,0 +1,102 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from ocpi.core.enums import ModuleID, RoleEnum
+from ocpi.core.singleflight import SingleFlightCrud
+
+
+def slow_crud(release: asyncio.Event):
+    async def get(module, role, id, *args, **kwargs):
+        await release.wait()
+        return {"id": id, "evses": []}
+
+    crud = AsyncMock()
+    crud.get.side_effect = get
+    return crud
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_query():
+    release = asyncio.Event()
+    crud = slow_crud(release)
+    singleflight = SingleFlightCrud(crud)
+
+    calls = [
+        asyncio.ensure_future(
+            singleflight.get(
+                ModuleID.locations, RoleEnum.cpo, "loc1", country_code="us"
+            )
+        )
+        for _ in range(5)
+    ]
+    other = asyncio.ensure_future(
+        singleflight.get(ModuleID.locations, RoleEnum.cpo, "loc2")
+    )
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*calls, other)
+
+    assert crud.get.await_count == 2
+    assert (singleflight.calls, singleflight.shared) == (6, 4)
+    assert all(result == {"id": "loc1", "evses": []} for result in results[:5])
+    assert len({id(result) for result in results[:5]}) == 5
+
+
+@pytest.mark.asyncio
+async def test_first_caller_gets_its_own_copy():
+    release = asyncio.Event()
+    crud = slow_crud(release)
+    singleflight = SingleFlightCrud(crud)
+
+    async def get_and_change():
+        result = await singleflight.get(ModuleID.locations, RoleEnum.cpo, "loc1")
+        result["evses"].append({"uid": "changed"})
+        return result
+
+    first = asyncio.ensure_future(get_and_change())
+    await asyncio.sleep(0)
+    other = asyncio.ensure_future(
+        singleflight.get(ModuleID.locations, RoleEnum.cpo, "loc1")
+    )
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(first, other)
+
+    assert singleflight.shared == 1
+    assert other.result() == {"id": "loc1", "evses": []}
+
+
+@pytest.mark.asyncio
+async def test_call_nobody_joined_is_not_copied():
+    result = {"id": "loc1", "evses": []}
+    crud = AsyncMock()
+    crud.get.return_value = result
+    singleflight = SingleFlightCrud(crud)
+
+    assert await singleflight.get(ModuleID.locations, RoleEnum.cpo, "loc1") is result
+    assert singleflight._followers == {}
+
+
+@pytest.mark.asyncio
+async def test_write_forgets_in_flight_get():
+    release = asyncio.Event()
+    crud = slow_crud(release)
+    singleflight = SingleFlightCrud(crud)
+
+    before = asyncio.ensure_future(
+        singleflight.get(ModuleID.locations, RoleEnum.emsp, "loc1")
+    )
+    await asyncio.sleep(0)
+    await singleflight.update(ModuleID.locations, RoleEnum.emsp, {}, "loc1")
+    after = asyncio.ensure_future(
+        singleflight.get(ModuleID.locations, RoleEnum.emsp, "loc1")
+    )
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(before, after)
+
+    assert crud.get.await_count == 2
+    assert singleflight.shared == 0
+    crud.update.assert_awaited_once()